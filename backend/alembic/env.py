@@ -16,9 +16,15 @@ if config.config_file_name is not None:
 
 # add your model's MetaData object here
 # for 'autogenerate' support
-# from myapp import mymodel
-# target_metadata = mymodel.Base.metadata
-target_metadata = None
+from app import models
+from app.config import get_settings
+
+target_metadata = models.Base.metadata
+
+
+# 全文検索の索引（FTS5 の仮想テーブルと内部テーブル）はメタデータの外で管理するため、自動生成の比較から除く
+def include_object(object, name, type_, reflected, compare_to):
+    return not (type_ == "table" and reflected and name.startswith(tuple(models.SEARCH_INDEXES)))
 
 # other values from the config, defined by the needs of env.py,
 # can be acquired:
@@ -26,6 +32,14 @@ target_metadata = None
 # ... etc.
 
 
+def get_url() -> str:
+    """alembic.ini に URL が設定されていなければアプリと同じ DATABASE_URL を使う"""
+    url = config.get_main_option("sqlalchemy.url")
+    if not url or url.startswith("driver://"):
+        url = get_settings().database_url
+    return url
+
+
 def run_migrations_offline() -> None:
     """Run migrations in 'offline' mode.
 
@@ -38,12 +52,14 @@ def run_migrations_offline() -> None:
     script output.
 
     """
-    url = config.get_main_option("sqlalchemy.url")
+    url = get_url()
     context.configure(
         url=url,
         target_metadata=target_metadata,
         literal_binds=True,
         dialect_opts={"paramstyle": "named"},
+        include_object=include_object,
+        render_as_batch=url.startswith("sqlite"),
     )
 
     with context.begin_transaction():
@@ -57,15 +73,21 @@ def run_migrations_online() -> None:
     and associate a connection with the context.
 
     """
+    section = config.get_section(config.config_ini_section, {})
+    section["sqlalchemy.url"] = get_url()
     connectable = engine_from_config(
-        config.get_section(config.config_ini_section, {}),
+        section,
         prefix="sqlalchemy.",
         poolclass=pool.NullPool,
     )
 
     with connectable.connect() as connection:
+        # SQLite は ALTER TABLE が限られるため、テーブル再作成（batch モード）で変更する
         context.configure(
-            connection=connection, target_metadata=target_metadata
+            connection=connection,
+            target_metadata=target_metadata,
+            include_object=include_object,
+            render_as_batch=connection.dialect.name == "sqlite",
         )
 
         with context.begin_transaction():
@@ -0,0 +1,83 @@
+"""initial schema
+
+Revision ID: 0001_initial
+Revises:
+Create Date: 2026-10-18 09:00:00
+
+create_all で作成済みの既存データベースでは、存在しないテーブルだけを作成する。
+既存環境は ``alembic upgrade head`` でそのまま移行できる。
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0001_initial'
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    existing = set(sa.inspect(op.get_bind()).get_table_names())
+
+    if 'students' not in existing:
+        op.create_table(
+            'students',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('name', sa.String(), nullable=True),
+            sa.Column('course', sa.String(), nullable=True),
+            sa.Column('email', sa.String(), nullable=True),
+            sa.Column('uid', sa.String(), nullable=True),
+            sa.PrimaryKeyConstraint('id'),
+        )
+        op.create_index('ix_students_id', 'students', ['id'])
+        op.create_index('ix_students_name', 'students', ['name'])
+        op.create_index('ix_students_email', 'students', ['email'], unique=True)
+        op.create_index('ix_students_uid', 'students', ['uid'], unique=True)
+
+    if 'subjects' not in existing:
+        op.create_table(
+            'subjects',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('name', sa.String(), nullable=True),
+            sa.Column('credit', sa.Integer(), nullable=True),
+            sa.PrimaryKeyConstraint('id'),
+        )
+        op.create_index('ix_subjects_id', 'subjects', ['id'])
+        op.create_index('ix_subjects_name', 'subjects', ['name'])
+
+    if 'subject_category' not in existing:
+        op.create_table(
+            'subject_category',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('course', sa.String(), nullable=False),
+            sa.Column('subject_id', sa.Integer(), nullable=False),
+            sa.Column(
+                'category',
+                sa.Enum('COMPULSORY', 'LIMITED_ELECTIVE', 'STANDARD_ELECTIVE', 'ELECTIVE', name='subjectcategoryenum'),
+                nullable=False,
+            ),
+            sa.ForeignKeyConstraint(['subject_id'], ['subjects.id']),
+            sa.PrimaryKeyConstraint('id'),
+        )
+        op.create_index('ix_subject_category_id', 'subject_category', ['id'])
+
+    if 'student_subject' not in existing:
+        # 当初のスキーマ（主キーなし）。主キーと索引は 0002 で追加する
+        op.create_table(
+            'student_subject',
+            sa.Column('student_id', sa.Integer(), nullable=True),
+            sa.Column('subject_id', sa.Integer(), nullable=True),
+            sa.ForeignKeyConstraint(['student_id'], ['students.id']),
+            sa.ForeignKeyConstraint(['subject_id'], ['subjects.id']),
+        )
+
+
+def downgrade() -> None:
+    op.drop_table('student_subject')
+    op.drop_table('subject_category')
+    op.drop_table('subjects')
+    op.drop_table('students')
@@ -0,0 +1,72 @@
+"""composite keys and credit lookup indexes
+
+Revision ID: 0002_credit_lookup_indexes
+Revises: 0001_initial
+Create Date: 2026-10-18 09:30:00
+
+- student_subject: 重複・NULL 行を削除し (student_id, subject_id) の複合主キーを追加、
+  科目からの逆引き用に (subject_id, student_id) の索引を追加
+- subject_category: (subject_id, course) の重複を削除して一意索引を追加、
+  単位計算の (course, subject_id) 検索用のカバリング索引を追加
+- students: コース絞り込み用の course 索引を追加
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0002_credit_lookup_indexes'
+down_revision: Union[str, None] = '0001_initial'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _index_names(inspector, table):
+    return {index['name'] for index in inspector.get_indexes(table)}
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+
+    # 主キーがまだない場合のみ、重複行を除いてから複合主キー付きで作り直す
+    if not inspector.get_pk_constraint('student_subject')['constrained_columns']:
+        op.execute("DELETE FROM student_subject WHERE student_id IS NULL OR subject_id IS NULL")
+        op.execute(
+            "DELETE FROM student_subject WHERE rowid NOT IN ("
+            "SELECT MIN(rowid) FROM student_subject GROUP BY student_id, subject_id)"
+            if bind.dialect.name == 'sqlite' else
+            "DELETE FROM student_subject a USING student_subject b "
+            "WHERE a.ctid > b.ctid AND a.student_id = b.student_id AND a.subject_id = b.subject_id"
+        )
+        with op.batch_alter_table('student_subject', recreate='always') as batch_op:
+            batch_op.alter_column('student_id', existing_type=sa.Integer(), nullable=False)
+            batch_op.alter_column('subject_id', existing_type=sa.Integer(), nullable=False)
+            batch_op.create_primary_key('pk_student_subject', ['student_id', 'subject_id'])
+
+    if 'ix_student_subject_subject_student' not in _index_names(inspector, 'student_subject'):
+        op.create_index('ix_student_subject_subject_student', 'student_subject', ['subject_id', 'student_id'])
+
+    # 同じ科目・コースの区分が複数ある場合は最後に登録されたものを残す
+    op.execute(
+        "DELETE FROM subject_category WHERE id NOT IN ("
+        "SELECT MAX(id) FROM subject_category GROUP BY subject_id, course)"
+    )
+    category_indexes = _index_names(inspector, 'subject_category')
+    if 'ux_subject_category_subject_course' not in category_indexes:
+        op.create_index('ux_subject_category_subject_course', 'subject_category', ['subject_id', 'course'], unique=True)
+    if 'ix_subject_category_course_subject' not in category_indexes:
+        op.create_index('ix_subject_category_course_subject', 'subject_category', ['course', 'subject_id', 'category'])
+
+    if 'ix_students_course' not in _index_names(inspector, 'students'):
+        op.create_index('ix_students_course', 'students', ['course'])
+
+
+def downgrade() -> None:
+    # 複合主キーは重複行の削除を伴うため、ダウングレードでは索引のみを戻す
+    op.drop_index('ix_students_course', table_name='students')
+    op.drop_index('ix_subject_category_course_subject', table_name='subject_category')
+    op.drop_index('ux_subject_category_subject_course', table_name='subject_category')
+    op.drop_index('ix_student_subject_subject_student', table_name='student_subject')
@@ -0,0 +1,33 @@
+"""cache version stamps
+
+Revision ID: 0003_cache_versions
+Revises: 0002_credit_lookup_indexes
+Create Date: 2026-10-18 11:00:00
+
+科目カタログなどのインプロセスキャッシュを複数ワーカーで整合させるためのバージョン表
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0003_cache_versions'
+down_revision: Union[str, None] = '0002_credit_lookup_indexes'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    cache_versions = op.create_table(
+        'cache_versions',
+        sa.Column('name', sa.String(), nullable=False),
+        sa.Column('version', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('name'),
+    )
+    op.bulk_insert(cache_versions, [{'name': 'catalog', 'version': 1}])
+
+
+def downgrade() -> None:
+    op.drop_table('cache_versions')
@@ -0,0 +1,44 @@
+"""student credit summary
+
+Revision ID: 0004_student_credit_summary
+Revises: 0003_cache_versions
+Create Date: 2026-10-18 13:00:00
+
+学生ごとの単位集計テーブル。既存の学生の集計は移行後に
+``python -m app.credit_summary rebuild`` で作成する（未作成の学生はその場で計算される）。
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0004_student_credit_summary'
+down_revision: Union[str, None] = '0003_cache_versions'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'student_credit_summary',
+        sa.Column('student_id', sa.Integer(), nullable=False),
+        sa.Column('course', sa.String(), nullable=True),
+        sa.Column('compulsory', sa.Integer(), nullable=False),
+        sa.Column('limited_elective', sa.Integer(), nullable=False),
+        sa.Column('standard_elective', sa.Integer(), nullable=False),
+        sa.Column('elective', sa.Integer(), nullable=False),
+        sa.Column('total', sa.Integer(), nullable=False),
+        sa.Column('compulsory_met', sa.Boolean(), nullable=False),
+        sa.Column('limited_elective_met', sa.Boolean(), nullable=False),
+        sa.Column('limited_standard_elective_met', sa.Boolean(), nullable=False),
+        sa.Column('total_met', sa.Boolean(), nullable=False),
+        sa.Column('details', sa.JSON(), nullable=False),
+        sa.ForeignKeyConstraint(['student_id'], ['students.id']),
+        sa.PrimaryKeyConstraint('student_id'),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('student_credit_summary')
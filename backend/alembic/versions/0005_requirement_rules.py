@@ -0,0 +1,44 @@
+"""requirement rules per course and entrance year
+
+Revision ID: 0005_requirement_rules
+Revises: 0004_student_credit_summary
+Create Date: 2026-10-18 15:00:00
+
+コース・入学年度別の卒業要件（requirement_rules）と学生の入学年度を追加する。
+ルールが 1 件もない場合は従来どおり CreditRequirement の既定値で判定する。
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0005_requirement_rules'
+down_revision: Union[str, None] = '0004_student_credit_summary'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('students', sa.Column('entrance_year', sa.Integer(), nullable=True))
+    op.create_table(
+        'requirement_rules',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('course', sa.String(), nullable=True),
+        sa.Column('entrance_year', sa.Integer(), nullable=True),
+        sa.Column('required_compulsory', sa.Integer(), nullable=False),
+        sa.Column('required_limited_elective', sa.Integer(), nullable=False),
+        sa.Column('required_limited_standard_elective', sa.Integer(), nullable=False),
+        sa.Column('required_total', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('course', 'entrance_year', name='uq_requirement_rules_course_year'),
+    )
+    op.create_index('ix_requirement_rules_id', 'requirement_rules', ['id'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_requirement_rules_id', table_name='requirement_rules')
+    op.drop_table('requirement_rules')
+    with op.batch_alter_table('students') as batch_op:
+        batch_op.drop_column('entrance_year')
@@ -0,0 +1,66 @@
+"""full-text search index over students and subjects
+
+Revision ID: 0006_search_index
+Revises: 0005_requirement_rules
+Create Date: 2026-10-18 18:00:00
+
+学生の氏名・メールアドレスと科目名の全文検索索引（SQLite の FTS5、trigram トークナイザ）。
+students / subjects を外部コンテンツとし、トリガーで同期する。既存の行は移行時に索引を作る。
+SQLite 以外のデータベースでは何もしない（検索は元の表に対する ILIKE になる）。
+
+注意: 以降のマイグレーションで students / subjects を batch モード（テーブル再作成）で変更すると
+トリガーが消えるため、そのマイグレーションでトリガーを作り直すこと。
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0006_search_index'
+down_revision: Union[str, None] = '0005_requirement_rules'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+STATEMENTS = [
+    "CREATE VIRTUAL TABLE student_search USING fts5("
+    "name, email, content='students', content_rowid='id', tokenize='trigram')",
+    "CREATE TRIGGER students_search_ai AFTER INSERT ON students BEGIN "
+    "INSERT INTO student_search(rowid, name, email) VALUES (new.id, new.name, new.email); END",
+    "CREATE TRIGGER students_search_ad AFTER DELETE ON students BEGIN "
+    "INSERT INTO student_search(student_search, rowid, name, email) VALUES ('delete', old.id, old.name, old.email); END",
+    "CREATE TRIGGER students_search_au AFTER UPDATE OF name, email ON students BEGIN "
+    "INSERT INTO student_search(student_search, rowid, name, email) VALUES ('delete', old.id, old.name, old.email); "
+    "INSERT INTO student_search(rowid, name, email) VALUES (new.id, new.name, new.email); END",
+    "INSERT INTO student_search(student_search) VALUES ('rebuild')",
+    "CREATE VIRTUAL TABLE subject_search USING fts5("
+    "name, content='subjects', content_rowid='id', tokenize='trigram')",
+    "CREATE TRIGGER subjects_search_ai AFTER INSERT ON subjects BEGIN "
+    "INSERT INTO subject_search(rowid, name) VALUES (new.id, new.name); END",
+    "CREATE TRIGGER subjects_search_ad AFTER DELETE ON subjects BEGIN "
+    "INSERT INTO subject_search(subject_search, rowid, name) VALUES ('delete', old.id, old.name); END",
+    "CREATE TRIGGER subjects_search_au AFTER UPDATE OF name ON subjects BEGIN "
+    "INSERT INTO subject_search(subject_search, rowid, name) VALUES ('delete', old.id, old.name); "
+    "INSERT INTO subject_search(rowid, name) VALUES (new.id, new.name); END",
+    "INSERT INTO subject_search(subject_search) VALUES ('rebuild')",
+]
+
+
+def upgrade() -> None:
+    if op.get_context().dialect.name != 'sqlite':
+        return
+    for statement in STATEMENTS:
+        op.execute(statement)
+
+
+def downgrade() -> None:
+    if op.get_context().dialect.name != 'sqlite':
+        return
+    for trigger in (
+        'students_search_ai', 'students_search_ad', 'students_search_au',
+        'subjects_search_ai', 'subjects_search_ad', 'subjects_search_au',
+    ):
+        op.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+    op.execute("DROP TABLE IF EXISTS student_search")
+    op.execute("DROP TABLE IF EXISTS subject_search")
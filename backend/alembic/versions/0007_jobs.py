@@ -0,0 +1,49 @@
+"""background jobs
+
+Revision ID: 0007_jobs
+Revises: 0006_search_index
+Create Date: 2026-10-18 20:00:00
+
+管理者のバックグラウンドジョブ（app.jobs）の状態と進捗を保存する jobs を追加する。
+結果は JOB_DIR のファイルに書き出し、表にはファイル名だけを保存する。
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0007_jobs'
+down_revision: Union[str, None] = '0006_search_index'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'jobs',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('kind', sa.String(), nullable=False),
+        sa.Column('status', sa.String(), nullable=False),
+        sa.Column('params', sa.JSON(), nullable=False),
+        sa.Column('progress', sa.Integer(), nullable=False),
+        sa.Column('total', sa.Integer(), nullable=True),
+        sa.Column('cancel_requested', sa.Boolean(), nullable=False),
+        sa.Column('summary', sa.JSON(), nullable=True),
+        sa.Column('error', sa.String(), nullable=True),
+        sa.Column('result_file', sa.String(), nullable=True),
+        sa.Column('result_media_type', sa.String(), nullable=True),
+        sa.Column('created_by', sa.String(), nullable=True),
+        sa.Column('runner', sa.String(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('started_at', sa.DateTime(), nullable=True),
+        sa.Column('finished_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('ix_jobs_status_id', 'jobs', ['status', 'id'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_jobs_status_id', table_name='jobs')
+    op.drop_table('jobs')
@@ -0,0 +1,70 @@
+"""bigram search index for 1-2 character terms
+
+Revision ID: 0008_search_bigram_index
+Revises: 0007_jobs
+Create Date: 2026-10-18 22:00:00
+
+trigram の全文検索索引（0006）で検索できない 1〜2 文字の語（「林」「田中」など）のための bigram の索引
+（SQLite の FTS5、内容を持たない仮想テーブル）。学生の氏名・メールアドレスと科目名を 2 文字ずつ区切り、
+ASCII を小文字にした UTF-8 の 16 進数を語として入れる（models.SEARCH_INDEXES と同じ形式）。
+トリガーで同期し、既存の行は移行時に索引を作る。
+SQLite 以外のデータベースでは何もしない（検索は元の表に対する ILIKE になる）。
+
+注意: 0006 と同じく、以降のマイグレーションで students / subjects を batch モードで変更すると
+トリガーが消えるため、そのマイグレーションでトリガーを作り直すこと。
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0008_search_bigram_index'
+down_revision: Union[str, None] = '0007_jobs'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# 行の値（row.列）ごとに 2 文字ずつ（最後は 1 文字）取り出し、空白区切りの 16 進数の語にする式
+def _tokens(row: str, columns: Sequence[str]) -> str:
+    values = " UNION ALL ".join(f"SELECT {row}.{c}" + (" AS value" if i == 0 else "") for i, c in enumerate(columns))
+    return (
+        "(SELECT group_concat(hex(substr(lower(v.value), p.key + 1, 2)), ' ') "
+        f"FROM ({values}) AS v, "
+        "json_each('[' || substr(replace(hex(zeroblob(length(v.value))), '00', ',0'), 2) || ']') AS p)"
+    )
+
+
+def _statements(name: str, source: str, columns: Sequence[str]) -> list:
+    prefix = f"{source}_search_bigram"
+    return [
+        f"CREATE VIRTUAL TABLE {name} USING fts5(grams, content='', detail=none, columnsize=0, tokenize='ascii')",
+        f"CREATE TRIGGER {prefix}_ai AFTER INSERT ON {source} BEGIN "
+        f"INSERT INTO {name}(rowid, grams) VALUES (new.id, {_tokens('new', columns)}); END",
+        f"CREATE TRIGGER {prefix}_ad AFTER DELETE ON {source} BEGIN "
+        f"INSERT INTO {name}({name}, rowid, grams) VALUES ('delete', old.id, {_tokens('old', columns)}); END",
+        f"CREATE TRIGGER {prefix}_au AFTER UPDATE OF {', '.join(columns)} ON {source} BEGIN "
+        f"INSERT INTO {name}({name}, rowid, grams) VALUES ('delete', old.id, {_tokens('old', columns)}); "
+        f"INSERT INTO {name}(rowid, grams) VALUES (new.id, {_tokens('new', columns)}); END",
+        f"INSERT INTO {name}(rowid, grams) SELECT id, {_tokens(source, columns)} FROM {source}",
+    ]
+
+
+def upgrade() -> None:
+    if op.get_context().dialect.name != 'sqlite':
+        return
+    for statement in (
+        *_statements('student_search_bigram', 'students', ('name', 'email')),
+        *_statements('subject_search_bigram', 'subjects', ('name',)),
+    ):
+        op.execute(statement)
+
+
+def downgrade() -> None:
+    if op.get_context().dialect.name != 'sqlite':
+        return
+    for source in ('students', 'subjects'):
+        for suffix in ('ai', 'ad', 'au'):
+            op.execute(f"DROP TRIGGER IF EXISTS {source}_search_bigram_{suffix}")
+    op.execute("DROP TABLE IF EXISTS student_search_bigram")
+    op.execute("DROP TABLE IF EXISTS subject_search_bigram")
@@ -0,0 +1,191 @@
+import asyncio
+import inspect
+import math
+import threading
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from functools import wraps
+from typing import Deque, Dict, Iterable, Optional
+
+from fastapi import HTTPException
+
+from . import metrics
+from .config import get_settings
+from .profiling import run_in_threadpool
+
+# ルートグループごとの同時実行数の制限（アドミッション制御）
+#
+# 高負荷時に重い処理がスレッドプールを埋め尽くすと、軽い参照やトークン検証まで後ろに並んで遅くなる。
+# グループごとに同時に実行できる数を制限し、超えた分は長さに上限のある待ち行列で待たせる。
+# 待ち行列が一杯の場合と、待ち時間の上限を超えた場合は、すぐに 503（Retry-After 付き）を返す。
+# 制限していないエンドポイント（詳細の参照など）と、キャッシュに当たった一覧・集計の応答（304 を含む）は影響を受けない
+# （response_cache.cached_or_limited でキャッシュを確認してから枠を取る）。
+#
+# - auth: Firebase のトークン検証（キャッシュに当たらない場合のみ）
+# - credits: 単位計算・卒業計画・一括計算
+# - lists: 一覧・検索・集計
+# - admin_writes: 管理者の書き込み（作成・更新・削除・一括取り込み・カタログ同期・要件ルール）
+#
+# 制限はワーカープロセスごと。実行中・待ち行列の件数と断った件数は /metrics に出力する。
+
+
+@dataclass(frozen=True)
+class GroupLimit:
+    concurrency: int  # 同時に実行できる数（0 以下は無制限）
+    queue_size: int  # 待ち行列の長さの上限
+    timeout: float  # 待ち時間の上限（秒）
+
+
+DEFAULT_LIMITS = {
+    "auth": GroupLimit(concurrency=8, queue_size=64, timeout=2.0),
+    "credits": GroupLimit(concurrency=8, queue_size=32, timeout=2.0),
+    "lists": GroupLimit(concurrency=16, queue_size=128, timeout=1.0),
+    "admin_writes": GroupLimit(concurrency=2, queue_size=16, timeout=10.0),
+}
+
+
+class Overloaded(HTTPException):
+    def __init__(self, group: str, retry_after: int):
+        super().__init__(
+            status_code=503,
+            detail=f"Server is busy ({group}), please retry later",
+            headers={"Retry-After": str(retry_after)},
+        )
+
+
+class Limiter:
+    def __init__(self, group: str, limit: GroupLimit):
+        self.group = group
+        self.limit = limit
+        self.active = 0
+        # 待っているリクエストの Future（先着順）
+        self._waiters: Deque[asyncio.Future] = deque()
+        self._lock = threading.Lock()
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    @property
+    def retry_after(self) -> int:
+        return max(1, math.ceil(self.limit.timeout))
+
+    def _update_metrics(self) -> None:
+        metrics.admission_in_flight.set(self.active, group=self.group)
+        metrics.admission_queue_depth.set(len(self._waiters), group=self.group)
+
+    def _shed(self, reason: str) -> Overloaded:
+        metrics.admission_shed.inc(group=self.group, reason=reason)
+        return Overloaded(self.group, self.retry_after)
+
+    async def acquire(self) -> None:
+        with self._lock:
+            if self.active < self.limit.concurrency and not self._waiters:
+                self.active += 1
+                self._update_metrics()
+                return
+            if len(self._waiters) >= self.limit.queue_size:
+                raise self._shed("queue_full")
+            future = asyncio.get_running_loop().create_future()
+            self._waiters.append(future)
+            self._update_metrics()
+
+        start = time.perf_counter()
+        try:
+            await asyncio.wait_for(future, self.limit.timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            # まだ待ち行列にあれば取り除く。既に枠を渡されていた場合は _grant が次の待ちに回す
+            with self._lock:
+                if future in self._waiters:
+                    self._waiters.remove(future)
+                    self._update_metrics()
+            if isinstance(e, asyncio.TimeoutError):
+                raise self._shed("deadline")
+            raise
+        metrics.admission_wait.observe(time.perf_counter() - start, group=self.group)
+
+    # 枠を返す（待っているリクエストがあれば、実行中の数を変えずにその枠を渡す）
+    def release(self) -> None:
+        with self._lock:
+            if self._waiters:
+                future = self._waiters.popleft()
+                self._update_metrics()
+                future.get_loop().call_soon_threadsafe(self._grant, future)
+                return
+            self.active -= 1
+            self._update_metrics()
+
+    def _grant(self, future: asyncio.Future) -> None:
+        if future.done():
+            # 枠を渡す前に待ち時間の上限を超えた・キャンセルされた場合は次に回す
+            self.release()
+        else:
+            future.set_result(None)
+
+    @asynccontextmanager
+    async def slot(self):
+        if self.limit.concurrency <= 0:
+            yield
+            return
+        await self.acquire()
+        try:
+            yield
+        finally:
+            self.release()
+
+
+_limiters: Dict[str, Limiter] = {}
+
+
+# "グループ=同時実行数:待ち行列の長さ:待ち時間の上限秒" の並びを解析する
+def parse_limits(entries: Iterable[str]) -> Dict[str, GroupLimit]:
+    limits = {}
+    for entry in entries:
+        try:
+            group, values = entry.split("=", 1)
+            concurrency, queue_size, timeout = values.split(":")
+            limits[group.strip()] = GroupLimit(int(concurrency), int(queue_size), float(timeout))
+        except ValueError:
+            raise ValueError(f"invalid admission limit: {entry!r} (expected group=concurrency:queue:timeout)")
+    return limits
+
+
+# グループの制限を設定する（待っているリクエストがない状態で呼ぶ。enabled=False の場合は無制限）
+def configure(limits: Optional[Dict[str, GroupLimit]] = None, enabled: bool = True) -> None:
+    limits = {**DEFAULT_LIMITS, **(limits or {})}
+    for group, limit in limits.items():
+        if not enabled:
+            limit = GroupLimit(0, 0, limit.timeout)
+        limiter = _limiters.get(group)
+        if limiter is None:
+            _limiters[group] = Limiter(group, limit)
+        else:
+            limiter.limit = limit
+
+
+def limiter(group: str) -> Limiter:
+    return _limiters[group]
+
+
+# エンドポイントをグループの制限の下で実行するデコレータ（同期関数はスレッドプールで実行）
+# 認証のデコレータより内側に付け、認証に失敗したリクエストが枠を使わないようにする
+def limited(group: str):
+    if group not in _limiters:
+        raise ValueError(f"unknown admission group: {group}")
+
+    def decorator(func):
+        @wraps(func)
+        async def wrapper(*args, **kwargs):
+            async with _limiters[group].slot():
+                if inspect.iscoroutinefunction(func):
+                    return await func(*args, **kwargs)
+                return await run_in_threadpool(func, *args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+configure(parse_limits(get_settings().admission_limits), enabled=get_settings().admission_enabled)
@@ -0,0 +1,117 @@
+from typing import List, Optional
+
+import numpy as np
+from sqlalchemy import Integer, and_, case, cast, func, literal, select, union_all
+from sqlalchemy.orm import Session
+
+from . import credit_engine, models
+from .schemas import analytics as schemas
+
+# 学生全体の集計（管理者向けの分析）
+#
+# - コース別の単位数の分布: 学生ごとの区分別単位数は単位集計テーブル（student_credit_summary）にあるため、
+#   (コース, 項目, 階級) の GROUP BY で度数だけを読み込み、numpy で項目ごとのヒストグラムにする
+# - 卒業要件の充足率: 単位集計の判定フラグをコースごとに平均する
+# - 科目ごとの修得者数: student_subject を学生のコース・そのコースでの区分ごとに GROUP BY する
+# どれも学生ごとの行を Python に読み込まない。結果はルーター側でデータのバージョンごとにキャッシュする。
+
+HISTOGRAM_FIELDS = (*credit_engine.CREDIT_FIELDS, "total")
+DEFAULT_BIN_WIDTH = 4
+
+
+def _course_order(course: Optional[str]):
+    return (credit_engine.course_index(course), course or "")
+
+
+# コースごとの単位数の分布と卒業要件の充足率（course を指定した場合はそのコースのみ）
+def course_statistics(
+    db: Session, bin_width: int = DEFAULT_BIN_WIDTH, course: Optional[str] = None
+) -> List[schemas.CourseStatistics]:
+    if bin_width < 1:
+        raise ValueError("bin_width must be positive")
+    summary = models.StudentCreditSummary
+    flags = [getattr(summary, f"{field}_met") for field in credit_engine.REQUIREMENT_FIELDS]
+    where = [] if course is None else [summary.course == course]
+
+    stats = select(
+        summary.course,
+        func.count(),
+        *(func.avg(getattr(summary, field)) for field in HISTOGRAM_FIELDS),
+        *(func.max(getattr(summary, field)) for field in HISTOGRAM_FIELDS),
+        *(func.avg(cast(flag, Integer)) for flag in flags),
+        func.avg(case((and_(*flags), 1), else_=0)),
+    ).where(*where).group_by(summary.course)
+    bins = union_all(*(
+        select(
+            summary.course,
+            literal(i).label("field"),
+            (getattr(summary, field) // bin_width).label("bin"),
+            func.count().label("students"),
+        ).where(*where).group_by(summary.course, "bin")
+        for i, field in enumerate(HISTOGRAM_FIELDS)
+    ))
+
+    bin_rows = db.execute(bins).all()
+    results = []
+    n_fields = len(HISTOGRAM_FIELDS)
+    n_flags = len(flags)
+    for row in sorted(db.execute(stats).all(), key=lambda row: _course_order(row[0])):
+        rows = [r for r in bin_rows if r.course == row[0]]
+        field_idx = np.array([r.field for r in rows], dtype=np.int64)
+        bin_idx = np.array([r.bin or 0 for r in rows], dtype=np.int64)
+        counts = np.zeros((n_fields, (bin_idx.max() + 1) if len(rows) else 1), dtype=np.int64)
+        np.add.at(counts, (field_idx, bin_idx), [r.students for r in rows])
+
+        means, maxima = row[2:2 + n_fields], row[2 + n_fields:2 + 2 * n_fields]
+        shares = row[2 + 2 * n_fields:2 + 2 * n_fields + n_flags]
+        histograms = {}
+        for i, field in enumerate(HISTOGRAM_FIELDS):
+            nonzero = np.flatnonzero(counts[i])
+            histograms[field] = schemas.Histogram(
+                bin_width=bin_width,
+                counts=counts[i, :nonzero[-1] + 1 if len(nonzero) else 0].tolist(),
+                mean=float(means[i] or 0.0),
+                max=int(maxima[i] or 0),
+            )
+        results.append(schemas.CourseStatistics(
+            course=row[0],
+            students=row[1],
+            credits=histograms,
+            requirements_met={
+                field: float(share or 0.0) for field, share in zip(credit_engine.REQUIREMENT_FIELDS, shares)
+            },
+            all_requirements_met=float(row[-1] or 0.0),
+        ))
+    return results
+
+
+# コース・科目ごとの修得者数（コースごとに修得者の多い順。course を指定した場合はそのコースの学生のみ）
+def subject_enrollments(db: Session, course: Optional[str] = None) -> List[schemas.SubjectEnrollment]:
+    ss, student, subject, sc = models.student_subject, models.Student, models.Subject, models.SubjectCategory
+    # 修得記録の集計は (コース, 科目ID) だけで行い、科目名・区分は集計後の行に結合する
+    counts = (
+        select(student.course, ss.c.subject_id, func.count().label("students"))
+        .select_from(ss)
+        .join(student, student.id == ss.c.student_id)
+        .group_by(student.course, ss.c.subject_id)
+    )
+    if course is not None:
+        counts = counts.where(student.course == course)
+    counts = counts.subquery()
+    query = (
+        select(counts.c.course, counts.c.subject_id, subject.name, subject.credit, sc.category, counts.c.students)
+        .join(subject, subject.id == counts.c.subject_id)
+        .outerjoin(sc, and_(sc.subject_id == counts.c.subject_id, sc.course == counts.c.course))
+        .order_by(counts.c.course, counts.c.students.desc(), counts.c.subject_id)
+    )
+    return [
+        schemas.SubjectEnrollment(
+            course=row.course,
+            subject_id=row.subject_id,
+            name=row.name,
+            credit=row.credit,
+            category=(row.category or models.SubjectCategoryEnum.ELECTIVE).value,
+            students=row.students,
+        )
+        for row in db.execute(query)
+    ]
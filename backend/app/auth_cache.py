@@ -0,0 +1,133 @@
+import json
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+
+
+# 有効期限付きの LRU キャッシュ（エントリごとに期限を持つ、スレッドセーフ）
+class TTLCache:
+    def __init__(self, maxsize: int = 10000, ttl: float = 300.0, clock: Callable[[], float] = time.time):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._clock = clock
+        self._data: "OrderedDict[Any, Tuple[Any, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return default
+            value, expires_at = item
+            if expires_at <= self._clock():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    # expires_at を指定しない場合は ttl 秒後に失効
+    def set(self, key, value, expires_at: Optional[float] = None) -> None:
+        if expires_at is None:
+            expires_at = self._clock() + self.ttl
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+_MAX_AGE = re.compile(r"max-age=(\d+)")
+
+
+# 署名検証用の公開鍵（kid → 証明書）のキャッシュ
+# Cache-Control の max-age まで保持し、期限が近づいたらバックグラウンドで再取得する
+class SigningKeyCache:
+    def __init__(
+        self,
+        fetch: Callable[[], Tuple[Dict[str, str], float]],
+        refresh_margin: float = 300.0,
+        clock: Callable[[], float] = time.time,
+    ):
+        self._fetch = fetch
+        self._refresh_margin = refresh_margin
+        self._clock = clock
+        self._keys: Dict[str, str] = {}
+        self._expires_at = 0.0
+        self._fetched_at = float("-inf")
+        self._lock = threading.Lock()
+        # 裏の更新中フラグは取得処理とは別のロックで守る（取得中も get() を待たせない）
+        self._refreshing_lock = threading.Lock()
+        self._refreshing = False
+
+    def get(self) -> Dict[str, str]:
+        now = self._clock()
+        if not self._keys or now >= self._expires_at:
+            # 初回・期限切れは同期的に取得する
+            self.refresh()
+        elif now >= self._expires_at - self._refresh_margin:
+            self._refresh_in_background()
+        return self._keys
+
+    # 鍵のローテーションで kid が見つからない場合などに強制的に再取得する
+    # min_interval 秒以内に取得済みであれば再取得しない（不正な kid による連続取得の防止）
+    def refresh(self, min_interval: float = 0.0) -> Dict[str, str]:
+        with self._lock:
+            now = self._clock()
+            if self._keys and now - self._fetched_at < min_interval:
+                return self._keys
+            keys, ttl = self._fetch()
+            self._keys = keys
+            self._fetched_at = now
+            self._expires_at = now + ttl
+            return self._keys
+
+    # 鍵を直接設定する（ローカル署名やテスト用）
+    def set(self, keys: Dict[str, str], ttl: float) -> None:
+        with self._lock:
+            self._keys = dict(keys)
+            self._fetched_at = self._clock()
+            self._expires_at = self._fetched_at + ttl
+
+    def _refresh_in_background(self) -> None:
+        with self._refreshing_lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+
+        def run():
+            try:
+                self.refresh()
+            except Exception:
+                # 取得に失敗しても期限切れまでは既存の鍵を使い続ける
+                pass
+            finally:
+                self._refreshing = False
+
+        threading.Thread(target=run, name="signing-key-refresh", daemon=True).start()
+
+
+# HTTP で公開鍵を取得する関数を作成する（戻り値: (鍵, キャッシュ秒数)）
+def http_key_fetcher(url: str, request_factory: Callable[[], Any], default_ttl: float = 3600.0):
+    def fetch() -> Tuple[Dict[str, str], float]:
+        response = request_factory()(url=url, method="GET")
+        if response.status != 200:
+            raise ValueError(f"Failed to fetch signing keys: HTTP {response.status}")
+        data = response.data.decode("utf-8") if isinstance(response.data, bytes) else response.data
+        match = _MAX_AGE.search(response.headers.get("cache-control", "") or "")
+        ttl = float(match.group(1)) if match else default_ttl
+        return json.loads(data), ttl
+
+    return fetch
@@ -0,0 +1,198 @@
+import csv
+import io
+import json
+import logging
+import re
+from typing import Callable, Iterable, Iterator, List, Optional, Tuple, Union
+
+from pydantic import ValidationError
+from sqlalchemy import insert, or_, select
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+
+from . import credit_summary, models
+from .enrollments import enrollment_pairs, existing_subject_ids, insert_enrollments
+from .schemas.student import ImportRowError, StudentCreate, StudentImportResult
+
+logger = logging.getLogger(__name__)
+
+FORMATS = ("csv", "ndjson")
+DEFAULT_CHUNK_SIZE = 500
+
+# (行番号, 入力レコード) の組。解析に失敗した行はレコードの代わりに例外を持つ
+ParsedRow = Tuple[int, Union[dict, Exception]]
+
+_ID_SEPARATORS = re.compile(r"[\s;,]+")
+
+
+# ファイル名・Content-Type から入力形式を判定する
+def detect_format(filename: Optional[str], content_type: Optional[str]) -> str:
+    name = (filename or "").lower()
+    if name.endswith(".csv") or "csv" in (content_type or ""):
+        return "csv"
+    return "ndjson"
+
+
+# CSV を解析する（completed_subjects 列は空白・セミコロン・カンマ区切りの科目ID）
+def parse_csv(text: str) -> Iterator[ParsedRow]:
+    reader = csv.DictReader(io.StringIO(text))
+    for record in reader:
+        # エクスポート形式（completed_subject_ids 列）もそのまま取り込めるようにする
+        ids = record.pop("completed_subjects", None) or record.pop("completed_subject_ids", None) or ""
+        try:
+            record["completed_subjects"] = [int(s) for s in _ID_SEPARATORS.split(ids.strip()) if s]
+        except ValueError:
+            yield reader.line_num, ValueError(f"invalid completed_subjects: {ids!r}")
+            continue
+        # 空欄の入学年度は未指定として扱う
+        if record.get("entrance_year") == "":
+            record["entrance_year"] = None
+        yield reader.line_num, record
+
+
+# NDJSON を解析する（1 行 1 オブジェクト、空行は無視）
+def parse_ndjson(text: str) -> Iterator[ParsedRow]:
+    for line_no, line in enumerate(text.splitlines(), start=1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+            if not isinstance(record, dict):
+                raise ValueError("each line must be a JSON object")
+            yield line_no, record
+        except ValueError as e:
+            yield line_no, ValueError(f"invalid JSON: {e}")
+
+
+def parse(text: str, format: str) -> Iterator[ParsedRow]:
+    return parse_csv(text) if format == "csv" else parse_ndjson(text)
+
+
+def _validation_message(error: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(loc) for loc in e['loc'])}: {e['msg']}" for e in error.errors()
+    )
+
+
+# 学生と修得科目をチャンクごとに一括挿入する（チャンク単位でコミット）
+def _insert_chunk(db: Session, chunk: List[Tuple[int, StudentCreate]]) -> None:
+    db.execute(insert(models.Student), [
+        {"uid": s.uid, "name": s.name, "course": s.course, "email": s.email, "entrance_year": s.entrance_year}
+        for _, s in chunk
+    ])
+    # 採番された ID は UID から 1 クエリで引く（RETURNING の行順に依存しない）
+    student_ids = dict(db.execute(
+        select(models.Student.uid, models.Student.id).where(models.Student.uid.in_([s.uid for _, s in chunk]))
+    ).all())
+    pairs = []
+    for _, student in chunk:
+        pairs.extend(enrollment_pairs(student_ids[student.uid], student.completed_subjects))
+    insert_enrollments(db, pairs)
+    credit_summary.refresh_student_summaries(db, student_ids.values())
+
+
+# progress が例外を送出して取り込みが止まったときに送出する（元の例外は __cause__）
+# result はそれまでにコミットしたチャンクの取り込み結果（コミット済みの行は取り消されない）
+class ImportInterrupted(Exception):
+    def __init__(self, result: StudentImportResult):
+        super().__init__(f"import interrupted after {result.created} students were created")
+        self.result = result
+
+
+def _result(total: int, created: int, errors: List[ImportRowError]) -> StudentImportResult:
+    errors = sorted(errors, key=lambda e: e.row)
+    return StudentImportResult(total=total, created=created, failed=len(errors), errors=errors)
+
+
+# 成績データ（学生＋修得科目ID）を一括で取り込む
+# 不正な行は行番号付きのエラーとして報告し、残りの行の取り込みは継続する
+# progress には前のチャンクのコミット後と最後に (処理済みの行数, 取り込み対象の行数) を渡す
+# progress が例外を送出した場合は、途中までの結果を持つ ImportInterrupted を送出する
+def import_students(
+    db: Session,
+    rows: Iterable[ParsedRow],
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    progress: Optional[Callable[[int, int], None]] = None,
+) -> StudentImportResult:
+    errors: List[ImportRowError] = []
+    valid: List[Tuple[int, StudentCreate]] = []
+    total = 0
+
+    for row, record in rows:
+        total += 1
+        if isinstance(record, Exception):
+            errors.append(ImportRowError(row=row, error=str(record)))
+            continue
+        try:
+            valid.append((row, StudentCreate.model_validate(record)))
+        except ValidationError as e:
+            errors.append(ImportRowError(row=row, error=_validation_message(e)))
+
+    # 科目カタログとの照合は 1 回のクエリで行う
+    known_subjects = existing_subject_ids(db, {i for _, s in valid for i in s.completed_subjects})
+
+    candidates: List[Tuple[int, StudentCreate]] = []
+    seen_emails, seen_uids = set(), set()
+    for row, student in valid:
+        unknown = sorted(set(student.completed_subjects) - known_subjects)
+        if unknown:
+            errors.append(ImportRowError(row=row, error=f"unknown subject ids: {unknown}"))
+        elif student.email in seen_emails or student.uid in seen_uids:
+            errors.append(ImportRowError(row=row, error="duplicate email or uid in file"))
+        else:
+            seen_emails.add(student.email)
+            seen_uids.add(student.uid)
+            candidates.append((row, student))
+
+    created = 0
+
+    def report(done: int) -> None:
+        if progress is None:
+            return
+        try:
+            progress(done, len(candidates))
+        except Exception as e:
+            raise ImportInterrupted(_result(total, created, errors)) from e
+
+    for start in range(0, len(candidates), chunk_size):
+        if start:
+            report(start)
+        chunk = candidates[start:start + chunk_size]
+
+        # 既存の学生と重複するメールアドレス・UID をチャンクごとに 1 クエリで確認する
+        existing = db.execute(
+            select(models.Student.email, models.Student.uid).where(or_(
+                models.Student.email.in_([s.email for _, s in chunk]),
+                models.Student.uid.in_([s.uid for _, s in chunk]),
+            ))
+        ).all()
+        existing_emails = {row.email for row in existing}
+        existing_uids = {row.uid for row in existing}
+        insertable = []
+        for row, student in chunk:
+            if student.email in existing_emails or student.uid in existing_uids:
+                errors.append(ImportRowError(row=row, error="student with this email or uid already exists"))
+            else:
+                insertable.append((row, student))
+        if not insertable:
+            continue
+
+        try:
+            _insert_chunk(db, insertable)
+            db.commit()
+            created += len(insertable)
+        except SQLAlchemyError as e:
+            db.rollback()
+            logger.warning(f"Bulk insert failed, retrying chunk row by row: {str(e)}")
+            # チャンク全体が失敗した場合は 1 行ずつ取り込んで原因の行だけを報告する
+            for row, student in insertable:
+                try:
+                    _insert_chunk(db, [(row, student)])
+                    db.commit()
+                    created += 1
+                except SQLAlchemyError as row_error:
+                    db.rollback()
+                    errors.append(ImportRowError(row=row, error=str(getattr(row_error, "orig", None) or row_error)))
+
+    report(len(candidates))
+    return _result(total, created, errors)
@@ -0,0 +1,42 @@
+from typing import Iterable, Tuple
+
+from sqlalchemy import insert, select, update
+from sqlalchemy.orm import Session
+
+from . import models
+
+# 科目カタログ（subjects / subject_category）のバージョン名
+CATALOG = "catalog"
+# 卒業要件ルール（requirement_rules）のバージョン名
+REQUIREMENT_RULES = "requirement_rules"
+# 学生の修得記録と単位集計（students / student_subject / student_credit_summary）のバージョン名
+# 単位集計を更新する処理（credit_summary）で進める
+ENROLLMENTS = "enrollments"
+
+
+# 現在のバージョンを返す（未登録なら 0）
+def get_version(db: Session, name: str) -> int:
+    version = db.execute(
+        select(models.CacheVersion.version).where(models.CacheVersion.name == name)
+    ).scalar()
+    return version or 0
+
+
+# 複数のバージョンを 1 回のクエリで返す（names の順のタプル、未登録は 0）
+def get_versions(db: Session, names: Iterable[str]) -> Tuple[int, ...]:
+    names = list(names)
+    versions = dict(db.execute(
+        select(models.CacheVersion.name, models.CacheVersion.version).where(models.CacheVersion.name.in_(names))
+    ).all())
+    return tuple(versions.get(name) or 0 for name in names)
+
+
+# バージョンを 1 進める（呼び出し側のトランザクション内で実行し、データの変更と一緒にコミットする）
+def bump_version(db: Session, name: str) -> None:
+    result = db.execute(
+        update(models.CacheVersion)
+        .where(models.CacheVersion.name == name)
+        .values(version=models.CacheVersion.version + 1)
+    )
+    if result.rowcount == 0:
+        db.execute(insert(models.CacheVersion).values(name=name, version=1))
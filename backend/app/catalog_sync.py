@@ -0,0 +1,191 @@
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy import and_, bindparam, delete, insert, select, tuple_, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from . import credit_summary, models
+from .schemas.subject import CatalogSubject, CatalogSyncReport, SubjectCategoryCreate
+
+# 科目カタログの差分同期
+#
+# 現在の subjects / subject_category を 2 回のクエリで読み込んで入力と比較し、変わった行だけを
+# 一括の upsert（INSERT ... ON CONFLICT DO UPDATE）と DELETE で更新する。
+# ON CONFLICT のないデータベースでは、既存のキーを 1 回のクエリで調べて一括の INSERT と UPDATE に分ける。
+# 区分は (subject_id, course) の一意索引で upsert するため、変わらない行の id は維持される。
+# 単位数・区分が変わった科目（と削除した科目）を修得している学生の単位集計も同じトランザクションで更新する。
+
+_UPSERT_DIALECTS = {"sqlite": sqlite.insert, "postgresql": postgresql.insert}
+
+# (subject_id, course) → 区分の値
+CategoryMap = Dict[Tuple[int, str], str]
+
+
+def _upsert(db: Session, table, rows: List[dict], index_elements: List[str], update_columns: List[str]) -> None:
+    if not rows:
+        return
+    dialect = db.get_bind().dialect.name
+    if dialect not in _UPSERT_DIALECTS:
+        _insert_or_update(db, table, rows, index_elements, update_columns)
+        return
+    statement = _UPSERT_DIALECTS[dialect](table)
+    statement = statement.on_conflict_do_update(
+        index_elements=index_elements,
+        set_={column: statement.excluded[column] for column in update_columns},
+    )
+    db.execute(statement, rows)
+
+
+# ON CONFLICT を使わない upsert（既存のキーを調べ、新しい行は一括の INSERT、既存の行はキーごとの一括の UPDATE）
+# 調べてから挿入するまでの間に他のトランザクションが同じキーを挿入した場合は、一意索引の違反になる
+def _insert_or_update(db: Session, table, rows: List[dict], index_elements: List[str], update_columns: List[str]) -> None:
+    columns = [table.c[name] for name in index_elements]
+    keys = [tuple(row[name] for name in index_elements) for row in rows]
+    key = tuple_(*columns) if len(columns) > 1 else columns[0]
+    existing = {
+        tuple(row)
+        for row in db.execute(select(*columns).where(key.in_(keys if len(columns) > 1 else [k[0] for k in keys])))
+    }
+
+    new_rows = [row for row, k in zip(rows, keys) if k not in existing]
+    if new_rows:
+        db.execute(insert(table), new_rows)
+    updates = [row for row, k in zip(rows, keys) if k in existing]
+    if updates:
+        # バインド変数の名前は列名と重ならないようにする
+        statement = (
+            update(table)
+            .where(and_(*(column == bindparam(f"key_{column.name}") for column in columns)))
+            .values({name: bindparam(f"value_{name}") for name in update_columns})
+        )
+        db.execute(statement, [
+            {**{f"key_{name}": row[name] for name in index_elements},
+             **{f"value_{name}": row[name] for name in update_columns}}
+            for row in updates
+        ])
+
+
+# 現在の区分（subject_ids を指定した場合はその科目のみ）
+def current_categories(db: Session, subject_ids: Optional[Iterable[int]] = None) -> CategoryMap:
+    sc = models.SubjectCategory
+    query = select(sc.subject_id, sc.course, sc.category)
+    if subject_ids is not None:
+        query = query.where(sc.subject_id.in_(list(subject_ids)))
+    return {(subject_id, course): category.value for subject_id, course, category in db.execute(query)}
+
+
+@dataclass
+class CategoryDiff:
+    upserts: List[dict] = field(default_factory=list)
+    removals: List[Tuple[int, str]] = field(default_factory=list)
+
+    @property
+    def subject_ids(self) -> Set[int]:
+        return {row["subject_id"] for row in self.upserts} | {subject_id for subject_id, _ in self.removals}
+
+
+# wanted（科目ID → 区分のリスト）と現在の区分を比較する
+# wanted に含まれる科目のうち、wanted にないコースの区分と、removed_subject_ids の科目の区分は削除する
+def category_diff(
+    current: CategoryMap,
+    wanted: Dict[int, List[SubjectCategoryCreate]],
+    removed_subject_ids: Iterable[int] = (),
+) -> CategoryDiff:
+    desired: CategoryMap = {
+        (subject_id, category.course): category.category.value
+        for subject_id, categories in wanted.items()
+        for category in categories
+    }
+    removed_subject_ids = set(removed_subject_ids)
+    return CategoryDiff(
+        upserts=[
+            {"subject_id": subject_id, "course": course, "category": models.SubjectCategoryEnum(category)}
+            for (subject_id, course), category in desired.items()
+            if current.get((subject_id, course)) != category
+        ],
+        removals=[
+            key for key in current
+            if (key[0] in wanted and key not in desired) or key[0] in removed_subject_ids
+        ],
+    )
+
+
+# 区分の差分を一括の upsert と 1 文の DELETE で適用する
+def apply_category_diff(db: Session, diff: CategoryDiff) -> None:
+    _upsert(db, models.SubjectCategory.__table__, diff.upserts, ["subject_id", "course"], ["category"])
+    if diff.removals:
+        sc = models.SubjectCategory
+        db.execute(delete(sc).where(tuple_(sc.subject_id, sc.course).in_(diff.removals)))
+
+
+# 1 科目の区分にコースの重複がないことを確認する（(subject_id, course) は一意）
+def validate_categories(categories: List[SubjectCategoryCreate]) -> None:
+    courses = [category.course for category in categories]
+    duplicates = sorted({course for course in courses if courses.count(course) > 1})
+    if duplicates:
+        raise ValueError(f"duplicate course in categories: {', '.join(duplicates)}")
+
+
+def _validate(subjects: List[CatalogSubject]) -> None:
+    seen = set()
+    for subject in subjects:
+        if subject.id in seen:
+            raise ValueError(f"duplicate subject id: {subject.id}")
+        seen.add(subject.id)
+        try:
+            validate_categories(subject.categories)
+        except ValueError as e:
+            raise ValueError(f"subject {subject.id}: {e}")
+
+
+# カタログ全体を subjects に同期する（delete_missing=True の場合は入力にない科目を削除する）
+# dry_run=True の場合は差分の報告だけを行い、何も変更しない
+# コミットとカタログのバージョン更新は呼び出し側で行う（report.changed が False なら不要）
+def sync_catalog(
+    db: Session, subjects: List[CatalogSubject], delete_missing: bool = False, dry_run: bool = False
+) -> CatalogSyncReport:
+    _validate(subjects)
+    current = {
+        row.id: (row.name, row.credit)
+        for row in db.execute(select(models.Subject.id, models.Subject.name, models.Subject.credit))
+    }
+    created = [s.id for s in subjects if s.id not in current]
+    updated = [s.id for s in subjects if s.id in current and current[s.id] != (s.name, s.credit)]
+    credit_changed = {s.id for s in subjects if s.id in current and current[s.id][1] != s.credit}
+    deleted = sorted(set(current) - {s.id for s in subjects}) if delete_missing else []
+    categories = category_diff(current_categories(db), {s.id: s.categories for s in subjects}, deleted)
+
+    changed_ids = set(created) | set(updated) | (categories.subject_ids - set(deleted))
+    report = CatalogSyncReport(
+        subjects_created=created,
+        subjects_updated=updated,
+        subjects_deleted=deleted,
+        categories_upserted=len(categories.upserts),
+        categories_deleted=len(categories.removals),
+        unchanged=len(subjects) - len(changed_ids),
+        changed=bool(changed_ids or deleted),
+        dry_run=dry_run,
+    )
+    if dry_run or not report.changed:
+        return report
+
+    # 単位数・区分が変わった科目と削除する科目の修得者（修得行を消す前に調べる）
+    affected = credit_summary.students_with_subjects(
+        db, sorted(((credit_changed | categories.subject_ids) - set(created)) | set(deleted))
+    )
+
+    upserted = set(created) | set(updated)
+    _upsert(
+        db, models.Subject.__table__,
+        [{"id": s.id, "name": s.name, "credit": s.credit} for s in subjects if s.id in upserted],
+        ["id"], ["name", "credit"],
+    )
+    apply_category_diff(db, categories)
+    if deleted:
+        ss = models.student_subject
+        db.execute(delete(ss).where(ss.c.subject_id.in_(deleted)))
+        db.execute(delete(models.Subject).where(models.Subject.id.in_(deleted)))
+
+    report.students_refreshed = credit_summary.refresh_student_summaries(db, affected)
+    return report
@@ -0,0 +1,118 @@
+import os
+from dataclasses import dataclass
+from functools import lru_cache
+
+
+def _env_bool(name: str, default: bool = False) -> bool:
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+def _env_int(name: str, default: int) -> int:
+    value = os.getenv(name)
+    return int(value) if value not in (None, "") else default
+
+
+def _env_list(name: str, default: tuple = ()) -> tuple:
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return tuple(item.strip() for item in value.split(",") if item.strip())
+
+
+# 同梱しているサービスアカウントキー（FIREBASE_CREDENTIALS で上書き可能）
+DEFAULT_FIREBASE_CREDENTIALS = os.path.join(os.path.dirname(__file__), "mateko-cresit-firebase-adminsdk.json")
+DEFAULT_ADMIN_UIDS = (
+    "JnoKKgUQTVUKvIJr7JlKHvKSgUw1",
+    # 複数の管理者を設定する場合は、ここにUIDを追加（または ADMIN_UIDS をカンマ区切りで指定）
+)
+
+
+# 環境変数から読み込むアプリケーション設定
+@dataclass(frozen=True)
+class Settings:
+    database_url: str = "sqlite:///./app.db"
+    # 参照系（GET）エンドポイント用の URL（未指定の場合は database_url を読み取り専用の別プールで使う）
+    database_read_url: str = ""
+    # true の場合は非同期エンジン（SQLite は aiosqlite、PostgreSQL は asyncpg）でセッションを作る
+    database_async: bool = False
+    # 非同期エンジンの URL（未指定の場合は database_url から導出）
+    async_database_url: str = ""
+
+    # SQLite の性能設定（接続ごとに PRAGMA で適用）
+    sqlite_journal_mode: str = "WAL"
+    sqlite_synchronous: str = "NORMAL"
+    sqlite_mmap_size: int = 268435456  # 256 MiB
+    sqlite_cache_size: int = -65536  # 負の値は KiB 単位（64 MiB）
+    sqlite_busy_timeout: int = 5000  # ミリ秒
+
+    # PostgreSQL などサーバー型 DB のコネクションプール設定
+    db_pool_size: int = 10
+    db_max_overflow: int = 20
+    db_pool_timeout: int = 30
+    db_pool_recycle: int = 1800
+    db_read_pool_size: int = 20
+
+    # 科目カタログのレスポンスキャッシュ（一覧のクエリ条件ごと）の最大エントリ数
+    subject_cache_size: int = 1024
+
+    # /metrics（Prometheus 形式）と、この時間（ミリ秒）以上かかった SQL 文のログ（0 以下で無効）
+    metrics_enabled: bool = True
+    slow_query_ms: int = 200
+    # 管理者が有効にしたときのリクエストのプロファイルの保存件数（古いものから破棄）
+    profile_buffer_size: int = 20
+
+    # ルートグループごとの同時実行数の制限（app.admission）。false の場合は制限しない
+    admission_enabled: bool = True
+    # 既定値の上書き（"グループ=同時実行数:待ち行列の長さ:待ち時間の上限秒" のカンマ区切り、例: credits=4:32:2）
+    admission_limits: tuple = ()
+
+    # バックグラウンドジョブ（app.jobs）を実行するワーカープロセスの数（0 の場合はこのプロセスでは実行しない）
+    job_workers: int = 2
+    # ジョブの結果ファイルと取り込みファイルの保存先
+    job_dir: str = "./jobs"
+
+    # 起動時（lifespan）の処理。import 時には何も実行しない
+    # テストでは FIREBASE_INIT=false / DB_CREATE_ALL=false でネットワークと DDL を省略する
+    firebase_init: bool = True
+    firebase_credentials: str = DEFAULT_FIREBASE_CREDENTIALS
+    # 管理者 UID へのカスタムクレーム設定（起動をブロックしないようバックグラウンドで実行）
+    setup_admin_claims: bool = True
+    admin_uids: tuple = DEFAULT_ADMIN_UIDS
+    # Alembic を使わない開発環境向けに、起動時に不足しているテーブルを作成する
+    db_create_all: bool = True
+
+
+@lru_cache()
+def get_settings() -> Settings:
+    return Settings(
+        database_url=os.getenv("DATABASE_URL", Settings.database_url),
+        database_read_url=os.getenv("DATABASE_READ_URL", ""),
+        database_async=_env_bool("DATABASE_ASYNC"),
+        async_database_url=os.getenv("ASYNC_DATABASE_URL", ""),
+        sqlite_journal_mode=os.getenv("SQLITE_JOURNAL_MODE", Settings.sqlite_journal_mode),
+        sqlite_synchronous=os.getenv("SQLITE_SYNCHRONOUS", Settings.sqlite_synchronous),
+        sqlite_mmap_size=_env_int("SQLITE_MMAP_SIZE", Settings.sqlite_mmap_size),
+        sqlite_cache_size=_env_int("SQLITE_CACHE_SIZE", Settings.sqlite_cache_size),
+        sqlite_busy_timeout=_env_int("SQLITE_BUSY_TIMEOUT", Settings.sqlite_busy_timeout),
+        db_pool_size=_env_int("DB_POOL_SIZE", Settings.db_pool_size),
+        db_max_overflow=_env_int("DB_MAX_OVERFLOW", Settings.db_max_overflow),
+        db_pool_timeout=_env_int("DB_POOL_TIMEOUT", Settings.db_pool_timeout),
+        db_pool_recycle=_env_int("DB_POOL_RECYCLE", Settings.db_pool_recycle),
+        db_read_pool_size=_env_int("DB_READ_POOL_SIZE", Settings.db_read_pool_size),
+        subject_cache_size=_env_int("SUBJECT_CACHE_SIZE", Settings.subject_cache_size),
+        metrics_enabled=_env_bool("METRICS_ENABLED", Settings.metrics_enabled),
+        slow_query_ms=_env_int("SLOW_QUERY_MS", Settings.slow_query_ms),
+        profile_buffer_size=_env_int("PROFILE_BUFFER_SIZE", Settings.profile_buffer_size),
+        admission_enabled=_env_bool("ADMISSION_ENABLED", Settings.admission_enabled),
+        admission_limits=_env_list("ADMISSION_LIMITS", Settings.admission_limits),
+        job_workers=_env_int("JOB_WORKERS", Settings.job_workers),
+        job_dir=os.getenv("JOB_DIR", Settings.job_dir),
+        firebase_init=_env_bool("FIREBASE_INIT", Settings.firebase_init),
+        firebase_credentials=os.getenv("FIREBASE_CREDENTIALS", Settings.firebase_credentials),
+        setup_admin_claims=_env_bool("SETUP_ADMIN_CLAIMS", Settings.setup_admin_claims),
+        admin_uids=_env_list("ADMIN_UIDS", Settings.admin_uids),
+        db_create_all=_env_bool("DB_CREATE_ALL", Settings.db_create_all),
+    )
@@ -0,0 +1,375 @@
+from dataclasses import dataclass
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from . import models
+from .schemas import credit_calculation as schemas
+
+# 科目区分の整数コード（Credits のフィールド順と一致させる）
+COMPULSORY, LIMITED_ELECTIVE, STANDARD_ELECTIVE, ELECTIVE = range(4)
+CATEGORY_CODES = {
+    models.SubjectCategoryEnum.COMPULSORY: COMPULSORY,
+    models.SubjectCategoryEnum.LIMITED_ELECTIVE: LIMITED_ELECTIVE,
+    models.SubjectCategoryEnum.STANDARD_ELECTIVE: STANDARD_ELECTIVE,
+    models.SubjectCategoryEnum.ELECTIVE: ELECTIVE,
+}
+CREDIT_FIELDS = ("compulsory", "limited_elective", "standard_elective", "elective")
+# 卒業要件の判定項目（RequirementsMet のフィールド順と一致させる）
+REQUIREMENT_FIELDS = ("compulsory", "limited_elective", "limited_standard_elective", "total")
+DETAIL_FIELDS = (
+    "compulsory_subjects",
+    "limited_elective_subjects",
+    "standard_elective_subjects",
+    "elective_subjects",
+)
+
+# コース一覧（未知のコースは最終行＝すべて自由選択として扱う）
+COURSES = ("A", "B", "C")
+_COURSE_INDEX = {course: i for i, course in enumerate(COURSES)}
+
+
+def course_index(course: Optional[str]) -> int:
+    return _COURSE_INDEX.get(course, len(COURSES))
+
+
+# 昇順の ID 配列から各 ID の位置を引く（存在しない ID は -1）
+def _lookup(sorted_ids: np.ndarray, ids: np.ndarray) -> np.ndarray:
+    ids = np.asarray(ids, dtype=np.int64)
+    if len(sorted_ids) == 0:
+        return np.full(len(ids), -1, dtype=np.int64)
+    pos = np.minimum(np.searchsorted(sorted_ids, ids), len(sorted_ids) - 1)
+    return np.where(sorted_ids[pos] == ids, pos, -1)
+
+
+# 科目カタログ（科目ID・単位数・コース別区分表）
+@dataclass(frozen=True)
+class CreditCatalog:
+    subject_ids: np.ndarray  # 昇順の科目ID (n_subjects,)
+    credits: np.ndarray  # 科目ごとの単位数 (n_subjects,)
+    category_table: np.ndarray  # コース×科目の区分コード (len(COURSES) + 1, n_subjects)
+
+    # 科目IDを列インデックスに変換する（存在しない科目は -1）
+    def index_of(self, subject_ids: np.ndarray) -> np.ndarray:
+        return _lookup(self.subject_ids, subject_ids)
+
+
+# (科目ID, 単位数) の行と (コース, 科目ID, 区分) の行からカタログを構築する
+def make_catalog(
+    subjects: Sequence[Tuple[int, Optional[int]]],
+    categories: Sequence[Tuple[str, int, models.SubjectCategoryEnum]],
+) -> CreditCatalog:
+    order = sorted(range(len(subjects)), key=lambda i: subjects[i][0])
+    subject_ids = np.array([subjects[i][0] for i in order], dtype=np.int64)
+    credits = np.array([subjects[i][1] or 0 for i in order], dtype=np.int64)
+
+    category_table = np.full((len(COURSES) + 1, len(subject_ids)), ELECTIVE, dtype=np.int8)
+    if categories:
+        course_idx = np.array([_COURSE_INDEX.get(row[0], -1) for row in categories], dtype=np.int64)
+        codes = np.array([CATEGORY_CODES[row[2]] for row in categories], dtype=np.int8)
+        subject_idx = _lookup(subject_ids, [row[1] for row in categories])
+        valid = (course_idx >= 0) & (subject_idx >= 0)
+        category_table[course_idx[valid], subject_idx[valid]] = codes[valid]
+
+    return CreditCatalog(subject_ids=subject_ids, credits=credits, category_table=category_table)
+
+
+# 科目・区分テーブルを 2 クエリで読み込みカタログを構築する
+# （リクエストの処理では subject_catalog のスナップショットを使い、毎回は読み込まない）
+def load_catalog(db: Session) -> CreditCatalog:
+    subjects = db.query(models.Subject.id, models.Subject.credit).all()
+    categories = db.query(
+        models.SubjectCategory.course,
+        models.SubjectCategory.subject_id,
+        models.SubjectCategory.category,
+    ).all()
+    return make_catalog(subjects, categories)
+
+
+# 卒業要件の判定に使う 4 つの値（必修・限定選択・限定＋標準選択・合計）を区分ごとの単位から求める
+def requirement_progress(category_credits: np.ndarray) -> np.ndarray:
+    return np.column_stack([
+        category_credits[:, COMPULSORY],
+        category_credits[:, LIMITED_ELECTIVE],
+        category_credits[:, LIMITED_ELECTIVE] + category_credits[:, STANDARD_ELECTIVE],
+        category_credits.sum(axis=1),
+    ]) if len(category_credits) else np.zeros((0, 4), dtype=np.int64)
+
+
+# 要件ルール 1 件（course・entrance_year が None のルールはすべてに適用される既定値）
+RuleKey = Tuple[Optional[str], Optional[int]]
+
+
+# コース・入学年度別の卒業要件を配列にまとめた判定器
+# thresholds[k] が k 番目のルールのしきい値（0 行目は CreditRequirement の既定値）で、
+# 学生ごとに (コース, 入学年度) から行番号を引き、単位の配列と一括で比較する
+@dataclass(frozen=True)
+class RequirementEvaluator:
+    thresholds: np.ndarray  # (n_rules + 1, 4)
+    # コースのインデックス → 昇順の (入学年度, 行番号) 。年度 None のルールは -1 として先頭に入る
+    _course_rules: Dict[Optional[int], List[Tuple[int, int]]]
+    version: int = 0
+
+    @classmethod
+    def compile(
+        cls, rules: Iterable[Tuple[RuleKey, schemas.CreditRequirement]], version: int = 0
+    ) -> "RequirementEvaluator":
+        rows = [_requirement_row(schemas.CreditRequirement())]
+        course_rules: Dict[Optional[int], List[Tuple[int, int]]] = {}
+        for (course, entrance_year), requirement in rules:
+            rows.append(_requirement_row(requirement))
+            key = None if course is None else course_index(course)
+            year = -1 if entrance_year is None else entrance_year
+            course_rules.setdefault(key, []).append((year, len(rows) - 1))
+        for entries in course_rules.values():
+            entries.sort()
+        return cls(thresholds=np.array(rows, dtype=np.int64), _course_rules=course_rules, version=version)
+
+    @classmethod
+    def uniform(cls, requirement: schemas.CreditRequirement) -> "RequirementEvaluator":
+        return cls.compile([((None, None), requirement)])
+
+    # (コースのインデックス, 入学年度) に適用するルールの行番号
+    # コースのルール → 全コース共通のルール → 既定値 の順に、入学年度が学生の年度以前で最も新しいものを使う
+    def _resolve(self, course_idx: int, entrance_year: int) -> int:
+        for key in (course_idx, None):
+            match = None
+            for year, row in self._course_rules.get(key, ()):
+                if year == -1 or (entrance_year >= 0 and year <= entrance_year):
+                    match = row
+            if match is not None:
+                return match
+        return 0
+
+    # 学生ごとのしきい値 (n_students, 4)。入学年度が不明な学生は -1 を渡す
+    def thresholds_for(self, course_idx: np.ndarray, entrance_years: np.ndarray) -> np.ndarray:
+        course_idx = np.asarray(course_idx, dtype=np.int64)
+        entrance_years = np.asarray(entrance_years, dtype=np.int64)
+        if len(course_idx) == 0:
+            return np.zeros((0, 4), dtype=np.int64)
+        # 同じ (コース, 年度) の学生はまとめて 1 回だけ解決する
+        pairs, inverse = np.unique(np.column_stack([course_idx, entrance_years]), axis=0, return_inverse=True)
+        rows = np.array([self._resolve(int(c), int(y)) for c, y in pairs], dtype=np.int64)
+        return self.thresholds[rows[inverse.reshape(-1)]]
+
+    def requirement_for(self, course: Optional[str], entrance_year: Optional[int]) -> schemas.CreditRequirement:
+        row = self.thresholds[self._resolve(course_index(course), -1 if entrance_year is None else entrance_year)]
+        return schemas.CreditRequirement(**dict(zip(schemas.CreditRequirement.model_fields, (int(v) for v in row))))
+
+    # 区分ごとの単位からそれぞれの要件を満たすかを判定する (n_students, 4)
+    def evaluate(self, category_credits: np.ndarray, course_idx: np.ndarray, entrance_years: np.ndarray) -> np.ndarray:
+        return requirement_progress(category_credits) >= self.thresholds_for(course_idx, entrance_years)
+
+
+def _requirement_row(requirement: schemas.CreditRequirement) -> List[int]:
+    return [
+        requirement.required_compulsory,
+        requirement.required_limited_elective,
+        requirement.required_limited_standard_elective,
+        requirement.required_total,
+    ]
+
+
+Requirements = Union[schemas.CreditRequirement, RequirementEvaluator, None]
+
+
+def as_evaluator(requirements: Requirements) -> RequirementEvaluator:
+    if isinstance(requirements, RequirementEvaluator):
+        return requirements
+    return RequirementEvaluator.uniform(requirements or schemas.CreditRequirement())
+
+
+def _entrance_years(entrance_years: Optional[Sequence[Optional[int]]], n: int) -> np.ndarray:
+    if entrance_years is None:
+        return np.full(n, -1, dtype=np.int64)
+    return np.array([-1 if y is None else y for y in entrance_years], dtype=np.int64)
+
+
+# コホート全体の単位計算結果
+@dataclass(frozen=True)
+class CohortCredits:
+    student_ids: np.ndarray  # (n_students,)
+    courses: List[str]
+    category_credits: np.ndarray  # 区分ごとの修得単位 (n_students, 4)
+    total: np.ndarray  # (n_students,)
+    requirements_met: np.ndarray  # compulsory / limited / limited+standard / total (n_students, 4)
+    # 重複を除いた履修行（学生インデックス → 科目ID の昇順で整列済み）
+    enrolled_student_idx: np.ndarray
+    enrolled_subject_ids: np.ndarray
+    enrolled_categories: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.student_ids)
+
+    def credits(self, i: int) -> schemas.Credits:
+        values = {field: int(v) for field, v in zip(CREDIT_FIELDS, self.category_credits[i])}
+        return schemas.Credits(**values, total=int(self.total[i]))
+
+    def requirements(self, i: int) -> schemas.RequirementsMet:
+        return schemas.RequirementsMet(**{
+            field: bool(met) for field, met in zip(REQUIREMENT_FIELDS, self.requirements_met[i])
+        })
+
+    # i 番目の学生の修得科目ID（昇順）
+    def subject_ids(self, i: int) -> List[int]:
+        start, end = np.searchsorted(self.enrolled_student_idx, [i, i + 1])
+        return self.enrolled_subject_ids[start:end].tolist()
+
+    def details(self, i: int) -> schemas.CreditDetails:
+        start, end = np.searchsorted(self.enrolled_student_idx, [i, i + 1])
+        subject_ids = self.enrolled_subject_ids[start:end]
+        categories = self.enrolled_categories[start:end]
+        return schemas.CreditDetails(**{
+            field: [str(s) for s in subject_ids[categories == code]]
+            for code, field in enumerate(DETAIL_FIELDS)
+        })
+
+    def summary(self, i: int) -> schemas.StudentCreditSummary:
+        return schemas.StudentCreditSummary(
+            student_id=str(self.student_ids[i]),
+            course=self.courses[i],
+            credits=self.credits(i),
+            requirements_met=self.requirements(i),
+        )
+
+    def calculation(self, i: int) -> schemas.CreditCalculation:
+        return schemas.CreditCalculation(
+            student_id=str(self.student_ids[i]),
+            course=self.courses[i],
+            credits=self.credits(i),
+            requirements_met=self.requirements(i),
+            details=self.details(i),
+        )
+
+    def summaries(self) -> List[schemas.StudentCreditSummary]:
+        return [self.summary(i) for i in range(len(self))]
+
+
+# 学生×科目の疎な接続行列（COO 形式）から全学生の単位を一括計算する
+def compute_cohort_credits(
+    catalog: CreditCatalog,
+    student_ids: Sequence[int],
+    courses: Sequence[str],
+    enrolled_student_ids: Sequence[int],
+    enrolled_subject_ids: Sequence[int],
+    requirements: Requirements = None,
+    entrance_years: Optional[Sequence[Optional[int]]] = None,
+) -> CohortCredits:
+    evaluator = as_evaluator(requirements)
+    student_ids = np.asarray(student_ids, dtype=np.int64)
+    n_students = len(student_ids)
+    n_subjects = len(catalog.subject_ids)
+    course_idx = np.array([course_index(c) for c in courses], dtype=np.int64)
+
+    # 履修行を (学生インデックス, 科目インデックス) に変換し、未知の学生・科目は除外する
+    enr_students = np.asarray(enrolled_student_ids, dtype=np.int64)
+    enr_subjects = np.asarray(enrolled_subject_ids, dtype=np.int64)
+    order = np.argsort(student_ids, kind="stable")
+    pos = _lookup(student_ids[order], enr_students)
+    s_idx = np.where(pos >= 0, order[pos], -1) if n_students else pos
+    j_idx = catalog.index_of(enr_subjects)
+    valid = (s_idx >= 0) & (j_idx >= 0)
+
+    # 中間テーブルの重複行を除去（np.unique により学生→科目順に整列される）
+    keys = np.unique(s_idx[valid] * max(n_subjects, 1) + j_idx[valid])
+    s_idx = keys // max(n_subjects, 1)
+    j_idx = keys % max(n_subjects, 1)
+
+    categories = catalog.category_table[course_idx[s_idx], j_idx].astype(np.int64)
+    category_credits = np.bincount(
+        s_idx * len(CREDIT_FIELDS) + categories,
+        weights=catalog.credits[j_idx],
+        minlength=n_students * len(CREDIT_FIELDS),
+    ).astype(np.int64).reshape(n_students, len(CREDIT_FIELDS))
+    total = category_credits.sum(axis=1)
+
+    # 要件はコース・入学年度ごとのしきい値と配列のまま比較する
+    requirements_met = evaluator.evaluate(category_credits, course_idx, _entrance_years(entrance_years, n_students))
+
+    return CohortCredits(
+        student_ids=student_ids,
+        courses=list(courses),
+        category_credits=category_credits,
+        total=total,
+        requirements_met=requirements_met,
+        enrolled_student_idx=s_idx,
+        enrolled_subject_ids=catalog.subject_ids[j_idx],
+        enrolled_categories=categories,
+    )
+
+
+# students・student_subject を読み込んで一括計算する
+# catalog を省略した場合は subjects・subject_category も読み込む（通常は subject_catalog.get_catalog を渡す）
+def calculate_cohort_credits(
+    db: Session,
+    student_ids: Optional[Sequence[int]] = None,
+    course: Optional[str] = None,
+    requirements: Requirements = None,
+    catalog: Optional[CreditCatalog] = None,
+) -> CohortCredits:
+    if catalog is None:
+        catalog = load_catalog(db)
+
+    students_query = db.query(models.Student.id, models.Student.course, models.Student.entrance_year)
+    enrollments_query = db.query(models.student_subject.c.student_id, models.student_subject.c.subject_id)
+    if student_ids is not None:
+        students_query = students_query.filter(models.Student.id.in_(student_ids))
+        enrollments_query = enrollments_query.filter(models.student_subject.c.student_id.in_(student_ids))
+    if course is not None:
+        students_query = students_query.filter(models.Student.course == course)
+        enrollments_query = enrollments_query.join(
+            models.Student, models.Student.id == models.student_subject.c.student_id
+        ).filter(models.Student.course == course)
+
+    students = students_query.order_by(models.Student.id).all()
+    enrollments = enrollments_query.all()
+
+    return compute_cohort_credits(
+        catalog,
+        student_ids=[row[0] for row in students],
+        courses=[row[1] for row in students],
+        enrolled_student_ids=[row[0] for row in enrollments],
+        enrolled_subject_ids=[row[1] for row in enrollments],
+        requirements=requirements,
+        entrance_years=[row[2] for row in students],
+    )
+
+
+# 学生をサーバーサイドカーソルで chunk_size 件ずつ読み込み、チャンクごとに単位を計算して返す
+# 戻り値は (学生行, 計算結果) の組。メモリ使用量は学生数によらずチャンクサイズで一定
+def iter_cohort_credits(
+    db: Session,
+    course: Optional[str] = None,
+    chunk_size: int = 1000,
+    requirements: Requirements = None,
+    catalog: Optional[CreditCatalog] = None,
+) -> Iterator[Tuple[list, CohortCredits]]:
+    if catalog is None:
+        catalog = load_catalog(db)
+    ss = models.student_subject
+
+    stmt = select(
+        models.Student.id, models.Student.name, models.Student.course, models.Student.email,
+        models.Student.entrance_year,
+    ).order_by(models.Student.id)
+    if course is not None:
+        stmt = stmt.where(models.Student.course == course)
+
+    result = db.execute(stmt.execution_options(yield_per=chunk_size))
+    for students in result.partitions():
+        first_id, last_id = students[0].id, students[-1].id
+        # 学生IDの範囲で履修行を取得（範囲外・他コースの学生の行は計算時に除外される）
+        enrollments = db.execute(
+            select(ss.c.student_id, ss.c.subject_id).where(ss.c.student_id.between(first_id, last_id))
+        ).all()
+        yield students, compute_cohort_credits(
+            catalog,
+            student_ids=[row.id for row in students],
+            courses=[row.course for row in students],
+            enrolled_student_ids=[row[0] for row in enrollments],
+            enrolled_subject_ids=[row[1] for row in enrollments],
+            requirements=requirements,
+            entrance_years=[row.entrance_year for row in students],
+        )
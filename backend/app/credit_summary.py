@@ -0,0 +1,210 @@
+import argparse
+import sys
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from sqlalchemy import delete, event, insert, select
+from sqlalchemy.orm import Session
+
+from . import credit_engine, models, requirements, subject_catalog
+from .cache_versions import ENROLLMENTS, bump_version
+from .schemas import credit_calculation as schemas
+
+# 単位集計テーブル（student_credit_summary）の維持
+# 書き込み系の処理は、変更と同じトランザクション内で影響を受ける学生の行だけを再計算する
+# 集計を変更したときは ENROLLMENTS のバージョンを進める（集計を元にしたキャッシュの無効化に使う）
+# バージョンの行はすべての書き込みが更新するため、変更のたびではなくセッションに印を付け、
+# コミットの直前にトランザクションごとに 1 回だけ進める（行ロックを持つ時間をコミットの間だけにする）
+
+# 集計を変更したセッションの印（Session.info のキー）
+_CHANGED = "credit_summary_changed"
+
+REQUIREMENT_FIELDS = credit_engine.REQUIREMENT_FIELDS
+DEFAULT_CHUNK_SIZE = 1000
+
+
+# 計算結果を集計テーブルの行（dict）に変換する
+def summary_rows(result: credit_engine.CohortCredits) -> List[dict]:
+    rows = []
+    for i in range(len(result)):
+        row = {
+            "student_id": int(result.student_ids[i]),
+            "course": result.courses[i],
+            **{field: int(v) for field, v in zip(credit_engine.CREDIT_FIELDS, result.category_credits[i])},
+            "total": int(result.total[i]),
+            **{f"{field}_met": bool(met) for field, met in zip(REQUIREMENT_FIELDS, result.requirements_met[i])},
+            "details": result.details(i).model_dump(),
+        }
+        rows.append(row)
+    return rows
+
+
+# 集計テーブルの行から /students/calculate-credits のレスポンスを組み立てる
+def calculation_from_row(row: models.StudentCreditSummary) -> schemas.CreditCalculation:
+    return schemas.CreditCalculation(
+        student_id=str(row.student_id),
+        course=row.course,
+        credits=schemas.Credits(**{field: getattr(row, field) for field in (*credit_engine.CREDIT_FIELDS, "total")}),
+        requirements_met=schemas.RequirementsMet(**{field: getattr(row, f"{field}_met") for field in REQUIREMENT_FIELDS}),
+        details=schemas.CreditDetails(**row.details),
+    )
+
+
+# 指定した学生の集計行を再計算して置き換える（存在しない学生の行は削除される）
+def refresh_student_summaries(db: Session, student_ids: Iterable[int]) -> int:
+    student_ids = sorted(set(student_ids))
+    if not student_ids:
+        return 0
+    table = models.StudentCreditSummary.__table__
+    refreshed = 0
+    for start in range(0, len(student_ids), DEFAULT_CHUNK_SIZE):
+        chunk = student_ids[start:start + DEFAULT_CHUNK_SIZE]
+        rows = summary_rows(credit_engine.calculate_cohort_credits(
+            db, student_ids=chunk, requirements=requirements.get_evaluator(db), catalog=subject_catalog.get_catalog(db),
+        ))
+        db.execute(delete(table).where(table.c.student_id.in_(chunk)))
+        if rows:
+            db.execute(insert(table), rows)
+        refreshed += len(rows)
+    db.info[_CHANGED] = True
+    return refreshed
+
+
+# 指定した科目を修得している学生のID（科目からの逆引き索引を使う）
+def students_with_subjects(db: Session, subject_ids: Iterable[int]) -> List[int]:
+    subject_ids = list(subject_ids)
+    if not subject_ids:
+        return []
+    ss = models.student_subject
+    return db.execute(
+        select(ss.c.student_id).where(ss.c.subject_id.in_(subject_ids)).distinct()
+    ).scalars().all()
+
+
+# 指定した科目を修得している学生の集計行を再計算する（科目の単位数・区分の変更時）
+def refresh_for_subjects(db: Session, subject_ids: Iterable[int]) -> int:
+    return refresh_student_summaries(db, students_with_subjects(db, subject_ids))
+
+
+def delete_student_summary(db: Session, student_id: int) -> None:
+    table = models.StudentCreditSummary.__table__
+    db.execute(delete(table).where(table.c.student_id == student_id))
+    db.info[_CHANGED] = True
+
+
+# UID から集計行を 1 回の索引検索で取得する（未作成なら None）
+def summary_for_uid(db: Session, uid: str) -> Optional[models.StudentCreditSummary]:
+    return db.execute(
+        select(models.StudentCreditSummary)
+        .join(models.Student, models.Student.id == models.StudentCreditSummary.student_id)
+        .where(models.Student.uid == uid)
+    ).scalar()
+
+
+# 集計テーブルを全件作り直す
+def rebuild(db: Session, chunk_size: int = DEFAULT_CHUNK_SIZE) -> int:
+    table = models.StudentCreditSummary.__table__
+    db.execute(delete(table))
+    count = 0
+    evaluator = requirements.get_evaluator(db)
+    for _, result in credit_engine.iter_cohort_credits(
+        db, chunk_size=chunk_size, requirements=evaluator, catalog=subject_catalog.get_catalog(db)
+    ):
+        rows = summary_rows(result)
+        db.execute(insert(table), rows)
+        count += len(rows)
+    db.info[_CHANGED] = True
+    db.commit()
+    return count
+
+
+# 全学生の集計行をチャンクごとに再計算してコミットする（バックグラウンドジョブ用）
+# rebuild と違い表を空にしないため、途中でも参照側からは再計算の前か後の行が見える
+# progress にはチャンクのコミットごとに (処理済みの学生数, 学生数) を渡す
+def refresh_all(
+    db: Session, chunk_size: int = DEFAULT_CHUNK_SIZE, progress: Optional[Callable[[int, int], None]] = None
+) -> int:
+    student_ids = db.execute(select(models.Student.id).order_by(models.Student.id)).scalars().all()
+    refreshed = 0
+    for start in range(0, len(student_ids), chunk_size):
+        refreshed += refresh_student_summaries(db, student_ids[start:start + chunk_size])
+        db.commit()
+        if progress is not None:
+            progress(min(start + chunk_size, len(student_ids)), len(student_ids))
+
+    # 削除された学生の行
+    table = models.StudentCreditSummary.__table__
+    db.execute(delete(table).where(table.c.student_id.not_in(select(models.Student.id))))
+    db.info[_CHANGED] = True
+    db.commit()
+    return refreshed
+
+
+# 集計を変更したトランザクションのコミットの直前に ENROLLMENTS のバージョンを 1 回だけ進める
+@event.listens_for(Session, "before_commit")
+def _bump_before_commit(session):
+    if session.info.pop(_CHANGED, False):
+        bump_version(session, ENROLLMENTS)
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_after_rollback(session):
+    session.info.pop(_CHANGED, None)
+
+
+# 集計テーブルと再計算結果を比較し、食い違う学生を (学生ID, 理由) のリストで返す
+def check(db: Session, chunk_size: int = DEFAULT_CHUNK_SIZE) -> List[Tuple[int, str]]:
+    table = models.StudentCreditSummary.__table__
+    columns = [c for c in table.c if c.name != "student_id"]
+    problems: List[Tuple[int, str]] = []
+
+    evaluator = requirements.get_evaluator(db)
+    for students, result in credit_engine.iter_cohort_credits(
+        db, chunk_size=chunk_size, requirements=evaluator, catalog=subject_catalog.get_catalog(db)
+    ):
+        first_id, last_id = students[0].id, students[-1].id
+        stored: Dict[int, dict] = {
+            row.student_id: dict(row._mapping)
+            for row in db.execute(select(table).where(table.c.student_id.between(first_id, last_id)))
+        }
+        for expected in summary_rows(result):
+            actual = stored.get(expected["student_id"])
+            if actual is None:
+                problems.append((expected["student_id"], "missing"))
+                continue
+            mismatched = [c.name for c in columns if actual[c.name] != expected[c.name]]
+            if mismatched:
+                problems.append((expected["student_id"], "mismatch: " + ", ".join(mismatched)))
+
+    # 学生が削除されたのに残っている行
+    orphans = db.execute(
+        select(table.c.student_id).where(table.c.student_id.not_in(select(models.Student.id)))
+    ).scalars().all()
+    problems.extend((student_id, "orphan") for student_id in orphans)
+    return sorted(problems)
+
+
+# python -m app.credit_summary rebuild|check
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    from .database import SessionLocal
+
+    parser = argparse.ArgumentParser(prog="python -m app.credit_summary", description="学生の単位集計テーブルの再構築・整合性チェック")
+    parser.add_argument("command", choices=("rebuild", "check"))
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    args = parser.parse_args(argv)
+
+    db = SessionLocal()
+    try:
+        if args.command == "rebuild":
+            print(f"Rebuilt credit summaries for {rebuild(db, args.chunk_size)} students")
+            return 0
+        problems = check(db, args.chunk_size)
+        for student_id, reason in problems:
+            print(f"student {student_id}: {reason}")
+        print(f"{len(problems)} inconsistent credit summaries")
+        return 1 if problems else 0
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
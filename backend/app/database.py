@@ -1,11 +1,169 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, declarative_base
+from typing import List, Union
 
-SQLALCHEMY_DATABASE_URL = "sqlite:///./app.db"
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import Session, sessionmaker, declarative_base
 
-engine = create_engine(
-    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
-)
+from . import profiling
+from .config import Settings, get_settings
+
+settings = get_settings()
+
+SQLALCHEMY_DATABASE_URL = settings.database_url
+
+_ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+}
+
+
+# 同期用の URL から非同期ドライバの URL を導出する
+def async_url(url: str) -> str:
+    scheme, sep, rest = url.partition("://")
+    return _ASYNC_DRIVERS.get(scheme.split("+")[0], scheme) + sep + rest
+
+
+def is_sqlite(url: str) -> bool:
+    return make_url(url).get_backend_name() == "sqlite"
+
+
+def is_sqlite_memory(url: str) -> bool:
+    return is_sqlite(url) and make_url(url).database in (None, "", ":memory:")
+
+
+# 接続ごとに SQLite の PRAGMA を適用するイベントリスナーを登録する
+# WAL により読み取りと書き込みが並行でき、busy_timeout でロック競合時に即エラーにせず待機する
+def _install_sqlite_pragmas(sync_engine: Engine, settings: Settings, read_only: bool) -> None:
+    pragmas = [
+        f"PRAGMA busy_timeout={int(settings.sqlite_busy_timeout)}",
+        f"PRAGMA journal_mode={settings.sqlite_journal_mode}",
+        f"PRAGMA synchronous={settings.sqlite_synchronous}",
+        f"PRAGMA mmap_size={int(settings.sqlite_mmap_size)}",
+        f"PRAGMA cache_size={int(settings.sqlite_cache_size)}",
+    ]
+    if read_only:
+        pragmas.append("PRAGMA query_only=ON")
+
+    @event.listens_for(sync_engine, "connect")
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for pragma in pragmas:
+                cursor.execute(pragma)
+        finally:
+            cursor.close()
+
+
+def _engine_options(url: str, settings: Settings, read_only: bool) -> dict:
+    if is_sqlite(url):
+        return {"connect_args": {"check_same_thread": False}}
+    # サーバー型 DB はプールサイズを調整し、切断済み接続を事前に検出する
+    return {
+        "pool_size": settings.db_read_pool_size if read_only else settings.db_pool_size,
+        "max_overflow": settings.db_max_overflow,
+        "pool_timeout": settings.db_pool_timeout,
+        "pool_recycle": settings.db_pool_recycle,
+        "pool_pre_ping": True,
+    }
+
+
+# 設定からエンジンを作成する（read_only=True の場合は参照専用のプール）
+def create_db_engine(url: str, settings: Settings = settings, read_only: bool = False) -> Engine:
+    db_engine = create_engine(url, **_engine_options(url, settings, read_only))
+    if is_sqlite(url):
+        _install_sqlite_pragmas(db_engine, settings, read_only)
+    return db_engine
+
+
+def create_async_db_engine(url: str, settings: Settings = settings, read_only: bool = False):
+    options = _engine_options(url, settings, read_only)
+    options.pop("connect_args", None)
+    db_engine = create_async_engine(url, **options)
+    if is_sqlite(url):
+        _install_sqlite_pragmas(db_engine.sync_engine, settings, read_only)
+    return db_engine
+
+
+# 同期エンジン（Alembic・テスト・一括処理・書き込み用）
+engine = create_db_engine(SQLALCHEMY_DATABASE_URL)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# 参照専用エンジン（GET エンドポイント用の別プール、レプリカ URL も指定可能）
+# インメモリ SQLite は接続ごとに別データベースになるため書き込み用エンジンを共用する
+if is_sqlite_memory(SQLALCHEMY_DATABASE_URL) and not settings.database_read_url:
+    read_engine = engine
+else:
+    read_engine = create_db_engine(settings.database_read_url or SQLALCHEMY_DATABASE_URL, read_only=True)
+ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=read_engine)
+
 Base = declarative_base()
+
+# エンドポイントが受け取るセッションの型（設定により AsyncSession または Session）
+DbSession = Union[AsyncSession, Session]
+
+# 非同期エンジン（DATABASE_ASYNC=true の場合のみ作成）
+async_engine = None
+AsyncSessionLocal = None
+async_read_engine = None
+AsyncReadSessionLocal = None
+if settings.database_async:
+    async_engine = create_async_db_engine(settings.async_database_url or async_url(SQLALCHEMY_DATABASE_URL))
+    AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+    async_read_engine = create_async_db_engine(
+        async_url(settings.database_read_url) if settings.database_read_url
+        else settings.async_database_url or async_url(SQLALCHEMY_DATABASE_URL),
+        read_only=True,
+    )
+    AsyncReadSessionLocal = async_sessionmaker(async_read_engine, autoflush=False, expire_on_commit=False)
+
+
+# 作成済みの同期エンジン（非同期エンジンは内部の同期エンジン）。イベントの登録に使う
+def sync_engines() -> List[Engine]:
+    engines = [engine, read_engine]
+    for async_db_engine in (async_engine, async_read_engine):
+        if async_db_engine is not None:
+            engines.append(async_db_engine.sync_engine)
+    return list(dict.fromkeys(engines))
+
+
+async def _yield_session(sync_factory, async_factory):
+    if async_factory is not None:
+        async with async_factory() as db:
+            yield db
+    else:
+        db = sync_factory()
+        try:
+            yield db
+        finally:
+            db.close()
+
+
+# データベースセッションの取得関数（設定に応じて AsyncSession または Session を返す）
+async def get_db():
+    async for db in _yield_session(SessionLocal, AsyncSessionLocal):
+        yield db
+
+
+# 参照専用セッションの取得関数（GET エンドポイント用）
+async def get_read_db():
+    async for db in _yield_session(ReadSessionLocal, AsyncReadSessionLocal):
+        yield db
+
+
+# 同期セッションの取得関数（ストリーミング・一括取り込みなど同期処理のままのエンドポイント用）
+def get_sync_db():
+    db = SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+# 同期 Session を受け取る関数をイベントループを止めずに実行する
+# AsyncSession の場合は run_sync（I/O は await される）、Session の場合はスレッドプールで実行
+# （プロファイル対象のリクエストでは fn を cProfile で計測する）
+async def run_db(db: Union[AsyncSession, Session], fn, *args, **kwargs):
+    if isinstance(db, AsyncSession):
+        return await db.run_sync(lambda session: profiling.call(fn, session, *args, **kwargs))
+    return await profiling.run_in_threadpool(fn, db, *args, **kwargs)
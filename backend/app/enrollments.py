@@ -0,0 +1,78 @@
+from typing import Iterable, List, Optional, Sequence, Set, Tuple
+
+from sqlalchemy import delete, select
+from sqlalchemy.orm import Session
+
+from . import models
+
+
+# 指定された科目IDのうちカタログに存在するものを 1 クエリで返す
+def existing_subject_ids(db: Session, subject_ids: Iterable[int]) -> Set[int]:
+    subject_ids = set(subject_ids)
+    if not subject_ids:
+        return set()
+    rows = db.execute(select(models.Subject.id).where(models.Subject.id.in_(subject_ids)))
+    return {row[0] for row in rows}
+
+
+# student_subject に (学生ID, 科目ID) の組を executemany で一括挿入する
+def insert_enrollments(db: Session, pairs: Sequence[Tuple[int, int]]) -> None:
+    if not pairs:
+        return
+    db.execute(
+        models.student_subject.insert(),
+        [{"student_id": student_id, "subject_id": subject_id} for student_id, subject_id in pairs],
+    )
+
+
+def enrollment_pairs(student_id: int, subject_ids: Iterable[int]) -> List[Tuple[int, int]]:
+    return [(student_id, subject_id) for subject_id in dict.fromkeys(subject_ids)]
+
+
+# 学生が修得済みの科目IDのうち subject_ids に含まれるものを返す（None の場合はすべて）
+# ORM のコレクションは読み込まず、中間テーブルの主キー索引だけを引く
+def enrolled_subject_ids(db: Session, student_id: int, subject_ids: Optional[Iterable[int]] = None) -> Set[int]:
+    ss = models.student_subject
+    query = select(ss.c.subject_id).where(ss.c.student_id == student_id)
+    if subject_ids is not None:
+        subject_ids = set(subject_ids)
+        if not subject_ids:
+            return set()
+        query = query.where(ss.c.subject_id.in_(subject_ids))
+    return set(db.execute(query).scalars())
+
+
+# 学生の修得科目から subject_ids を 1 文の DELETE で削除し、削除した件数を返す
+def delete_enrollments(db: Session, student_id: int, subject_ids: Iterable[int]) -> int:
+    subject_ids = set(subject_ids)
+    if not subject_ids:
+        return 0
+    ss = models.student_subject
+    result = db.execute(delete(ss).where(ss.c.student_id == student_id, ss.c.subject_id.in_(subject_ids)))
+    return result.rowcount
+
+
+# 修得科目の差分（追加・削除）を適用する。科目数によらず一定の文数で実行する
+# 追加は既に修得済みのものを除いて一括挿入し、削除は修得していない科目を無視する
+# 戻り値は実際に追加・削除した科目ID
+def apply_enrollment_diff(
+    db: Session, student_id: int, add: Iterable[int] = (), remove: Iterable[int] = ()
+) -> Tuple[List[int], List[int]]:
+    add = list(dict.fromkeys(add))
+    already = enrolled_subject_ids(db, student_id, add)
+    to_add = [subject_id for subject_id in add if subject_id not in already]
+    removed = sorted(enrolled_subject_ids(db, student_id, remove))
+    delete_enrollments(db, student_id, removed)
+    insert_enrollments(db, enrollment_pairs(student_id, to_add))
+    return to_add, removed
+
+
+# 修得科目を subject_ids に置き換える（現在の科目IDとの差分だけを挿入・削除する）
+def replace_enrollments(db: Session, student_id: int, subject_ids: Iterable[int]) -> Tuple[List[int], List[int]]:
+    wanted = list(dict.fromkeys(subject_ids))
+    current = enrolled_subject_ids(db, student_id)
+    to_add = [subject_id for subject_id in wanted if subject_id not in current]
+    removed = sorted(current - set(wanted))
+    delete_enrollments(db, student_id, removed)
+    insert_enrollments(db, enrollment_pairs(student_id, to_add))
+    return to_add, removed
@@ -1,33 +1,179 @@
-import firebase_admin
-from firebase_admin import credentials, auth
 from fastapi import HTTPException, Security
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
 from functools import wraps
+import hashlib
+import inspect
+import logging
+import os
+import threading
+import time
+
+from . import admission, metrics
+from .auth_cache import SigningKeyCache, TTLCache, http_key_fetcher
+from .config import get_settings
+from .profiling import run_in_threadpool
+
+# firebase_admin / google.auth は import が重く、Firebase の初期化には認証情報の読み込みが必要なため、
+# モジュールの import 時には何もせず、起動時（lifespan）または最初の利用時に初期化する
+
+logger = logging.getLogger(__name__)
 
-# Firebase Admin SDKの認証情報を読み込む
-cred = credentials.Certificate("/Users/ishiikazuma/Desktop/Mateko_credit/backend/app/mateko-cresit-firebase-adminsdk.json")
-firebase_admin.initialize_app(cred)
 # FastAPI の HTTP 認証用のセキュリティスキーム
 security = HTTPBearer()
 
-ADMIN_UIDS = [
-    "JnoKKgUQTVUKvIJr7JlKHvKSgUw1",
-    # 複数の管理者を設定する場合は、ここにUIDを追加
-]
+# 検証済みトークンのキャッシュ（トークンの SHA-256 → デコード結果、トークンの exp まで有効）
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", "10000"))
+# カスタムクレームのキャッシュ（uid → クレーム）
+CLAIMS_CACHE_TTL = float(os.getenv("CLAIMS_CACHE_TTL", "300"))
+
+ID_TOKEN_CERT_URL = "https://www.googleapis.com/robot/v1/metadata/x509/securetoken@system.gserviceaccount.com"
+ID_TOKEN_ISSUER_PREFIX = "https://securetoken.google.com/"
+
+_init_lock = threading.Lock()
+
+
+# Firebase Admin SDK を初期化する（初期化済み、または FIREBASE_INIT=false の場合は何もしない）
+def init_firebase(settings=None):
+    import firebase_admin
+    from firebase_admin import credentials
+
+    settings = settings or get_settings()
+    with _init_lock:
+        try:
+            return firebase_admin.get_app()
+        except ValueError:
+            pass
+        if not settings.firebase_init:
+            return None
+        # Firebase Admin SDKの認証情報を読み込む
+        cred = credentials.Certificate(settings.firebase_credentials)
+        return firebase_admin.initialize_app(cred)
+
+
+# 初期化済みの firebase_admin.auth モジュールを返す
+def _auth():
+    from firebase_admin import auth
+
+    init_firebase()
+    return auth
+
+
+def _http_request():
+    import google.auth.transport.requests
+
+    return google.auth.transport.requests.Request()
+
+
+token_cache = TTLCache(maxsize=TOKEN_CACHE_SIZE)
+claims_cache = TTLCache(maxsize=TOKEN_CACHE_SIZE, ttl=CLAIMS_CACHE_TTL)
+signing_keys = SigningKeyCache(http_key_fetcher(ID_TOKEN_CERT_URL, _http_request))
+
+
+def _token_key(token: str) -> str:
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+
+def _project_id():
+    app = init_firebase()
+    if app is not None and app.project_id:
+        return app.project_id
+    return os.getenv("GOOGLE_CLOUD_PROJECT")
+
+
+# 公開鍵キャッシュを使ってローカルで ID トークンを検証する
+def _decode_id_token(token: str) -> dict:
+    import google.auth.jwt
+
+    project_id = _project_id()
+    if not project_id:
+        # プロジェクトIDが不明な場合は Firebase Admin SDK に任せる
+        return _auth().verify_id_token(token)
+
+    header = google.auth.jwt.decode_header(token)
+    if header.get("alg") != "RS256" or not header.get("kid"):
+        raise ValueError("Firebase ID token has incorrect algorithm or no \"kid\" claim")
+    keys = signing_keys.get()
+    if header["kid"] not in keys:
+        # 鍵がローテーションされた可能性があるため再取得する
+        keys = signing_keys.refresh(min_interval=60)
+
+    claims = google.auth.jwt.decode(token, certs=keys, audience=project_id)
+    if claims.get("iss") != ID_TOKEN_ISSUER_PREFIX + project_id:
+        raise ValueError("Firebase ID token has incorrect \"iss\" (issuer) claim")
+    subject = claims.get("sub")
+    if not isinstance(subject, str) or not subject or len(subject) > 128:
+        raise ValueError("Firebase ID token has invalid \"sub\" (subject) claim")
+    claims["uid"] = subject
+    return claims
+
+
+# uid のカスタムクレームを取得する（TTL キャッシュ付き）
+def get_custom_claims(uid: str) -> dict:
+    claims = claims_cache.get(uid)
+    if claims is None:
+        user = _auth().get_user(uid)
+        claims = user.custom_claims or {}
+        claims_cache.set(uid, claims)
+    return claims
+
+
+# キャッシュ済みの検証結果を返す（なければ None）
+# fetch_claims=False の場合はネットワークアクセスが必要なときも None を返す
+def _cached_token(token: str, fetch_claims: bool = True):
+    decoded_token = token_cache.get(_token_key(token))
+    if decoded_token is None:
+        return None
+    if not fetch_claims and 'admin' not in decoded_token and claims_cache.get(decoded_token['uid']) is None:
+        return None
+    return _with_admin_claim(dict(decoded_token))
+
+
+def _with_admin_claim(decoded_token: dict) -> dict:
+    # カスタムクレームを明示的に取得
+    if 'admin' not in decoded_token:
+        decoded_token['admin'] = get_custom_claims(decoded_token['uid']).get('admin', False)
+    return decoded_token
+
 
 # Firebase トークンを検証する関数
 def verify_token(token: str):
     try:
-        decoded_token = auth.verify_id_token(token)
-        # カスタムクレームを明示的に取得
-        
-        if 'admin' not in decoded_token:
-            # Firebase Admin SDKを使用して最新のカスタムクレームを取得
-            user = auth.get_user(decoded_token['uid'])
-            decoded_token['admin'] = user.custom_claims.get('admin', False) if user.custom_claims else False
-        return decoded_token
+        cached = _cached_token(token)
+        if cached is not None:
+            return cached
+
+        decoded_token = _decode_id_token(token)
+        # トークンの exp まで検証結果を再利用する
+        token_cache.set(_token_key(token), decoded_token, expires_at=float(decoded_token["exp"]))
+        return _with_admin_claim(dict(decoded_token))
     except Exception as e:
         raise HTTPException(status_code=401, detail=f"Invalid authentication credentials: {str(e)}")
+
+
+# イベントループを止めないようにトークンを検証する（キャッシュに無い場合のみスレッドプールで実行）
+# 検証時間はキャッシュに当たった場合とそれ以外に分けて記録する
+# 検証は auth グループの同時実行数の制限の下で行う（待ち時間の上限を超えた場合は 503）
+async def verify_token_async(token: str):
+    start = time.perf_counter()
+    cached = _cached_token(token, fetch_claims=False)
+    if cached is not None:
+        metrics.observe_token_verification(time.perf_counter() - start, "cache", "ok")
+        return cached
+    try:
+        async with admission.limiter("auth").slot():
+            user = await run_in_threadpool(verify_token, token)
+    except HTTPException:
+        metrics.observe_token_verification(time.perf_counter() - start, "verify", "error")
+        raise
+    metrics.observe_token_verification(time.perf_counter() - start, "verify", "ok")
+    return user
+
+# デコレートされたエンドポイントを実行する（同期関数はスレッドプールで実行）
+async def _call_endpoint(func, *args, **kwargs):
+    if inspect.iscoroutinefunction(func):
+        return await func(*args, **kwargs)
+    return await run_in_threadpool(func, *args, **kwargs)
+
 # 認証が必要なエンドポイント用のデコレータ
 def auth_required(func):
     @wraps(func)
@@ -36,21 +182,22 @@ def auth_required(func):
             raise HTTPException(status_code=401, detail="Authentication required")
         
         token = credentials.credentials  # トークンの取得
-        user = verify_token(token)  # トークンの検証
+        user = await verify_token_async(token)  # トークンの検証
         kwargs["user"] = user  # ユーザ情報を追加
         
         # 非同期関数をラップして実行
-        return await func(*args, **kwargs)
+        return await _call_endpoint(func, *args, **kwargs)
     
     return wrapper
 
 # 管理者アカウントにカスタムクレームを設定する関数
 def set_admin_claim(uid: str):
     try:
-        auth.set_custom_user_claims(uid, {"admin": True})
-        print(f"Admin claim set for user {uid}")
+        _auth().set_custom_user_claims(uid, {"admin": True})
+        claims_cache.pop(uid)
+        logger.info(f"Admin claim set for user {uid}")
     except Exception as e:
-        print(f"Error setting admin claim: {str(e)}")
+        logger.error(f"Error setting admin claim: {str(e)}")
 
 # 管理者権限チェック用のデコレータ
 def admin_required(func):
@@ -60,26 +207,25 @@ def admin_required(func):
             raise HTTPException(status_code=401, detail="Authentication required")
         
         token = credentials.credentials
-        user = verify_token(token)
+        user = await verify_token_async(token)
         
         if not user.get('admin', False):
             raise HTTPException(status_code=403, detail="Admin privileges required")
         
         kwargs["user"] = user
-        return await func(*args, **kwargs)
+        return await _call_endpoint(func, *args, **kwargs)
     
     return wrapper
 
 # 管理者権限をチェックする関数（エンドポイント用）
 async def check_admin(credentials: HTTPAuthorizationCredentials = Security(security)):
     token = credentials.credentials
-    user = verify_token(token)
+    user = await verify_token_async(token)
     return {"is_admin": user.get('admin', False)}
 
-# アプリケーション起動時に管理者クレームを設定する関数
-def setup_admin_claims():
-    for uid in ADMIN_UIDS:
+# アプリケーション起動時に管理者クレームを設定する関数（main の lifespan から呼ぶ）
+def setup_admin_claims(admin_uids=None):
+    if admin_uids is None:
+        admin_uids = get_settings().admin_uids
+    for uid in admin_uids:
         set_admin_claim(uid)
-
-# アプリケーション起動時に実行
-setup_admin_claims()
\ No newline at end of file
@@ -0,0 +1,433 @@
+import asyncio
+import logging
+import multiprocessing
+import os
+import socket
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime, timezone
+from typing import BinaryIO, Callable, Dict, List, Optional
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import func, select, update
+from sqlalchemy.orm import Session, sessionmaker
+
+from . import bulk_import, credit_engine, credit_summary, models, requirements, subject_catalog
+from .config import get_settings
+from .database import create_db_engine, is_sqlite_memory
+from .schemas.student import StudentImportResult
+
+logger = logging.getLogger(__name__)
+
+# 管理者のバックグラウンドジョブ（一括取り込み・単位集計の再構築・エクスポート）
+#
+# HTTP のワーカーを長時間ふさがないよう、重い処理は jobs 表に登録してワーカープロセスで実行する。
+# 外部のブローカーは使わない。各 API プロセスが lifespan でプロセスプールと取り出しのループを起動し、
+# status = 'queued' の行を条件付きの UPDATE で取り出す（複数の API プロセスがあっても 1 つだけが実行する）。
+# ジョブは進捗の報告のたびに取り消しの要求を確認し、結果は JOB_DIR のファイルにチャンクごとに書き出す。
+# 進捗と状態はジョブ本体とは別のセッションで書き込む（SQLite は WAL で読み取り中のジョブと並行できる）。
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+CANCELLED = "cancelled"
+FINISHED = (SUCCEEDED, FAILED, CANCELLED)
+
+# 取り出しのループが jobs 表を確認する間隔（秒）。同じプロセスで登録したジョブはすぐに取り出す
+POLL_INTERVAL = 1.0
+# 進捗を jobs 表に書き込む最小の間隔（秒）
+PROGRESS_INTERVAL = 0.5
+
+
+# summary: 取り消しまでに行った処理の要約（取り消したジョブの summary に記録する）
+class JobCancelled(Exception):
+    def __init__(self, summary: Optional[dict] = None):
+        super().__init__()
+        self.summary = summary
+
+
+# 時刻は UTC（タイムゾーンなし）で保存する
+def _now() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+# ジョブを実行している API プロセスの識別子
+def runner_id() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+# ワーカープロセスでのジョブの実行環境（本体のセッション・パラメータ・進捗の報告・結果ファイル）
+class JobContext:
+    def __init__(self, db: Session, state_db: Session, job: models.Job, job_dir: str):
+        self.db = db
+        self.job_id = job.id
+        self.params = job.params
+        self.job_dir = job_dir
+        self.result_file: Optional[str] = None
+        self.result_media_type: Optional[str] = None
+        self._state_db = state_db
+        self._reported = 0.0
+
+    # 進捗を報告し、取り消しが要求されていれば JobCancelled を送出する
+    # 書き込みは PROGRESS_INTERVAL ごとに間引く（完了時は必ず書き込む）
+    def progress(self, done: int, total: Optional[int] = None) -> None:
+        now = time.monotonic()
+        if now - self._reported < PROGRESS_INTERVAL and done != total:
+            return
+        self._reported = now
+        values = {"progress": done} if total is None else {"progress": done, "total": total}
+        self._state_db.execute(update(models.Job).where(models.Job.id == self.job_id).values(**values))
+        cancel_requested = self._state_db.execute(
+            select(models.Job.cancel_requested).where(models.Job.id == self.job_id)
+        ).scalar()
+        self._state_db.commit()
+        if cancel_requested:
+            raise JobCancelled()
+
+    # 結果ファイルを開く（完了するまでは .part に書き、成功したときに名前を変える）
+    def open_result(self, extension: str, media_type: str) -> BinaryIO:
+        os.makedirs(self.job_dir, exist_ok=True)
+        self.result_file = f"{self.job_id}.{extension}"
+        self.result_media_type = media_type
+        return open(self._part_path(), "wb")
+
+    def _part_path(self) -> str:
+        return os.path.join(self.job_dir, self.result_file + ".part")
+
+    def commit_result(self) -> None:
+        if self.result_file is not None:
+            os.replace(self._part_path(), os.path.join(self.job_dir, self.result_file))
+
+    def discard_result(self) -> None:
+        if self.result_file is not None and os.path.exists(self._part_path()):
+            os.remove(self._part_path())
+        self.result_file = self.result_media_type = None
+
+
+# 単位集計の再計算（チャンクごとにコミットするため、途中でも集計表は空にならない）
+def rebuild_credit_summary(ctx: JobContext) -> dict:
+    chunk_size = ctx.params.get("chunk_size", credit_summary.DEFAULT_CHUNK_SIZE)
+    return {"refreshed": credit_summary.refresh_all(ctx.db, chunk_size, progress=ctx.progress)}
+
+
+# 学生と単位集計のエクスポート（/api/admin/export/students と同じ形式）
+def export_students(ctx: JobContext) -> dict:
+    from .routers.admin import export
+
+    format, course = ctx.params["format"], ctx.params.get("course")
+    query = select(func.count(models.Student.id))
+    if course is not None:
+        query = query.where(models.Student.course == course)
+    total = ctx.db.execute(query).scalar()
+    ctx.progress(0, total)
+
+    exported = 0
+
+    def chunks():
+        nonlocal exported
+        for students, credits in credit_engine.iter_cohort_credits(
+            ctx.db, course=course, chunk_size=ctx.params.get("chunk_size", 1000),
+            requirements=requirements.get_evaluator(ctx.db), catalog=subject_catalog.get_catalog(ctx.db),
+        ):
+            yield students, credits
+            exported += len(students)
+            ctx.progress(exported, total)
+
+    with ctx.open_result(format, export.MEDIA_TYPES[format]) as out:
+        for data in export.FORMATTERS[format](chunks()):
+            out.write(data)
+    return {"exported": exported}
+
+
+# 成績データの一括取り込み（入力は登録時に JOB_DIR に保存したファイル、結果は StudentImportResult の JSON）
+# コミット済みのチャンクは取り消し・失敗でも残るため、取り消した場合は途中までの件数を summary に記録する
+# 入力ファイルは成功した場合だけ削除する（取り消し・失敗の場合は同じファイルで登録し直せるよう残す。
+# 作成済みの学生は「既に存在する」行として報告され、残りの行だけが取り込まれる）
+def import_students(ctx: JobContext) -> dict:
+    path = os.path.join(ctx.job_dir, ctx.params["input"])
+    with open(path, encoding="utf-8-sig") as f:
+        text = f.read()
+    try:
+        result = bulk_import.import_students(
+            ctx.db, bulk_import.parse(text, ctx.params["format"]),
+            chunk_size=ctx.params.get("chunk_size", bulk_import.DEFAULT_CHUNK_SIZE),
+            progress=ctx.progress,
+        )
+    except bulk_import.ImportInterrupted as e:
+        if isinstance(e.__cause__, JobCancelled):
+            raise JobCancelled(_import_summary(e.result)) from e
+        raise e.__cause__
+    with ctx.open_result("json", "application/json") as out:
+        out.write(result.model_dump_json().encode("utf-8"))
+    os.remove(path)
+    return _import_summary(result)
+
+
+def _import_summary(result: StudentImportResult) -> dict:
+    return {"total": result.total, "created": result.created, "failed": result.failed}
+
+
+JOB_KINDS: Dict[str, Callable[[JobContext], dict]] = {
+    "rebuild_credit_summary": rebuild_credit_summary,
+    "export_students": export_students,
+    "import_students": import_students,
+}
+
+
+# ---- ワーカープロセス側 ----
+
+_worker_sessions: Optional[sessionmaker] = None
+_worker_job_dir = ""
+
+
+def init_worker(database_url: str, job_dir: str) -> None:
+    global _worker_sessions, _worker_job_dir
+    _worker_sessions = sessionmaker(autocommit=False, autoflush=False, bind=create_db_engine(database_url))
+    _worker_job_dir = job_dir
+
+
+def _finish(state_db: Session, job_id: int, **values) -> None:
+    state_db.execute(update(models.Job).where(models.Job.id == job_id).values(finished_at=_now(), **values))
+    state_db.commit()
+
+
+# 取り出し済み（running）のジョブを実行し、終了時の状態を返す
+def execute(job_id: int) -> str:
+    db, state_db = _worker_sessions(), _worker_sessions()
+    ctx = None
+    try:
+        job = state_db.get(models.Job, job_id)
+        ctx = JobContext(db, state_db, job, _worker_job_dir)
+        ctx.progress(0)
+        summary = JOB_KINDS[job.kind](ctx)
+        ctx.commit_result()
+        _finish(
+            state_db, job_id, status=SUCCEEDED, summary=summary,
+            result_file=ctx.result_file, result_media_type=ctx.result_media_type,
+        )
+        return SUCCEEDED
+    except JobCancelled as e:
+        db.rollback()
+        ctx.discard_result()
+        _finish(state_db, job_id, status=CANCELLED, summary=e.summary)
+        return CANCELLED
+    except Exception as e:
+        logger.exception(f"Job {job_id} failed")
+        db.rollback()
+        state_db.rollback()
+        if ctx is not None:
+            ctx.discard_result()
+        _finish(state_db, job_id, status=FAILED, error=f"{type(e).__name__}: {e}")
+        return FAILED
+    finally:
+        db.close()
+        state_db.close()
+
+
+# ---- API プロセス側 ----
+
+# ジョブを登録する（このプロセスで実行していれば取り出しのループをすぐに起こす）
+def submit(db: Session, kind: str, params: dict, created_by: Optional[str] = None) -> models.Job:
+    if kind not in JOB_KINDS:
+        raise ValueError(f"unknown job kind: {kind}")
+    job = models.Job(
+        kind=kind, status=QUEUED, params=params, progress=0, cancel_requested=False,
+        created_by=created_by, created_at=_now(),
+    )
+    db.add(job)
+    db.commit()
+    db.refresh(job)
+    if runner is not None:
+        runner.wake()
+    return job
+
+
+# 取り消しを要求する（待機中のジョブはすぐに取り消し、実行中のジョブは次の進捗の報告で止まる）
+def request_cancel(db: Session, job: models.Job) -> models.Job:
+    j = models.Job
+    if job.status == QUEUED:
+        db.execute(
+            update(j).where(j.id == job.id, j.status == QUEUED)
+            .values(status=CANCELLED, cancel_requested=True, finished_at=_now())
+        )
+    db.execute(update(j).where(j.id == job.id, j.status == RUNNING).values(cancel_requested=True))
+    db.commit()
+    db.refresh(job)
+    return job
+
+
+# 待機中のジョブを最大 limit 件取り出して running にする（1 文の条件付き UPDATE で、他のプロセスと重複しない）
+def claim(db: Session, limit: int, runner: str) -> List[int]:
+    j = models.Job
+    queued = select(j.id).where(j.status == QUEUED).order_by(j.id).limit(limit).scalar_subquery()
+    job_ids = db.execute(
+        update(j).where(j.status == QUEUED, j.id.in_(queued))
+        .values(status=RUNNING, runner=runner, started_at=_now())
+        .returning(j.id)
+        .execution_options(synchronize_session=False)
+    ).scalars().all()
+    db.commit()
+    return sorted(job_ids)
+
+
+# ワーカープロセスが状態を書けずに終わったジョブを失敗にする
+def fail(db: Session, job_id: int, error: str) -> None:
+    j = models.Job
+    db.execute(
+        update(j).where(j.id == job_id, j.status == RUNNING)
+        .values(status=FAILED, error=error, finished_at=_now())
+    )
+    db.commit()
+
+
+def _process_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+# 起動時に、このホストで実行中のまま終了したプロセス（自分と同じ PID を含む）のジョブを失敗にする
+def recover(db: Session) -> List[int]:
+    host, me = socket.gethostname(), runner_id()
+    stale = []
+    for job_id, runner in db.execute(select(models.Job.id, models.Job.runner).where(models.Job.status == RUNNING)):
+        runner_host, _, pid = (runner or "").rpartition(":")
+        if runner == me or (runner_host == host and pid.isdigit() and not _process_alive(int(pid))):
+            stale.append(job_id)
+    for job_id in stale:
+        fail(db, job_id, "interrupted: the process running the job exited")
+    return stale
+
+
+class JobRunner:
+    def __init__(self, session_factory: sessionmaker, database_url: str, workers: int, job_dir: str,
+                 poll_interval: float = POLL_INTERVAL):
+        self.session_factory = session_factory
+        self.database_url = database_url
+        self.workers = workers
+        self.job_dir = job_dir
+        self.poll_interval = poll_interval
+        self.id = runner_id()
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._tasks: Dict[int, asyncio.Task] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._dispatcher: Optional[asyncio.Task] = None
+
+    # ワーカープロセスは最初のジョブの実行時に起動する（spawn のため親のスレッド・接続を引き継がない）
+    def _new_pool(self) -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=init_worker,
+            initargs=(self.database_url, self.job_dir),
+        )
+
+    def _with_session(self, fn, *args):
+        db = self.session_factory()
+        try:
+            return fn(db, *args)
+        finally:
+            db.close()
+
+    async def start(self) -> None:
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        self._pool = self._new_pool()
+        try:
+            stale = await run_in_threadpool(self._with_session, recover)
+            if stale:
+                logger.warning(f"Marked interrupted jobs as failed: {stale}")
+        except Exception:
+            logger.exception("Failed to recover interrupted jobs")
+        self._dispatcher = asyncio.create_task(self._dispatch())
+
+    # 終了時は実行中のジョブに取り消しを要求し、止まるのを待つ
+    async def stop(self) -> None:
+        if self._dispatcher is not None:
+            self._dispatcher.cancel()
+            await asyncio.gather(self._dispatcher, return_exceptions=True)
+        if self._tasks:
+            for job_id in list(self._tasks):
+                await run_in_threadpool(self._with_session, _cancel_running, job_id)
+            await asyncio.gather(*self._tasks.values(), return_exceptions=True)
+        if self._pool is not None:
+            self._pool.shutdown()
+
+    # 取り出しのループを起こす（他のスレッドからも呼べる）
+    def wake(self) -> None:
+        if self._loop is not None and not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+
+    async def _dispatch(self) -> None:
+        while True:
+            self._wakeup.clear()
+            free = self.workers - len(self._tasks)
+            if free > 0:
+                try:
+                    job_ids = await run_in_threadpool(self._with_session, claim, free, self.id)
+                except Exception:
+                    logger.exception("Failed to claim jobs")
+                    job_ids = []
+                for job_id in job_ids:
+                    self._tasks[job_id] = asyncio.create_task(self._run(job_id))
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _run(self, job_id: int) -> None:
+        pool = self._pool
+        try:
+            status = await self._loop.run_in_executor(pool, execute, job_id)
+            logger.info(f"Job {job_id} {status}")
+        except BrokenProcessPool:
+            # ワーカープロセスが異常終了した（メモリ不足など）。プールを作り直す
+            logger.error(f"Worker process died while running job {job_id}")
+            await run_in_threadpool(self._with_session, fail, job_id, "worker process exited unexpectedly")
+            if self._pool is pool:
+                self._pool = self._new_pool()
+        except Exception as e:
+            logger.exception(f"Failed to run job {job_id}")
+            await run_in_threadpool(self._with_session, fail, job_id, f"{type(e).__name__}: {e}")
+        finally:
+            self._tasks.pop(job_id, None)
+            self.wake()
+
+
+def _cancel_running(db: Session, job_id: int) -> None:
+    db.execute(update(models.Job).where(models.Job.id == job_id).values(cancel_requested=True))
+    db.commit()
+
+
+# このプロセスの JobRunner（lifespan で起動する。起動していない場合はジョブの登録だけを行う）
+runner: Optional[JobRunner] = None
+
+
+# 結果ファイルと取り込みファイルの保存先
+def job_dir() -> str:
+    return runner.job_dir if runner is not None else os.path.abspath(get_settings().job_dir)
+
+
+async def start_runner(session_factory: sessionmaker, database_url: str, workers: int, job_dir: str,
+                       poll_interval: float = POLL_INTERVAL) -> Optional[JobRunner]:
+    global runner
+    # インメモリ SQLite はワーカープロセスから同じデータベースを開けない
+    if workers <= 0 or is_sqlite_memory(database_url):
+        return None
+    runner = JobRunner(session_factory, database_url, workers, os.path.abspath(job_dir), poll_interval)
+    await runner.start()
+    return runner
+
+
+async def stop_runner() -> None:
+    global runner
+    if runner is not None:
+        await runner.stop()
+        runner = None
@@ -1,20 +1,51 @@
+from contextlib import asynccontextmanager
+import asyncio
+
 from fastapi import FastAPI, Depends, Security
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 from fastapi.security import HTTPAuthorizationCredentials
-from .database import engine
+from . import jobs, metrics, profiling
+from .config import get_settings
+from .database import SessionLocal, engine, sync_engines
 from .models import Base
 from .routers.admin import subjects, students
 from .routers.admin import admin as admin_router
-from .firebase_auth import auth_required, security
-import firebase_admin
-from firebase_admin import auth
-from firebase_admin import credentials
+from .routers.admin import analytics, export, imports, jobs as jobs_router, profiling as profiling_router, requirements, search
+from .firebase_auth import auth_required, init_firebase, security, setup_admin_claims
 
-# FastAPI アプリケーションの初期化
-app = FastAPI()
 
-# データベースの初期化
-Base.metadata.create_all(bind=engine)
+# 起動・終了時の処理
+# import 時には副作用を持たせず、DB の初期化と Firebase の初期化はここで行う（環境変数で個別に無効化できる）
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    settings = get_settings()
+
+    # データベースの初期化（本番は Alembic のマイグレーションを使い DB_CREATE_ALL=false にする）
+    if settings.db_create_all:
+        await run_in_threadpool(Base.metadata.create_all, bind=engine)
+
+    if settings.firebase_init:
+        await run_in_threadpool(init_firebase, settings)
+
+    # 管理者クレームの設定はネットワーク通信を伴うため、起動を待たせずバックグラウンドで行う
+    background = None
+    if settings.firebase_init and settings.setup_admin_claims:
+        background = asyncio.create_task(run_in_threadpool(setup_admin_claims, settings.admin_uids))
+
+    # バックグラウンドジョブのワーカープロセス（最初のジョブの実行時に起動する。JOB_WORKERS=0 で無効）
+    await jobs.start_runner(SessionLocal, settings.database_url, settings.job_workers, settings.job_dir)
+
+    yield
+
+    await jobs.stop_runner()
+    if background is not None and not background.done():
+        background.cancel()
+
+
+# FastAPI アプリケーションの初期化
+app = FastAPI(lifespan=lifespan)
 
 # CORS ミドルウェアの追加
 app.add_middleware(
@@ -23,8 +54,23 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "X-Total-Count"],  # ページング用ヘッダをフロントエンドから参照可能にする
 )
 
+# 管理者が有効にしたときだけリクエストを cProfile で計測する（無効時はフラグの確認のみ）
+app.add_middleware(profiling.ProfilingMiddleware)
+
+# メトリクス（ルートごとのレイテンシ・SQL 文の数と時間・低速クエリ）
+# ミドルウェアは最後に追加したものが外側になるため、CORS の処理時間も含めて計測される
+if get_settings().metrics_enabled:
+    for db_engine in sync_engines():
+        metrics.instrument_engine(db_engine, slow_query_ms=get_settings().slow_query_ms)
+    app.add_middleware(metrics.MetricsMiddleware)
+
+    @app.get("/metrics", include_in_schema=False)
+    async def read_metrics():
+        return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
 # 認証が必要なエンドポイント
 @app.get("/protected")
 @auth_required
@@ -36,3 +82,10 @@ app.include_router(subjects.router)
 app.include_router(students.router)
 
 app.include_router(admin_router.router)
+app.include_router(export.router)
+app.include_router(imports.router)
+app.include_router(requirements.router)
+app.include_router(profiling_router.router)
+app.include_router(search.router)
+app.include_router(analytics.router)
+app.include_router(jobs_router.router)
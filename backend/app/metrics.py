@@ -0,0 +1,286 @@
+import bisect
+import contextvars
+import logging
+import threading
+import time
+from typing import Dict, Optional, Sequence, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# アプリケーション内で完結するメトリクス（Prometheus のテキスト形式で /metrics に出力する）
+#
+# - ルート（パスのテンプレート）ごとのレイテンシのヒストグラム
+# - リクエストごとの SQL 文の数と DB 時間（エンジンのイベントで計測し、contextvars でリクエストに紐づける）
+# - Firebase のトークン検証時間（キャッシュ・検証の別）
+# - 閾値を超えた SQL 文のログ（発行したルート付き）
+# - 同時実行数の制限（app.admission）の実行中・待ち行列の件数と、503 で断った件数
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 200, 500)
+# どのルートにも一致しなかったリクエスト（ラベルの種類が際限なく増えないよう実パスは使わない）
+UNMATCHED_ROUTE = "<unmatched>"
+# リクエスト外（起動処理・CLI・バックグラウンド）で発行された SQL
+NO_ROUTE = "<none>"
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        key = tuple(labels[name] for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(tuple(labels[name] for name in self.labelnames), 0.0)
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            items = sorted(self._values.items())
+        lines.extend(f"{self.name}{_labels(self.labelnames, key)} {_format(value)}" for key, value in items)
+        return "\n".join(lines)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._values.clear()
+
+
+class Gauge:
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def set(self, value: float, **labels) -> None:
+        key = tuple(labels[name] for name in self.labelnames)
+        with self._lock:
+            self._values[key] = value
+
+    def value(self, **labels) -> float:
+        return self._values.get(tuple(labels[name] for name in self.labelnames), 0.0)
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} gauge"]
+        with self._lock:
+            items = sorted(self._values.items())
+        lines.extend(f"{self.name}{_labels(self.labelnames, key)} {_format(value)}" for key, value in items)
+        return "\n".join(lines)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._values.clear()
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # ラベルの値 → (バケットごとの件数（累積前）, 合計, 件数)
+        self._values: Dict[Tuple, list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels) -> None:
+        key = tuple(labels[name] for name in self.labelnames)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            entry[0][index] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    def count(self, **labels) -> int:
+        entry = self._values.get(tuple(labels[name] for name in self.labelnames))
+        return entry[2] if entry else 0
+
+    def sum(self, **labels) -> float:
+        entry = self._values.get(tuple(labels[name] for name in self.labelnames))
+        return entry[1] if entry else 0.0
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = sorted((key, (list(counts), total, n)) for key, (counts, total, n) in self._values.items())
+        for key, (counts, total, n) in items:
+            cumulative = 0
+            for bound, count in zip((*self.buckets, float("inf")), counts):
+                cumulative += count
+                le = f'le="{_format(bound)}"'
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, key)} {_format(total)}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, key)} {n}")
+        return "\n".join(lines)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._values.clear()
+
+
+request_latency = Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route template", ("method", "route", "status")
+)
+request_db_statements = Histogram(
+    "http_request_db_statements", "SQL statements executed per request", ("route",), buckets=COUNT_BUCKETS
+)
+request_db_seconds = Histogram("http_request_db_seconds", "Time spent in SQL per request", ("route",))
+db_statements = Counter("db_statements_total", "SQL statements executed", ("route",))
+db_seconds = Counter("db_statement_seconds_total", "Time spent in SQL", ("route",))
+slow_queries = Counter("db_slow_queries_total", "SQL statements slower than the slow-query threshold", ("route",))
+token_verification = Histogram(
+    "firebase_token_verify_seconds", "Firebase ID token verification time", ("source", "result")
+)
+admission_in_flight = Gauge("admission_in_flight", "Requests running under the admission limit", ("group",))
+admission_queue_depth = Gauge("admission_queue_depth", "Requests waiting for an admission slot", ("group",))
+admission_wait = Histogram("admission_wait_seconds", "Time spent waiting for an admission slot", ("group",))
+admission_shed = Counter(
+    "admission_shed_total", "Requests rejected with 503 by admission control", ("group", "reason")
+)
+
+METRICS = (
+    request_latency, request_db_statements, request_db_seconds,
+    db_statements, db_seconds, slow_queries, token_verification,
+    admission_in_flight, admission_queue_depth, admission_wait, admission_shed,
+)
+
+
+def render() -> str:
+    return "\n".join(metric.render() for metric in METRICS) + "\n"
+
+
+def reset() -> None:
+    for metric in METRICS:
+        metric.clear()
+
+
+# リクエスト中の SQL の集計（run_in_threadpool / run_sync でも contextvars のコピー経由で同じオブジェクトを参照する）
+class RequestStats:
+    __slots__ = ("scope", "statements", "db_seconds")
+
+    def __init__(self, scope: Optional[dict] = None):
+        self.scope = scope
+        self.statements = 0
+        self.db_seconds = 0.0
+
+    @property
+    def route(self) -> str:
+        if self.scope is None:
+            return NO_ROUTE
+        return route_template(self.scope)
+
+
+_current: contextvars.ContextVar[Optional[RequestStats]] = contextvars.ContextVar("request_stats", default=None)
+
+
+def current_route() -> str:
+    stats = _current.get()
+    return stats.route if stats is not None else NO_ROUTE
+
+
+# ルーティング後に FastAPI が scope に設定するルートのテンプレート（例: /students/{student_id}）
+def route_template(scope: dict) -> str:
+    route = scope.get("route")
+    path = getattr(route, "path", None)
+    return path if path is not None else UNMATCHED_ROUTE
+
+
+# slow_query_ms が 0 以下の場合は低速クエリのログを出さない
+def instrument_engine(engine: Engine, slow_query_ms: float = 0) -> None:
+    threshold = slow_query_ms / 1000 if slow_query_ms > 0 else None
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("metrics_query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        starts = conn.info.get("metrics_query_start")
+        if not starts:
+            return
+        elapsed = time.perf_counter() - starts.pop()
+        stats = _current.get()
+        route = stats.route if stats is not None else NO_ROUTE
+        if stats is not None:
+            stats.statements += 1
+            stats.db_seconds += elapsed
+        db_statements.inc(route=route)
+        db_seconds.inc(elapsed, route=route)
+        if threshold is not None and elapsed >= threshold:
+            slow_queries.inc(route=route)
+            # パラメータには個人情報が含まれるため SQL 文のみを出力する
+            logger.warning("Slow query (%.1f ms) route=%s: %s", elapsed * 1000, route, " ".join(statement.split()))
+
+    # 失敗した文の開始時刻を残さない
+    @event.listens_for(engine, "handle_error")
+    def handle_error(exception_context):
+        connection = exception_context.connection
+        if connection is not None and connection.info.get("metrics_query_start"):
+            connection.info["metrics_query_start"].pop()
+
+
+# 検証にかかった時間を記録する（source: cache / verify、result: ok / error）
+def observe_token_verification(seconds: float, source: str, result: str) -> None:
+    token_verification.observe(seconds, source=source, result=result)
+
+
+# ルートごとのレイテンシと SQL の集計を記録する ASGI ミドルウェア
+class MetricsMiddleware:
+    def __init__(self, app, exclude_paths: Sequence[str] = ("/metrics",)):
+        self.app = app
+        self.exclude_paths = frozenset(exclude_paths)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope.get("path") in self.exclude_paths:
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats(scope)
+        token = _current.set(stats)
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - start
+            _current.reset(token)
+            route = stats.route
+            request_latency.observe(elapsed, method=scope["method"], route=route, status=str(status))
+            request_db_statements.observe(stats.statements, route=route)
+            request_db_seconds.observe(stats.db_seconds, route=route)
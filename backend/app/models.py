@@ -1,13 +1,16 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, Enum as SQLAlchemyEnum,Table
+from sqlalchemy import event, Boolean, Column, DateTime, Integer, JSON, String, ForeignKey, Enum as SQLAlchemyEnum, Table, Index, UniqueConstraint
 from sqlalchemy.orm import relationship
 from .database import Base
 from enum import Enum as PyEnum
 
 
 # 中間テーブルの定義（学生と科目の多対多リレーションシップ）
+# (student_id, subject_id) の複合主キーで重複を防ぎ、学生ごとの検索にも使う
+# 科目ごとの逆引き（受講者数の集計など）には (subject_id, student_id) の索引を使う
 student_subject = Table('student_subject', Base.metadata,
-    Column('student_id', Integer, ForeignKey('students.id')),
-    Column('subject_id', Integer, ForeignKey('subjects.id'))
+    Column('student_id', Integer, ForeignKey('students.id'), primary_key=True),
+    Column('subject_id', Integer, ForeignKey('subjects.id'), primary_key=True),
+    Index('ix_student_subject_subject_student', 'subject_id', 'student_id'),
 )
 
 class Student(Base):
@@ -15,9 +18,10 @@ class Student(Base):
 
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String, index=True)
-    course = Column(String)
+    course = Column(String, index=True)
     email = Column(String, unique=True, index=True)
     uid = Column(String, unique=True, index=True)  # FirebaseのUIDを保存
+    entrance_year = Column(Integer, nullable=True)  # 入学年度（卒業要件の判定に使う）
 
     # リレーションシップの定義
     completed_subjects = relationship("Subject", secondary=student_subject, back_populates="students")
@@ -32,6 +36,12 @@ class SubjectCategoryEnum(PyEnum):
     ELECTIVE = "ELECTIVE"
 class SubjectCategory(Base):
     __tablename__ = "subject_category"
+    __table_args__ = (
+        # 1 科目につきコースごとに区分は 1 つ
+        Index('ux_subject_category_subject_course', 'subject_id', 'course', unique=True),
+        # 単位計算の (course, subject_id) 検索を表だけで完結させるカバリング索引
+        Index('ix_subject_category_course_subject', 'course', 'subject_id', 'category'),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     course = Column(String, nullable=False)  # コース名 (A, B, C)
@@ -51,3 +61,172 @@ class Subject(Base):
 
     # リレーションシップの定義
     students = relationship("Student", secondary="student_subject", back_populates="completed_subjects")
+
+
+# キャッシュのバージョン（名前ごとの単調増加カウンタ）
+# 書き込み時に同じトランザクションで更新し、複数ワーカーのインプロセスキャッシュを整合させる
+class CacheVersion(Base):
+    __tablename__ = "cache_versions"
+
+    name = Column(String, primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+
+
+# 学生ごとの単位集計（credit_engine の計算結果を保存したもの）
+# student_subject・科目の単位・区分が変わったときに、影響を受ける学生の行だけを更新する
+class StudentCreditSummary(Base):
+    __tablename__ = "student_credit_summary"
+
+    student_id = Column(Integer, ForeignKey('students.id'), primary_key=True)
+    course = Column(String)
+    compulsory = Column(Integer, nullable=False, default=0)
+    limited_elective = Column(Integer, nullable=False, default=0)
+    standard_elective = Column(Integer, nullable=False, default=0)
+    elective = Column(Integer, nullable=False, default=0)
+    total = Column(Integer, nullable=False, default=0)
+    compulsory_met = Column(Boolean, nullable=False, default=False)
+    limited_elective_met = Column(Boolean, nullable=False, default=False)
+    limited_standard_elective_met = Column(Boolean, nullable=False, default=False)
+    total_met = Column(Boolean, nullable=False, default=False)
+    details = Column(JSON, nullable=False)  # 区分ごとの修得科目ID（CreditDetails）
+
+
+# コース・入学年度別の卒業要件
+# course が NULL のルールは全コース共通、entrance_year はその年度以降の入学者に適用する（NULL は年度によらない既定値）
+class RequirementRule(Base):
+    __tablename__ = "requirement_rules"
+    __table_args__ = (
+        UniqueConstraint('course', 'entrance_year', name='uq_requirement_rules_course_year'),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    course = Column(String, nullable=True)
+    entrance_year = Column(Integer, nullable=True)
+    required_compulsory = Column(Integer, nullable=False)
+    required_limited_elective = Column(Integer, nullable=False)
+    required_limited_standard_elective = Column(Integer, nullable=False)
+    required_total = Column(Integer, nullable=False)
+
+
+# 管理者のバックグラウンドジョブ（一括取り込み・単位集計の再構築・エクスポート）
+# 状態（queued → running → succeeded / failed / cancelled）と進捗をこの表で管理し、結果はファイルに書き出す（app.jobs）
+class Job(Base):
+    __tablename__ = "jobs"
+    __table_args__ = (
+        # 待ち行列の取り出し（status = 'queued' を id 順）と状態での一覧に使う
+        Index('ix_jobs_status_id', 'status', 'id'),
+    )
+
+    id = Column(Integer, primary_key=True)
+    kind = Column(String, nullable=False)
+    status = Column(String, nullable=False, default="queued")
+    params = Column(JSON, nullable=False)
+    progress = Column(Integer, nullable=False, default=0)  # 処理済みの件数
+    total = Column(Integer, nullable=True)  # 全体の件数（分かっている場合）
+    cancel_requested = Column(Boolean, nullable=False, default=False)
+    summary = Column(JSON, nullable=True)  # 完了時の集計（件数など）
+    error = Column(String, nullable=True)
+    result_file = Column(String, nullable=True)  # JOB_DIR 内の結果ファイル名
+    result_media_type = Column(String, nullable=True)
+    created_by = Column(String, nullable=True)  # 登録した管理者の UID
+    runner = Column(String, nullable=True)  # 実行しているプロセス（"ホスト名:PID"）
+    created_at = Column(DateTime, nullable=False)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+
+
+# 全文検索の索引（SQLite の FTS5）
+# students / subjects を外部コンテンツとする trigram トークナイザの仮想テーブル（3 文字以上の語の検索と順位付け）と、
+# 2 文字ずつ区切った bigram を語とする仮想テーブル（trigram で検索できない 1〜2 文字の語の絞り込み）。
+# どちらも元の表のトリガーが同じトランザクション内で更新する
+# （ORM・一括 INSERT・upsert のどの経路で書き込んでも索引と同期する）
+# メタデータの外で管理するため、create_all / drop_all のイベントで作成・削除する（マイグレーションは 0006・0008）
+#
+# bigram の索引は内容を持たない（content=''）。値ごとに 1 文字目から 2 文字ずつ取り出し（最後は 1 文字）、
+# ASCII を小文字にした UTF-8 の 16 進数を語として入れる（記号を含む語も 1 つの語として扱うため）。
+# 位置の列は zeroblob(文字数) の 16 進数から作った JSON 配列を json_each で展開して作る（トリガー内では WITH が使えない）。
+# 2 文字の語はその語と一致する bigram、1 文字の語はその文字で始まる bigram（前方一致）を検索する（app.search.bigram_expression）。
+
+
+def _bigram_tokens(row: str, columns) -> str:
+    values = " UNION ALL ".join(f"SELECT {row}.{c}" + (" AS value" if i == 0 else "") for i, c in enumerate(columns))
+    return (
+        "(SELECT group_concat(hex(substr(lower(v.value), p.key + 1, 2)), ' ') "
+        f"FROM ({values}) AS v, "
+        "json_each('[' || substr(replace(hex(zeroblob(length(v.value))), '00', ',0'), 2) || ']') AS p)"
+    )
+
+
+def _bigram_index(name: str, source: str, columns) -> tuple:
+    column_list = ", ".join(columns)
+    prefix = f"{source}_search_bigram"
+    return (
+        f"CREATE VIRTUAL TABLE {name} USING fts5(grams, content='', detail=none, columnsize=0, tokenize='ascii')",
+        [
+            f"CREATE TRIGGER IF NOT EXISTS {prefix}_ai AFTER INSERT ON {source} BEGIN "
+            f"INSERT INTO {name}(rowid, grams) VALUES (new.id, {_bigram_tokens('new', columns)}); END",
+            f"CREATE TRIGGER IF NOT EXISTS {prefix}_ad AFTER DELETE ON {source} BEGIN "
+            f"INSERT INTO {name}({name}, rowid, grams) VALUES ('delete', old.id, {_bigram_tokens('old', columns)}); END",
+            f"CREATE TRIGGER IF NOT EXISTS {prefix}_au AFTER UPDATE OF {column_list} ON {source} BEGIN "
+            f"INSERT INTO {name}({name}, rowid, grams) VALUES ('delete', old.id, {_bigram_tokens('old', columns)}); "
+            f"INSERT INTO {name}(rowid, grams) VALUES (new.id, {_bigram_tokens('new', columns)}); END",
+        ],
+        f"INSERT INTO {name}(rowid, grams) SELECT id, {_bigram_tokens(source, columns)} FROM {source}",
+    )
+
+
+# 索引名 → (仮想テーブルの作成, トリガー, 既存の行からの索引の作成)
+SEARCH_INDEXES = {
+    "student_search": (
+        "CREATE VIRTUAL TABLE student_search USING fts5("
+        "name, email, content='students', content_rowid='id', tokenize='trigram')",
+        [
+            "CREATE TRIGGER IF NOT EXISTS students_search_ai AFTER INSERT ON students BEGIN "
+            "INSERT INTO student_search(rowid, name, email) VALUES (new.id, new.name, new.email); END",
+            "CREATE TRIGGER IF NOT EXISTS students_search_ad AFTER DELETE ON students BEGIN "
+            "INSERT INTO student_search(student_search, rowid, name, email) VALUES ('delete', old.id, old.name, old.email); END",
+            "CREATE TRIGGER IF NOT EXISTS students_search_au AFTER UPDATE OF name, email ON students BEGIN "
+            "INSERT INTO student_search(student_search, rowid, name, email) VALUES ('delete', old.id, old.name, old.email); "
+            "INSERT INTO student_search(rowid, name, email) VALUES (new.id, new.name, new.email); END",
+        ],
+        "INSERT INTO student_search(student_search) VALUES ('rebuild')",
+    ),
+    "subject_search": (
+        "CREATE VIRTUAL TABLE subject_search USING fts5("
+        "name, content='subjects', content_rowid='id', tokenize='trigram')",
+        [
+            "CREATE TRIGGER IF NOT EXISTS subjects_search_ai AFTER INSERT ON subjects BEGIN "
+            "INSERT INTO subject_search(rowid, name) VALUES (new.id, new.name); END",
+            "CREATE TRIGGER IF NOT EXISTS subjects_search_ad AFTER DELETE ON subjects BEGIN "
+            "INSERT INTO subject_search(subject_search, rowid, name) VALUES ('delete', old.id, old.name); END",
+            "CREATE TRIGGER IF NOT EXISTS subjects_search_au AFTER UPDATE OF name ON subjects BEGIN "
+            "INSERT INTO subject_search(subject_search, rowid, name) VALUES ('delete', old.id, old.name); "
+            "INSERT INTO subject_search(rowid, name) VALUES (new.id, new.name); END",
+        ],
+        "INSERT INTO subject_search(subject_search) VALUES ('rebuild')",
+    ),
+    "student_search_bigram": _bigram_index("student_search_bigram", "students", ("name", "email")),
+    "subject_search_bigram": _bigram_index("subject_search_bigram", "subjects", ("name",)),
+}
+
+
+@event.listens_for(Base.metadata, "after_create")
+def _create_search_indexes(target, connection, **kw):
+    if connection.dialect.name != "sqlite":
+        return
+    existing = set(connection.exec_driver_sql("SELECT name FROM sqlite_master WHERE type = 'table'").scalars())
+    for name, (create_table, triggers, populate) in SEARCH_INDEXES.items():
+        if name not in existing:
+            connection.exec_driver_sql(create_table)
+            # 既にある行から索引を作る（新しいデータベースでは空）
+            connection.exec_driver_sql(populate)
+        for trigger in triggers:
+            connection.exec_driver_sql(trigger)
+
+
+@event.listens_for(Base.metadata, "after_drop")
+def _drop_search_indexes(target, connection, **kw):
+    if connection.dialect.name != "sqlite":
+        return
+    for name in SEARCH_INDEXES:
+        connection.exec_driver_sql(f"DROP TABLE IF EXISTS {name}")
@@ -0,0 +1,137 @@
+from dataclasses import dataclass
+from typing import Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from .credit_engine import (
+    COMPULSORY, LIMITED_ELECTIVE, STANDARD_ELECTIVE, ELECTIVE, CreditCatalog, course_index,
+)
+from .schemas import credit_calculation as schemas
+
+# 卒業要件を満たすための残り科目を求める（最小の科目数、または最小の単位数）
+#
+# 区分ごとに「x 単位以上を得る最小コスト」を 0/1 ナップサックの DP で求め（x は不足単位の最大値で頭打ち）、
+# 必修＋自由選択・限定選択＋標準選択の組に分けて合成し、最後に合計単位の条件で組み合わせる。
+# 計算量は O(科目数 × K + K²)（K は不足単位数、通常 100 前後）
+
+OBJECTIVES = ("count", "credits")
+_INF = np.iinfo(np.int64).max // 4
+
+
+@dataclass(frozen=True)
+class _CategoryTable:
+    subject_ids: np.ndarray
+    credits: np.ndarray
+    best: np.ndarray  # best[x] = x 単位以上を得る最小コスト
+    take: np.ndarray  # take[i, x] = 科目 i までを使って x 単位以上を得るとき科目 i を選ぶか
+
+    # x 単位以上を得る科目の組を DP 表から復元する
+    def choose(self, x: int) -> List[int]:
+        chosen = []
+        for i in range(len(self.subject_ids) - 1, -1, -1):
+            if x <= 0:
+                break
+            if self.take[i, x]:
+                chosen.append(int(self.subject_ids[i]))
+                x = max(0, x - int(self.credits[i]))
+        return chosen
+
+
+def _category_table(subject_ids: np.ndarray, credits: np.ndarray, costs: np.ndarray, cap: int) -> _CategoryTable:
+    best = np.full(cap + 1, _INF, dtype=np.int64)
+    best[0] = 0
+    take = np.zeros((len(subject_ids), cap + 1), dtype=bool)
+    candidate = np.empty_like(best)
+    for i, (credit, cost) in enumerate(zip(credits.tolist(), costs.tolist())):
+        # candidate[x] = best[max(0, x - credit)] + cost
+        credit = min(credit, cap)
+        candidate[:credit] = best[0] + cost
+        candidate[credit:] = best[:cap + 1 - credit] + cost
+        np.less(candidate, best, out=take[i])
+        np.minimum(candidate, best, out=best)
+    return _CategoryTable(subject_ids=subject_ids, credits=credits, best=best, take=take)
+
+
+# a[x] + b[y] の最小値を、x >= lower かつ min(x + y, cap) >= z の条件で z ごとに求める
+# 戻り値は (コスト, 最適な x) の配列（いずれも長さ cap + 1）
+def _combine(a: np.ndarray, b: np.ndarray, lower: int, cap: int) -> Tuple[np.ndarray, np.ndarray]:
+    zs = np.arange(cap + 1)
+    xs = np.arange(lower, cap + 1)
+    # 行 x・列 z の表で y = max(0, z - x)
+    totals = a[xs][:, None] + b[np.maximum(0, zs[None, :] - xs[:, None])]
+    totals = np.minimum(totals, _INF)
+    arg = totals.argmin(axis=0)
+    return totals[arg, zs], xs[arg]
+
+
+@dataclass(frozen=True)
+class Plan:
+    feasible: bool
+    subject_ids: List[int]
+
+
+def plan_remaining(
+    catalog: CreditCatalog,
+    course: Optional[str],
+    completed_subject_ids: Iterable[int],
+    requirements: Optional[schemas.CreditRequirement] = None,
+    objective: str = "count",
+    excluded_subject_ids: Iterable[int] = (),
+) -> Plan:
+    requirements = requirements or schemas.CreditRequirement()
+    categories = catalog.category_table[course_index(course)].astype(np.int64)
+    credits = catalog.credits
+
+    completed = np.zeros(len(catalog.subject_ids), dtype=bool)
+    idx = catalog.index_of(np.fromiter(completed_subject_ids, dtype=np.int64))
+    completed[idx[idx >= 0]] = True
+    earned = np.bincount(categories[completed], weights=credits[completed], minlength=4).astype(np.int64)
+
+    # 各条件の不足単位
+    need_c = max(0, requirements.required_compulsory - int(earned[COMPULSORY]))
+    need_l = max(0, requirements.required_limited_elective - int(earned[LIMITED_ELECTIVE]))
+    need_ls = max(0, requirements.required_limited_standard_elective
+                  - int(earned[LIMITED_ELECTIVE] + earned[STANDARD_ELECTIVE]))
+    need_total = max(0, requirements.required_total - int(earned.sum()))
+    cap = max(need_c, need_l, need_ls, need_total)
+    if cap == 0:
+        return Plan(feasible=True, subject_ids=[])
+
+    available = ~completed & (credits > 0)
+    excluded = catalog.index_of(np.fromiter(excluded_subject_ids, dtype=np.int64))
+    available[excluded[excluded >= 0]] = False
+
+    # 主目的のコストに副目的を小さな重みで加え、同点の場合の選び方を決める
+    weight = int(credits[available].sum()) + len(catalog.subject_ids) + 1
+    if objective == "credits":
+        costs = credits * weight + 1
+    else:
+        costs = weight + credits
+
+    tables = {}
+    for code in (COMPULSORY, LIMITED_ELECTIVE, STANDARD_ELECTIVE, ELECTIVE):
+        mask = available & (categories == code)
+        tables[code] = _category_table(catalog.subject_ids[mask], credits[mask], costs[mask], cap)
+
+    # 限定選択（x >= need_l）＋標準選択、必修（x >= need_c）＋自由選択 をそれぞれ合成
+    ls_cost, ls_limited = _combine(tables[LIMITED_ELECTIVE].best, tables[STANDARD_ELECTIVE].best, need_l, cap)
+    ce_cost, ce_compulsory = _combine(tables[COMPULSORY].best, tables[ELECTIVE].best, need_c, cap)
+
+    # 限定＋標準で z 単位、残りの合計単位を必修＋自由選択で得る
+    zs = np.arange(need_ls, cap + 1)
+    totals = ls_cost[zs] + ce_cost[np.maximum(0, need_total - zs)]
+    best = int(totals.argmin())
+    if totals[best] >= _INF:
+        return Plan(feasible=False, subject_ids=[])
+
+    z = int(zs[best])
+    w = max(0, need_total - z)
+    x_l = int(ls_limited[z])
+    x_c = int(ce_compulsory[w])
+    chosen = (
+        tables[LIMITED_ELECTIVE].choose(x_l)
+        + tables[STANDARD_ELECTIVE].choose(max(0, z - x_l))
+        + tables[COMPULSORY].choose(x_c)
+        + tables[ELECTIVE].choose(max(0, w - x_c))
+    )
+    return Plan(feasible=True, subject_ids=sorted(chosen))
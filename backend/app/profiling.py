@@ -0,0 +1,273 @@
+import contextvars
+import cProfile
+import itertools
+import marshal
+import pstats
+import random
+import secrets
+import threading
+import time
+from collections import Counter, defaultdict, deque
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+from fastapi.concurrency import run_in_threadpool as _run_in_threadpool
+
+from .config import get_settings
+
+# リクエスト単位のオンデマンドプロファイリング（管理者が有効にしたときだけ動く）
+#
+# - mode="sample": sample_rate の確率でリクエストを選ぶ
+# - mode="header": 有効化時に発行したトークンを PROFILE_HEADER に付けたリクエストだけを選ぶ
+#
+# cProfile はスレッドごとにしか計測できず、イベントループ上では他のリクエストの処理が混ざるため、
+# 選ばれたリクエストがスレッドプール（run_db・同期エンドポイント・トークン検証）で実行する関数を
+# それぞれ cProfile で計測し、リクエストの終了時に 1 つの pstats にまとめる。
+# 結果は pstats（marshal 形式）と flamegraph 用の collapsed stack 形式で、件数上限付きのリングバッファに保存する。
+#
+# 無効時のコストはミドルウェアでのフラグ確認と、スレッドプール呼び出し時の contextvar の確認のみ。
+# 設定とバッファはワーカープロセスごとに持つ。
+
+PROFILE_HEADER = "x-profile-token"
+MODES = ("off", "sample", "header")
+
+
+@dataclass
+class ProfileRecord:
+    id: int
+    created_at: float
+    method: str
+    path: str
+    route: str
+    status: int
+    duration_ms: float
+    profiled_ms: float  # cProfile で計測したスレッドプール上の処理時間
+    stats: bytes  # pstats.Stats.dump_stats と同じ marshal 形式
+    collapsed: str
+
+
+# 選ばれたリクエストの計測中の状態（スレッドごとの cProfile の結果を集める）
+@dataclass
+class _RequestProfile:
+    profiles: List[cProfile.Profile] = field(default_factory=list)
+    profiled_seconds: float = 0.0
+    lock: threading.Lock = field(default_factory=threading.Lock)
+
+    def add(self, profile: cProfile.Profile, seconds: float) -> None:
+        with self.lock:
+            self.profiles.append(profile)
+            self.profiled_seconds += seconds
+
+
+_current: contextvars.ContextVar[Optional[_RequestProfile]] = contextvars.ContextVar("request_profile", default=None)
+
+
+class Profiler:
+    def __init__(self, buffer_size: int = 20):
+        self.mode = "off"
+        self.sample_rate = 0.0
+        self.path_prefix: Optional[str] = None
+        # 残りの計測回数（None は無制限）。0 になると自動的に無効になる
+        self.remaining: Optional[int] = None
+        self.header_token: Optional[str] = None
+        self._records: "deque[ProfileRecord]" = deque(maxlen=buffer_size)
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    @property
+    def active(self) -> bool:
+        return self.mode != "off"
+
+    def configure(
+        self,
+        mode: str,
+        sample_rate: float = 0.0,
+        path_prefix: Optional[str] = None,
+        max_requests: Optional[int] = None,
+        buffer_size: Optional[int] = None,
+    ) -> None:
+        if mode not in MODES:
+            raise ValueError(f"mode must be one of {MODES}")
+        with self._lock:
+            if buffer_size is not None and buffer_size != self._records.maxlen:
+                self._records = deque(self._records, maxlen=buffer_size)
+            self.sample_rate = sample_rate
+            self.path_prefix = path_prefix
+            self.remaining = max_requests
+            # 有効化のたびにトークンを作り直す（以前のトークンは使えなくなる）
+            self.header_token = secrets.token_urlsafe(16) if mode == "header" else None
+            self.mode = mode
+
+    # このリクエストを計測するか（計測回数の上限もここで消費する）
+    def should_profile(self, path: str, headers: Dict[str, str]) -> bool:
+        if self.path_prefix and not path.startswith(self.path_prefix):
+            return False
+        if self.mode == "header":
+            token = headers.get(PROFILE_HEADER)
+            if not token or not self.header_token or not secrets.compare_digest(token, self.header_token):
+                return False
+        elif self.mode != "sample" or random.random() >= self.sample_rate:
+            return False
+        with self._lock:
+            if self.remaining is not None:
+                if self.remaining <= 0:
+                    return False
+                self.remaining -= 1
+                if self.remaining == 0:
+                    self.mode = "off"
+                    self.header_token = None
+        return True
+
+    def add(self, record: ProfileRecord) -> None:
+        with self._lock:
+            self._records.append(record)
+
+    def next_id(self) -> int:
+        return next(self._ids)
+
+    def records(self) -> List[ProfileRecord]:
+        with self._lock:
+            return list(self._records)
+
+    def get(self, profile_id: int) -> Optional[ProfileRecord]:
+        return next((r for r in self.records() if r.id == profile_id), None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._records.clear()
+
+    @property
+    def buffer_size(self) -> int:
+        return self._records.maxlen
+
+
+profiler = Profiler(buffer_size=get_settings().profile_buffer_size)
+
+
+# fn を現在のスレッドの cProfile で計測して実行し、結果をリクエストに追加する
+def _profiled_call(request_profile: _RequestProfile, fn, *args, **kwargs):
+    profile = cProfile.Profile()
+    start = time.perf_counter()
+    try:
+        return profile.runcall(fn, *args, **kwargs)
+    finally:
+        request_profile.add(profile, time.perf_counter() - start)
+
+
+# fastapi.concurrency.run_in_threadpool と同じ（計測中のリクエストでは実行する関数を計測する）
+async def run_in_threadpool(fn, *args, **kwargs):
+    request_profile = _current.get()
+    if request_profile is None:
+        return await _run_in_threadpool(fn, *args, **kwargs)
+    return await _run_in_threadpool(_profiled_call, request_profile, fn, *args, **kwargs)
+
+
+# 同期関数を直接呼ぶ場合（AsyncSession.run_sync など）
+def call(fn, *args, **kwargs):
+    request_profile = _current.get()
+    if request_profile is None:
+        return fn(*args, **kwargs)
+    return _profiled_call(request_profile, fn, *args, **kwargs)
+
+
+def _merge(profiles: List[cProfile.Profile]) -> Optional[pstats.Stats]:
+    stats = None
+    for profile in profiles:
+        profile.create_stats()
+        if not profile.stats:
+            continue
+        if stats is None:
+            stats = pstats.Stats(profile)
+        else:
+            stats.add(profile)
+    return stats
+
+
+def _label(func: Tuple[str, int, str]) -> str:
+    filename, line, name = func
+    if filename == "~":
+        return name  # 組み込み関数
+    return f"{name} ({filename.rsplit('/', 1)[-1]}:{line})"
+
+
+# pstats の呼び出しグラフを collapsed stack 形式（"a;b;c 値"、値はマイクロ秒）に変換する
+# cProfile は呼び出し元→呼び出し先の辺ごとの時間しか持たないため、各関数の時間を呼び出し元ごとの比率で配分する
+def collapsed_stacks(stats: Optional[pstats.Stats], max_depth: int = 64) -> str:
+    if stats is None:
+        return ""
+    children: Dict[tuple, List[Tuple[tuple, float]]] = defaultdict(list)
+    roots = []
+    for func, (cc, nc, tt, ct, callers) in stats.stats.items():
+        if not callers:
+            roots.append(func)
+        for caller, edge in callers.items():
+            children[caller].append((func, edge[3]))
+
+    lines: Counter = Counter()
+
+    def walk(func, stack, cumulative):
+        cc, nc, tt, ct, callers = stats.stats[func]
+        ratio = cumulative / ct if ct else 0.0
+        stack = stack + [_label(func)]
+        own = int(tt * ratio * 1_000_000)
+        if own > 0:
+            lines[";".join(stack)] += own
+        if len(stack) >= max_depth:
+            return
+        for child, edge_cumulative in children.get(func, ()):
+            if child == func or _label(child) in stack:
+                continue  # 再帰呼び出しは展開しない
+            child_cumulative = edge_cumulative * ratio
+            if child_cumulative * 1_000_000 >= 1:
+                walk(child, stack, child_cumulative)
+
+    for root in roots:
+        walk(root, [], stats.stats[root][3])
+    return "\n".join(f"{stack} {value}" for stack, value in sorted(lines.items())) + ("\n" if lines else "")
+
+
+# 選ばれたリクエストを計測する ASGI ミドルウェア（profiler が無効の間はそのまま通す）
+class ProfilingMiddleware:
+    def __init__(self, app, profiler: Profiler = profiler):
+        self.app = app
+        self.profiler = profiler
+
+    async def __call__(self, scope, receive, send):
+        if not self.profiler.active or scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        headers = {key.decode("latin-1"): value.decode("latin-1") for key, value in scope.get("headers", ())}
+        if not self.profiler.should_profile(scope.get("path", ""), headers):
+            await self.app(scope, receive, send)
+            return
+
+        request_profile = _RequestProfile()
+        token = _current.set(request_profile)
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            duration = time.perf_counter() - start
+            _current.reset(token)
+            stats = _merge(request_profile.profiles)
+            route = getattr(scope.get("route"), "path", None)
+            self.profiler.add(ProfileRecord(
+                id=self.profiler.next_id(),
+                created_at=time.time(),
+                method=scope["method"],
+                path=scope.get("path", ""),
+                route=route or "",
+                status=status,
+                duration_ms=duration * 1000,
+                profiled_ms=request_profile.profiled_seconds * 1000,
+                stats=marshal.dumps(stats.stats) if stats is not None else marshal.dumps({}),
+                collapsed=collapsed_stacks(stats),
+            ))
@@ -0,0 +1,85 @@
+import threading
+from typing import Optional
+
+import numpy as np
+from sqlalchemy import bindparam, select, update
+from sqlalchemy.orm import Session
+
+from . import credit_engine, models
+from .cache_versions import REQUIREMENT_RULES, bump_version, get_version
+from .schemas import credit_calculation as schemas
+
+# コース・入学年度別の卒業要件を判定器（credit_engine.RequirementEvaluator）にコンパイルしてキャッシュする
+# ルールのバージョンは cache_versions に保存し、変更時に進めることで各ワーカーのキャッシュを無効化する
+
+_lock = threading.Lock()
+_evaluator: Optional[credit_engine.RequirementEvaluator] = None
+
+
+def compile_rules(db: Session, version: int = 0) -> credit_engine.RequirementEvaluator:
+    rules = db.execute(select(models.RequirementRule).order_by(models.RequirementRule.id)).scalars().all()
+    return credit_engine.RequirementEvaluator.compile(
+        [
+            (
+                (rule.course, rule.entrance_year),
+                schemas.CreditRequirement(**{field: getattr(rule, field) for field in schemas.CreditRequirement.model_fields}),
+            )
+            for rule in rules
+        ],
+        version=version,
+    )
+
+
+# 現在のルールの判定器を返す（バージョンが変わっていなければコンパイル済みのものを再利用する）
+def get_evaluator(db: Session) -> credit_engine.RequirementEvaluator:
+    global _evaluator
+    version = get_version(db, REQUIREMENT_RULES)
+    evaluator = _evaluator
+    if evaluator is not None and evaluator.version == version:
+        return evaluator
+    evaluator = compile_rules(db, version)
+    with _lock:
+        _evaluator = evaluator
+    return evaluator
+
+
+def invalidate() -> None:
+    global _evaluator
+    with _lock:
+        _evaluator = None
+
+
+# ルールの変更後に呼ぶ。バージョンを進め、保存済みの単位集計の要件フラグを再判定する
+# 単位は変わらないため、集計テーブルの単位列に新しい判定器を配列のまま適用するだけで済む
+def rules_changed(db: Session, course: Optional[str] = None) -> int:
+    bump_version(db, REQUIREMENT_RULES)
+    invalidate()
+    evaluator = compile_rules(db, get_version(db, REQUIREMENT_RULES))
+
+    summary = models.StudentCreditSummary
+    stmt = select(
+        summary.student_id, summary.course, models.Student.entrance_year,
+        *(getattr(summary, field) for field in credit_engine.CREDIT_FIELDS),
+    ).join(models.Student, models.Student.id == summary.student_id)
+    if course is not None:
+        stmt = stmt.where(summary.course == course)
+    rows = db.execute(stmt).all()
+    if not rows:
+        return 0
+
+    category_credits = np.array([row[3:] for row in rows], dtype=np.int64)
+    met = evaluator.evaluate(
+        category_credits,
+        np.array([credit_engine.course_index(row.course) for row in rows], dtype=np.int64),
+        np.array([-1 if row.entrance_year is None else row.entrance_year for row in rows], dtype=np.int64),
+    )
+    flags = [f"{field}_met" for field in credit_engine.REQUIREMENT_FIELDS]
+    table = summary.__table__
+    db.execute(
+        update(table).where(table.c.student_id == bindparam("b_student_id")),
+        [
+            {"b_student_id": row.student_id, **{flag: bool(v) for flag, v in zip(flags, met[i])}}
+            for i, row in enumerate(rows)
+        ],
+    )
+    return len(rows)
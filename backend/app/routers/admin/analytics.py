@@ -0,0 +1,78 @@
+from fastapi import APIRouter, Depends, Query, Request, Security
+from fastapi.security import HTTPAuthorizationCredentials
+from pydantic import TypeAdapter
+from sqlalchemy.orm import Session
+from typing import List, Optional
+
+from ... import analytics
+from ...cache_versions import CATALOG, ENROLLMENTS, REQUIREMENT_RULES, get_versions
+from ...database import DbSession, get_read_db
+from ...firebase_auth import admin_required, security
+from ..response_cache import VersionedResponseCache, cached_or_limited
+from ...schemas.analytics import CourseStatistics, SubjectEnrollment
+
+router = APIRouter(
+    prefix="/api/admin/analytics",
+    tags=["admin"]
+)
+
+# 集計結果はシリアライズ済みのバイト列を、科目カタログ・卒業要件ルール・修得記録のバージョンの組ごとにキャッシュする
+# いずれかの書き込みでバージョンが進むまでは、ダッシュボードの再読み込みはバージョンの確認 1 クエリで返る
+# （キャッシュに当たらない場合だけ lists の同時実行数の制限を受ける）
+ANALYTICS_VERSIONS = (CATALOG, REQUIREMENT_RULES, ENROLLMENTS)
+analytics_cache = VersionedResponseCache(maxsize=64)
+COURSE_STATISTICS = TypeAdapter(List[CourseStatistics])
+SUBJECT_ENROLLMENTS = TypeAdapter(List[SubjectEnrollment])
+
+
+# コースごとの単位数の分布（区分別・合計）と卒業要件の充足率
+@router.get("/courses", response_model=List[CourseStatistics])
+@admin_required
+async def read_course_statistics(
+    request: Request,
+    course: Optional[str] = None,
+    bin_width: int = Query(analytics.DEFAULT_BIN_WIDTH, ge=1, le=100),
+    credentials: HTTPAuthorizationCredentials = Security(security),
+    user=None,
+    db: DbSession = Depends(get_read_db),
+):
+    key = ("courses", course, bin_width)
+
+    def lookup(db: Session):
+        return analytics_cache.get(get_versions(db, ANALYTICS_VERSIONS), key)
+
+    def run(db: Session):
+        versions = get_versions(db, ANALYTICS_VERSIONS)
+        cached = analytics_cache.get(versions, key)
+        if cached is None:
+            body = COURSE_STATISTICS.dump_json(analytics.course_statistics(db, bin_width, course))
+            cached = analytics_cache.put(versions, key, body)
+        return cached
+
+    return (await cached_or_limited(db, "lists", lookup, run)).to_response(request)
+
+
+# コース・科目ごとの修得者数
+@router.get("/subjects", response_model=List[SubjectEnrollment])
+@admin_required
+async def read_subject_enrollments(
+    request: Request,
+    course: Optional[str] = None,
+    credentials: HTTPAuthorizationCredentials = Security(security),
+    user=None,
+    db: DbSession = Depends(get_read_db),
+):
+    key = ("subjects", course)
+
+    def lookup(db: Session):
+        return analytics_cache.get(get_versions(db, ANALYTICS_VERSIONS), key)
+
+    def run(db: Session):
+        versions = get_versions(db, ANALYTICS_VERSIONS)
+        cached = analytics_cache.get(versions, key)
+        if cached is None:
+            body = SUBJECT_ENROLLMENTS.dump_json(analytics.subject_enrollments(db, course))
+            cached = analytics_cache.put(versions, key, body)
+        return cached
+
+    return (await cached_or_limited(db, "lists", lookup, run)).to_response(request)
@@ -0,0 +1,100 @@
+from fastapi import APIRouter, Depends, Query, Security
+from fastapi.responses import StreamingResponse
+from fastapi.security import HTTPAuthorizationCredentials
+from sqlalchemy.orm import Session
+from typing import Iterator, Optional
+import csv
+import io
+import json
+import logging
+
+from ... import credit_engine, requirements, subject_catalog
+from ...firebase_auth import admin_required, security
+from ...database import get_sync_db
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(
+    prefix="/api/admin/export",
+    tags=["admin"]
+)
+
+CSV_COLUMNS = [
+    "id", "name", "course", "email", "completed_subject_ids",
+    *credit_engine.CREDIT_FIELDS, "total",
+    *(f"{field}_met" for field in credit_engine.REQUIREMENT_FIELDS),
+]
+MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv; charset=utf-8",
+}
+
+
+# 1 人分のエクスポート行（学生情報・修得科目ID・単位集計）
+def _student_record(student, credits: credit_engine.CohortCredits, i: int) -> dict:
+    return {
+        "id": student.id,
+        "name": student.name,
+        "course": student.course,
+        "email": student.email,
+        "completed_subject_ids": credits.subject_ids(i),
+        "credits": credits.credits(i).model_dump(),
+        "requirements_met": credits.requirements(i).model_dump(),
+    }
+
+
+# チャンク単位で NDJSON のバイト列を生成する
+def iter_ndjson(chunks) -> Iterator[bytes]:
+    for students, credits in chunks:
+        lines = [
+            json.dumps(_student_record(student, credits, i), ensure_ascii=False)
+            for i, student in enumerate(students)
+        ]
+        yield ("\n".join(lines) + "\n").encode("utf-8")
+
+
+# チャンク単位で CSV のバイト列を生成する（先頭にヘッダ行。要件の充足は true / false）
+def iter_csv(chunks) -> Iterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(CSV_COLUMNS)
+    for students, credits in chunks:
+        for i, student in enumerate(students):
+            record = _student_record(student, credits, i)
+            writer.writerow([
+                student.id, student.name, student.course, student.email,
+                " ".join(str(s) for s in record["completed_subject_ids"]),
+                *(record["credits"][field] for field in credit_engine.CREDIT_FIELDS),
+                record["credits"]["total"],
+                *(str(record["requirements_met"][field]).lower() for field in credit_engine.REQUIREMENT_FIELDS),
+            ])
+        yield buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+
+FORMATTERS = {"ndjson": iter_ndjson, "csv": iter_csv}
+
+
+# 学生と単位集計をストリーミングでエクスポートするエンドポイント
+@router.get("/students")
+@admin_required
+def export_students(
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    course: Optional[str] = None,
+    chunk_size: int = Query(1000, ge=1, le=10000),
+    credentials: HTTPAuthorizationCredentials = Security(security),
+    user=None,
+    db: Session = Depends(get_sync_db),
+):
+    chunks = credit_engine.iter_cohort_credits(
+        db, course=course, chunk_size=chunk_size, requirements=requirements.get_evaluator(db),
+        catalog=subject_catalog.get_catalog(db),
+    )
+    return StreamingResponse(
+        FORMATTERS[format](chunks),
+        media_type=MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="students.{format}"'},
+    )
@@ -0,0 +1,40 @@
+from fastapi import APIRouter, Depends, File, HTTPException, Query, Security, UploadFile
+from fastapi.security import HTTPAuthorizationCredentials
+from sqlalchemy.orm import Session
+from typing import Optional
+import logging
+
+from ... import admission
+from ... import bulk_import
+from ...firebase_auth import admin_required, security
+from ...schemas.student import StudentImportResult
+from ...database import get_sync_db
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(
+    prefix="/api/admin/import",
+    tags=["admin"]
+)
+
+# 成績データ（学生と修得科目ID）を CSV / NDJSON で一括取り込みするエンドポイント
+@router.post("/students", response_model=StudentImportResult)
+@admin_required
+@admission.limited("admin_writes")
+def import_students(
+    file: UploadFile = File(...),
+    format: Optional[str] = Query(None, pattern="^(csv|ndjson)$"),
+    chunk_size: int = Query(bulk_import.DEFAULT_CHUNK_SIZE, ge=1, le=10000),
+    credentials: HTTPAuthorizationCredentials = Security(security),
+    user=None,
+    db: Session = Depends(get_sync_db),
+):
+    try:
+        text = file.file.read().decode("utf-8-sig")
+    except UnicodeDecodeError:
+        raise HTTPException(status_code=400, detail="File must be UTF-8 encoded")
+
+    format = format or bulk_import.detect_format(file.filename, file.content_type)
+    result = bulk_import.import_students(db, bulk_import.parse(text, format), chunk_size=chunk_size)
+    logger.info(f"Imported students: {result.created} created, {result.failed} failed")
+    return result
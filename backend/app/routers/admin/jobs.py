@@ -0,0 +1,149 @@
+from fastapi import APIRouter, Depends, File, HTTPException, Query, Security, UploadFile
+from fastapi.responses import FileResponse
+from fastapi.security import HTTPAuthorizationCredentials
+from sqlalchemy.orm import Session
+from typing import List, Optional
+import logging
+import os
+import uuid
+
+from ... import bulk_import, jobs, models
+from ...firebase_auth import admin_required, security
+from ...schemas.job import ExportStudentsJob, Job, RebuildCreditSummaryJob
+from ...database import get_sync_db
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(
+    prefix="/api/admin/jobs",
+    tags=["admin"]
+)
+
+# 重い管理者の処理をバックグラウンドジョブとして登録し、状態・結果を参照する（app.jobs）
+# 登録は 202 でジョブの状態を返す。完了までは GET /api/admin/jobs/{id} で進捗を確認する
+
+
+def _get_job(db: Session, job_id: int) -> models.Job:
+    job = db.get(models.Job, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
+def _submit(db: Session, kind: str, params: dict, user) -> models.Job:
+    job = jobs.submit(db, kind, params, created_by=user["uid"])
+    logger.info(f"Job {job.id} ({kind}) submitted by {user['uid']}")
+    return job
+
+
+# 単位集計の再計算
+@router.post("/rebuild-credit-summary", response_model=Job, status_code=202)
+@admin_required
+def submit_rebuild_credit_summary(
+    options: RebuildCreditSummaryJob = RebuildCreditSummaryJob(),
+    credentials: HTTPAuthorizationCredentials = Security(security),
+    user=None,
+    db: Session = Depends(get_sync_db),
+):
+    return _submit(db, "rebuild_credit_summary", options.model_dump(), user)
+
+
+# 学生と単位集計のエクスポート（結果は NDJSON / CSV のファイル）
+@router.post("/export-students", response_model=Job, status_code=202)
+@admin_required
+def submit_export_students(
+    options: ExportStudentsJob = ExportStudentsJob(),
+    credentials: HTTPAuthorizationCredentials = Security(security),
+    user=None,
+    db: Session = Depends(get_sync_db),
+):
+    return _submit(db, "export_students", options.model_dump(), user)
+
+
+# 成績データの一括取り込み（入力は /api/admin/import/students と同じ、結果は取り込み結果の JSON）
+@router.post("/import-students", response_model=Job, status_code=202)
+@admin_required
+def submit_import_students(
+    file: UploadFile = File(...),
+    format: Optional[str] = Query(None, pattern="^(csv|ndjson)$"),
+    chunk_size: int = Query(bulk_import.DEFAULT_CHUNK_SIZE, ge=1, le=10000),
+    credentials: HTTPAuthorizationCredentials = Security(security),
+    user=None,
+    db: Session = Depends(get_sync_db),
+):
+    data = file.file.read()
+    try:
+        data.decode("utf-8-sig")
+    except UnicodeDecodeError:
+        raise HTTPException(status_code=400, detail="File must be UTF-8 encoded")
+
+    format = format or bulk_import.detect_format(file.filename, file.content_type)
+    directory = jobs.job_dir()
+    os.makedirs(directory, exist_ok=True)
+    input_file = f"input-{uuid.uuid4().hex}.{format}"
+    with open(os.path.join(directory, input_file), "wb") as f:
+        f.write(data)
+    return _submit(db, "import_students", {"input": input_file, "format": format, "chunk_size": chunk_size}, user)
+
+
+# ジョブの一覧（新しい順）
+@router.get("/", response_model=List[Job])
+@admin_required
+def read_jobs(
+    status: Optional[str] = Query(None, pattern="^(queued|running|succeeded|failed|cancelled)$"),
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000),
+    credentials: HTTPAuthorizationCredentials = Security(security),
+    user=None,
+    db: Session = Depends(get_sync_db),
+):
+    query = db.query(models.Job)
+    if status is not None:
+        query = query.filter(models.Job.status == status)
+    return query.order_by(models.Job.id.desc()).offset(skip).limit(limit).all()
+
+
+@router.get("/{job_id}", response_model=Job)
+@admin_required
+def read_job(
+    job_id: int,
+    credentials: HTTPAuthorizationCredentials = Security(security),
+    user=None,
+    db: Session = Depends(get_sync_db),
+):
+    return _get_job(db, job_id)
+
+
+# 結果ファイルのダウンロード（成功したジョブのみ）
+@router.get("/{job_id}/result")
+@admin_required
+def download_job_result(
+    job_id: int,
+    credentials: HTTPAuthorizationCredentials = Security(security),
+    user=None,
+    db: Session = Depends(get_sync_db),
+):
+    job = _get_job(db, job_id)
+    if job.status != jobs.SUCCEEDED or job.result_file is None:
+        raise HTTPException(status_code=409, detail=f"Job has no result (status: {job.status})")
+    path = os.path.join(jobs.job_dir(), job.result_file)
+    if not os.path.exists(path):
+        raise HTTPException(status_code=404, detail="Result file not found")
+    return FileResponse(path, media_type=job.result_media_type, filename=f"job-{job.result_file}")
+
+
+# 取り消し（待機中はすぐに取り消し、実行中は次の進捗の報告で止まる）
+# 取り消しは処理を巻き戻さない。一括取り込みはコミット済みのチャンクの学生が残り、
+# 作成済み・失敗の件数をジョブの summary に記録する（入力ファイルは残るため、同じ入力で登録し直せる）
+@router.post("/{job_id}/cancel", response_model=Job)
+@admin_required
+def cancel_job(
+    job_id: int,
+    credentials: HTTPAuthorizationCredentials = Security(security),
+    user=None,
+    db: Session = Depends(get_sync_db),
+):
+    job = _get_job(db, job_id)
+    if job.status in jobs.FINISHED:
+        raise HTTPException(status_code=409, detail=f"Job already finished (status: {job.status})")
+    return jobs.request_cancel(db, job)
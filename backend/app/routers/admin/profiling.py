@@ -0,0 +1,95 @@
+from dataclasses import asdict
+
+from fastapi import APIRouter, HTTPException, Response, Security
+from fastapi.security import HTTPAuthorizationCredentials
+import logging
+
+from ... import profiling
+from ...firebase_auth import admin_required, security
+from ...schemas.profiling import ProfileSummary, ProfilingConfig, ProfilingStatus
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(
+    prefix="/api/admin/profiling",
+    tags=["admin"]
+)
+
+# リクエストのプロファイリングの有効化と、保存したプロファイルのダウンロード
+# 設定と保存先はワーカープロセスごと（複数ワーカーの場合は各ワーカーに届くまで繰り返すか、sample を使う）
+
+
+def _status() -> ProfilingStatus:
+    profiler = profiling.profiler
+    return ProfilingStatus(
+        mode=profiler.mode,
+        sample_rate=profiler.sample_rate,
+        path_prefix=profiler.path_prefix,
+        remaining=profiler.remaining,
+        buffer_size=profiler.buffer_size,
+        header=profiling.PROFILE_HEADER,
+        header_token=profiler.header_token,
+        profiles=[
+            ProfileSummary(**{k: v for k, v in asdict(r).items() if k in ProfileSummary.model_fields})
+            for r in profiler.records()
+        ],
+    )
+
+
+def _record(profile_id: int) -> profiling.ProfileRecord:
+    record = profiling.profiler.get(profile_id)
+    if record is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return record
+
+
+# 現在の設定と保存済みのプロファイルの一覧
+@router.get("/", response_model=ProfilingStatus)
+@admin_required
+async def read_profiling_status(credentials: HTTPAuthorizationCredentials = Security(security), user=None):
+    return _status()
+
+
+# プロファイリングを有効化・無効化する
+@router.put("/", response_model=ProfilingStatus)
+@admin_required
+async def configure_profiling(
+    config: ProfilingConfig,
+    credentials: HTTPAuthorizationCredentials = Security(security),
+    user=None,
+):
+    profiling.profiler.configure(**config.model_dump())
+    logger.info(f"Profiling set to {config.mode} by {user['uid']}")
+    return _status()
+
+
+# pstats 形式（python -m pstats や snakeviz で開ける）
+@router.get("/profiles/{profile_id}/pstats")
+@admin_required
+async def download_pstats(profile_id: int, credentials: HTTPAuthorizationCredentials = Security(security), user=None):
+    record = _record(profile_id)
+    return Response(
+        content=record.stats,
+        media_type="application/octet-stream",
+        headers={"Content-Disposition": f'attachment; filename="profile-{record.id}.pstats"'},
+    )
+
+
+# collapsed stack 形式（flamegraph.pl や speedscope で開ける）
+@router.get("/profiles/{profile_id}/collapsed")
+@admin_required
+async def download_collapsed(profile_id: int, credentials: HTTPAuthorizationCredentials = Security(security), user=None):
+    record = _record(profile_id)
+    return Response(
+        content=record.collapsed,
+        media_type="text/plain",
+        headers={"Content-Disposition": f'attachment; filename="profile-{record.id}.collapsed.txt"'},
+    )
+
+
+# 保存済みのプロファイルを削除する
+@router.delete("/profiles")
+@admin_required
+async def clear_profiles(credentials: HTTPAuthorizationCredentials = Security(security), user=None):
+    profiling.profiler.clear()
+    return {"detail": "Profiles deleted successfully"}
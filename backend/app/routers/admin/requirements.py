@@ -0,0 +1,86 @@
+from fastapi import APIRouter, Depends, HTTPException, Security
+from fastapi.security import HTTPAuthorizationCredentials
+from sqlalchemy.orm import Session
+from typing import List
+import logging
+
+from ... import admission
+from ... import models
+from ... import requirements
+from ...firebase_auth import admin_required, security
+from ...database import get_sync_db
+from ...schemas.requirement import RequirementRule, RequirementRuleCreate
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(
+    prefix="/api/admin/requirements",
+    tags=["admin"]
+)
+
+# ルールを変更すると判定器のキャッシュを無効化し、保存済みの単位集計の要件フラグを再判定する
+# （全コース共通のルールの変更はすべての学生に影響する）
+
+
+# 卒業要件ルールの一覧
+@router.get("/", response_model=List[RequirementRule])
+@admin_required
+def read_requirement_rules(
+    credentials: HTTPAuthorizationCredentials = Security(security),
+    user=None,
+    db: Session = Depends(get_sync_db),
+):
+    return db.query(models.RequirementRule).order_by(
+        models.RequirementRule.course, models.RequirementRule.entrance_year
+    ).all()
+
+
+# コース・入学年度のルールを作成または更新する
+@router.put("/", response_model=RequirementRule)
+@admin_required
+@admission.limited("admin_writes")
+def upsert_requirement_rule(
+    rule: RequirementRuleCreate,
+    credentials: HTTPAuthorizationCredentials = Security(security),
+    user=None,
+    db: Session = Depends(get_sync_db),
+):
+    # NULL 同士は一意制約で重複とみなされないため、IS NULL で検索する
+    db_rule = db.query(models.RequirementRule).filter(
+        models.RequirementRule.course.is_(None) if rule.course is None else models.RequirementRule.course == rule.course,
+        models.RequirementRule.entrance_year.is_(None) if rule.entrance_year is None
+        else models.RequirementRule.entrance_year == rule.entrance_year,
+    ).first()
+    if db_rule is None:
+        db_rule = models.RequirementRule()
+        db.add(db_rule)
+    for key, value in rule.model_dump().items():
+        setattr(db_rule, key, value)
+    db.flush()
+
+    updated = requirements.rules_changed(db, rule.course)
+    db.commit()
+    db.refresh(db_rule)
+    logger.info(f"Requirement rule {db_rule.id} saved, {updated} credit summaries re-evaluated")
+    return db_rule
+
+
+# ルールを削除する
+@router.delete("/{rule_id}")
+@admin_required
+@admission.limited("admin_writes")
+def delete_requirement_rule(
+    rule_id: int,
+    credentials: HTTPAuthorizationCredentials = Security(security),
+    user=None,
+    db: Session = Depends(get_sync_db),
+):
+    db_rule = db.query(models.RequirementRule).filter(models.RequirementRule.id == rule_id).first()
+    if db_rule is None:
+        raise HTTPException(status_code=404, detail="Requirement rule not found")
+    course = db_rule.course
+    db.delete(db_rule)
+    db.flush()
+    requirements.rules_changed(db, course)
+    db.commit()
+    return {"detail": "Requirement rule deleted successfully"}
@@ -0,0 +1,41 @@
+from fastapi import APIRouter, Depends, Query, Response, Security
+from fastapi.security import HTTPAuthorizationCredentials
+from sqlalchemy.orm import Session
+from typing import List, Optional
+
+from ... import admission
+from ... import search as search_index
+from ...database import DbSession, get_read_db, run_db
+from ...firebase_auth import admin_required, security
+from ...schemas.search import SearchResult
+from ..pagination import TOTAL_COUNT_HEADER
+
+router = APIRouter(
+    prefix="/api/admin/search",
+    tags=["admin"]
+)
+
+
+# 学生（氏名・メールアドレス）と科目（科目名）の検索
+# q は空白区切りの語の AND 検索（各語の部分一致）で、結果は関連度順
+# include_total=true の場合は総件数を X-Total-Count ヘッダで返す
+@router.get("/", response_model=List[SearchResult])
+@admin_required
+@admission.limited("lists")
+async def search(
+    response: Response,
+    q: str = Query(..., min_length=1, max_length=200),
+    kind: Optional[str] = Query(None, pattern="^(student|subject)$"),
+    skip: int = Query(0, ge=0),
+    limit: int = Query(20, ge=1, le=100),
+    include_total: bool = False,
+    credentials: HTTPAuthorizationCredentials = Security(security),
+    user=None,
+    db: DbSession = Depends(get_read_db),
+):
+    def run(db: Session):
+        if include_total:
+            response.headers[TOTAL_COUNT_HEADER] = str(search_index.count(db, q, kind))
+        return search_index.search(db, q, kind, skip, limit)
+
+    return await run_db(db, run)
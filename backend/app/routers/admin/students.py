@@ -1,16 +1,26 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, Security
+from fastapi.security import HTTPAuthorizationCredentials
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 from sqlalchemy.exc import SQLAlchemyError
-from typing import List
+from typing import List, Optional
 import logging
 
+from ... import admission
 from ... import models
-from ...database import SessionLocal
-from ...schemas.student import Student, StudentCreate
-from ...firebase_auth import auth_required, security  # Firebase 認証用（オプション）
-import firebase_admin
-from firebase_admin import auth
-from firebase_admin import credentials
+from ... import credit_engine
+from ... import credit_summary
+from ... import planner
+from ... import requirements
+from ... import subject_catalog
+from ...database import DbSession, get_db, get_read_db, get_sync_db, run_db
+from ...enrollments import (
+    apply_enrollment_diff, enrollment_pairs, existing_subject_ids, insert_enrollments, replace_enrollments,
+)
+from .. import projections
+from ..queries import query_for
+from ...schemas.student import Student, StudentCreate, StudentSubjectsUpdate
+from ...firebase_auth import auth_required, admin_required, security  # Firebase 認証用（オプション）
 
 from ...schemas import credit_calculation as schemas  
 logging.basicConfig(level=logging.INFO)
@@ -21,167 +31,286 @@ router = APIRouter(
     tags=["students"]
 )
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+# 各エンドポイントは async で定義し、ORM の処理は run_db 経由で実行する
+# （非同期モードでは AsyncSession.run_sync、同期モードではスレッドプール）
+# 遅延ロードが発生しないよう、レスポンスモデルへの変換も run_db の中で行う
 
 # すべての学生を取得するエンドポイント
+# cursor を指定するとキーセットページング（次ページのカーソルは X-Next-Cursor ヘッダで返す）
 @router.get("/", response_model=List[Student])
-def read_students(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    try:
-        students = db.query(models.Student).offset(skip).limit(limit).all()
-        return students
-    except SQLAlchemyError as e:
-        logger.error(f"Database error: {str(e)}")
-        raise HTTPException(status_code=500, detail="Internal server error")
+@admission.limited("lists")
+async def read_students(
+    response: Response,
+    skip: int = 0,
+    limit: int = 100,
+    cursor: Optional[str] = None,
+    order_by: str = Query("id", pattern="^(id|name)$"),
+    include_total: bool = False,
+    db: DbSession = Depends(get_read_db),
+):
+    def run(db: Session):
+        try:
+            # ORM・Pydantic を経由しない読み取り専用の経路（レスポンスは従来と同じバイト列）
+            return projections.student_page(db, response, skip, limit, cursor, order_by, include_total)
+        except SQLAlchemyError as e:
+            logger.error(f"Database error: {str(e)}")
+            raise HTTPException(status_code=500, detail="Internal server error")
+
+    return projections.page_response(await run_db(db, run), response)
 
 # 特定の学生を ID で取得するエンドポイント
 
 
 # 学生データを作成するエンドポイント
 @router.post("/", response_model=Student)
-def create_student(student: StudentCreate, db: Session = Depends(get_db)):
-    try:
-        # Firebase側ではフロントエンドで既にユーザーが作成されている前提
-        # 受け取ったFirebaseのUIDをデータベースに保存
-        db_student = models.Student(
-           uid= student.uid,  # FirebaseのUIDを使用
-            name=student.name,
-            course=student.course,
-            email=student.email
-        )
+@admission.limited("admin_writes")
+async def create_student(student: StudentCreate, db: DbSession = Depends(get_db)):
+    def run(db: Session):
+        try:
+            # Firebase側ではフロントエンドで既にユーザーが作成されている前提
+            # 受け取ったFirebaseのUIDをデータベースに保存
+            db_student = models.Student(
+               uid= student.uid,  # FirebaseのUIDを使用
+                name=student.name,
+                course=student.course,
+                email=student.email,
+                entrance_year=student.entrance_year,
+            )
 
-        db.add(db_student)
-        db.commit()
-        db.refresh(db_student)
-        logger.info(f"Created student: {db_student.__dict__}")
-        return db_student
-    except SQLAlchemyError as e:
-        db.rollback()
-        logger.error(f"Error in create_student: {str(e)}", exc_info=True)
-        raise HTTPException(status_code=500, detail=f"An error occurred: {str(e)}")
+            # 修得科目はカタログに存在するかを 1 クエリで確認してから中間テーブルに一括挿入
+            unknown = set(student.completed_subjects) - existing_subject_ids(db, student.completed_subjects)
+            if unknown:
+                raise HTTPException(status_code=400, detail=f"Unknown subject ids: {sorted(unknown)}")
+
+            db.add(db_student)
+            db.flush()
+            insert_enrollments(db, enrollment_pairs(db_student.id, student.completed_subjects))
+            credit_summary.refresh_student_summaries(db, [db_student.id])
+            db.commit()
+            db.refresh(db_student)
+            logger.info(f"Created student {db_student.id}")
+            return Student.model_validate(db_student)
+        except SQLAlchemyError as e:
+            db.rollback()
+            logger.error(f"Error in create_student: {str(e)}", exc_info=True)
+            raise HTTPException(status_code=500, detail=f"An error occurred: {str(e)}")
+
+    return await run_db(db, run)
 
 
 
 # 学生データを更新するエンドポイント
 @router.put("/{student_id}", response_model=Student)
-def update_student(student_id: str, student: StudentCreate, db: Session = Depends(get_db)):
-    try:
-        db_student = db.query(models.Student).filter(models.Student.id == student_id).first()
-        if db_student is None:
-            raise HTTPException(status_code=404, detail="Student not found")
-        
-        student_data = student.model_dump(exclude_unset=True)
-        for key, value in student_data.items():
-            setattr(db_student, key, value)
-        
-        db.commit()
-        db.refresh(db_student)
-        return db_student
-    except SQLAlchemyError as e:
-        db.rollback()
-        logger.error(f"Database error: {str(e)}")
-        raise HTTPException(status_code=500, detail="Failed to update student")
+@admission.limited("admin_writes")
+async def update_student(student_id: str, student: StudentCreate, db: DbSession = Depends(get_db)):
+    def run(db: Session):
+        try:
+            db_student = db.query(models.Student).filter(models.Student.id == student_id).first()
+            if db_student is None:
+                raise HTTPException(status_code=404, detail="Student not found")
+            
+            student_data = student.model_dump(exclude_unset=True)
+            # 修得科目はリレーションに ID のリストを代入できないため、中間テーブルの差分だけを更新する
+            completed_subjects = student_data.pop("completed_subjects", None)
+            for key, value in student_data.items():
+                setattr(db_student, key, value)
+            if completed_subjects is not None:
+                unknown = set(completed_subjects) - existing_subject_ids(db, completed_subjects)
+                if unknown:
+                    raise HTTPException(status_code=400, detail=f"Unknown subject ids: {sorted(unknown)}")
+                replace_enrollments(db, db_student.id, completed_subjects)
+            db.flush()
+            credit_summary.refresh_student_summaries(db, [db_student.id])
+
+            db.commit()
+            db.expire(db_student)
+            return Student.model_validate(query_for(db, models.Student, Student).filter(models.Student.id == db_student.id).one())
+        except SQLAlchemyError as e:
+            db.rollback()
+            logger.error(f"Database error: {str(e)}")
+            raise HTTPException(status_code=500, detail="Failed to update student")
+
+    return await run_db(db, run)
+
+# 修得科目を差分で更新するエンドポイント（add の科目を追加し、remove の科目を削除する）
+# 学生の修得科目のコレクションは読み込まず、中間テーブルへの一括 INSERT / DELETE で更新するため、
+# 修得科目の数によらず一定の文数で実行される
+@router.patch("/{student_id}/subjects", response_model=Student)
+@admission.limited("admin_writes")
+async def update_student_subjects(student_id: int, changes: StudentSubjectsUpdate, db: DbSession = Depends(get_db)):
+    def run(db: Session):
+        try:
+            conflicting = set(changes.add) & set(changes.remove)
+            if conflicting:
+                raise HTTPException(status_code=400, detail=f"Subject ids in both add and remove: {sorted(conflicting)}")
+            if db.execute(select(models.Student.id).where(models.Student.id == student_id)).first() is None:
+                raise HTTPException(status_code=404, detail="Student not found")
+            unknown = set(changes.add) - existing_subject_ids(db, changes.add)
+            if unknown:
+                raise HTTPException(status_code=400, detail=f"Unknown subject ids: {sorted(unknown)}")
+
+            added, removed = apply_enrollment_diff(db, student_id, changes.add, changes.remove)
+            if added or removed:
+                credit_summary.refresh_student_summaries(db, [student_id])
+            db.commit()
+            logger.info(f"Updated subjects of student {student_id}: {len(added)} added, {len(removed)} removed")
+            student = query_for(db, models.Student, Student).filter(models.Student.id == student_id).one()
+            return Student.model_validate(student)
+        except SQLAlchemyError as e:
+            db.rollback()
+            logger.error(f"Database error: {str(e)}")
+            raise HTTPException(status_code=500, detail="Failed to update student subjects")
+
+    return await run_db(db, run)
 
 # 学生データを削除するエンドポイント
 @router.delete("/{student_id}")
-def delete_student(student_id: str, db: Session = Depends(get_db)):
+@admission.limited("admin_writes")
+async def delete_student(student_id: str, db: DbSession = Depends(get_db)):
+    def run(db: Session):
+        try:
+            db_student = db.query(models.Student).filter(models.Student.id == student_id).first()
+            if db_student is None:
+                raise HTTPException(status_code=404, detail="Student not found")
+            credit_summary.delete_student_summary(db, db_student.id)
+            db.delete(db_student)
+            db.commit()
+            return {"detail": "Student deleted successfully"}
+        except SQLAlchemyError as e:
+            db.rollback()
+            logger.error(f"Database error: {str(e)}")
+            raise HTTPException(status_code=500, detail="Failed to delete student")
+
+    return await run_db(db, run)
+
+# ログイン中の学生の単位を計算するエンドポイント
+@router.get("/calculate-credits", response_model=schemas.CreditCalculation)
+@auth_required
+@admission.limited("credits")
+async def calculate_credits(credentials: HTTPAuthorizationCredentials = Security(security), user=None, db: DbSession = Depends(get_read_db)):
+    def run(db: Session):
+        try:
+            # Firebaseの認証情報からUIDを取得
+            uid = user['uid']
+
+            # 保存済みの単位集計を UID から 1 回の索引検索で取得
+            summary = credit_summary.summary_for_uid(db, uid)
+            if summary is not None:
+                return credit_summary.calculation_from_row(summary)
+
+            # 集計が未作成の場合（再構築前の既存データなど）はその場で計算する
+            student = db.query(models.Student).filter(models.Student.uid == uid).first()
+            if not student:
+                raise HTTPException(status_code=404, detail="Student not found")
+            result = credit_engine.calculate_cohort_credits(
+                db, student_ids=[student.id], requirements=requirements.get_evaluator(db),
+                catalog=subject_catalog.get_catalog(db),
+            )
+            return result.calculation(0)
+
+        except SQLAlchemyError as e:
+            logger.error(f"Database error: {str(e)}")
+            raise HTTPException(status_code=500, detail="Internal server error")
+
+    return await run_db(db, run)
+
+# 卒業要件を満たすための残り科目を計画するエンドポイント
+# コース・修得科目を指定すると仮定の条件（what-if）で計画する
+@router.post("/plan", response_model=schemas.GraduationPlan)
+@auth_required
+@admission.limited("credits")
+async def plan_graduation(
+    scenario: schemas.GraduationPlanRequest,
+    credentials: HTTPAuthorizationCredentials = Security(security),
+    user=None,
+    db: DbSession = Depends(get_read_db),
+):
+    def run(db: Session):
+        try:
+            course, completed = scenario.course, scenario.completed_subjects
+            entrance_year = scenario.entrance_year
+            # 学生の行はコース・修得科目を省略した場合だけ読み込む
+            # （入学年度だけを省略した仮定の計画は、学生の行がなければ年度によらない要件で判定する）
+            if course is None or completed is None:
+                student = db.query(models.Student).filter(models.Student.uid == user['uid']).first()
+                if not student:
+                    raise HTTPException(status_code=404, detail="Student not found")
+                if course is None:
+                    course = student.course
+                if entrance_year is None:
+                    entrance_year = student.entrance_year
+                if completed is None:
+                    ss = models.student_subject
+                    completed = db.execute(select(ss.c.subject_id).where(ss.c.student_id == student.id)).scalars().all()
+
+            catalog = subject_catalog.get_catalog(db)
+            evaluator = requirements.get_evaluator(db)
+            plan = planner.plan_remaining(
+                catalog, course, completed, evaluator.requirement_for(course, entrance_year),
+                objective=scenario.objective, excluded_subject_ids=scenario.excluded_subjects,
+            )
+            # 計画した科目の区分と、修得後の単位・要件の判定は一括計算と同じエンジンで求める
+            planned = credit_engine.compute_cohort_credits(catalog, [0], [course], [0] * len(plan.subject_ids), plan.subject_ids)
+            after = credit_engine.compute_cohort_credits(
+                catalog, [0], [course], [0] * (len(completed) + len(plan.subject_ids)), [*completed, *plan.subject_ids],
+                requirements=evaluator, entrance_years=[entrance_year],
+            )
+            return schemas.GraduationPlan(
+                feasible=plan.feasible,
+                objective=scenario.objective,
+                course=course,
+                subject_ids=plan.subject_ids,
+                added_credits=int(planned.total[0]),
+                planned=planned.details(0),
+                credits=after.credits(0),
+                requirements_met=after.requirements(0),
+            )
+        except SQLAlchemyError as e:
+            logger.error(f"Database error: {str(e)}")
+            raise HTTPException(status_code=500, detail="Internal server error")
+
+    return await run_db(db, run)
+
+# 学生全体（またはコース単位）の単位を一括計算するエンドポイント（学期末の卒業判定用）
+# CPU 負荷の高い一括処理のため、同期セッションでスレッドプール上で実行する
+@router.get("/calculate-credits/batch", response_model=List[schemas.StudentCreditSummary])
+@admin_required
+@admission.limited("credits")
+def calculate_credits_batch(
+    course: Optional[str] = None,
+    student_ids: Optional[List[int]] = Query(None),
+    credentials: HTTPAuthorizationCredentials = Security(security),
+    user=None,
+    db: Session = Depends(get_sync_db),
+):
     try:
-        db_student = db.query(models.Student).filter(models.Student.id == student_id).first()
-        if db_student is None:
-            raise HTTPException(status_code=404, detail="Student not found")
-        db.delete(db_student)
-        db.commit()
-        return {"detail": "Student deleted successfully"}
+        result = credit_engine.calculate_cohort_credits(
+            db, student_ids=student_ids, course=course, requirements=requirements.get_evaluator(db),
+            catalog=subject_catalog.get_catalog(db),
+        )
+        return result.summaries()
     except SQLAlchemyError as e:
-        db.rollback()
         logger.error(f"Database error: {str(e)}")
-        raise HTTPException(status_code=500, detail="Failed to delete student")
+        raise HTTPException(status_code=500, detail="Internal server error")
 
 # 特定の学生を UID で取得するエンドポイント
 @router.get("/by-uid/{uid}", response_model=Student)
-def get_student_by_uid(uid: str, db: Session = Depends(get_db)):
-    student = db.query(models.Student).filter(models.Student.uid == uid).first()
-    if not student:
-        raise HTTPException(status_code=404, detail="Student not found")
-    return student
+async def get_student_by_uid(uid: str, db: DbSession = Depends(get_read_db)):
+    def run(db: Session):
+        student = query_for(db, models.Student, Student).filter(models.Student.uid == uid).first()
+        if not student:
+            raise HTTPException(status_code=404, detail="Student not found")
+        return Student.model_validate(student)
+
+    return await run_db(db, run)
 
 # 特定の学生を ID で取得するエンドポイント（IDと区別するために異なるパス）
 @router.get("/{student_id}", response_model=Student)
-def get_student_by_id(student_id: str, db: Session = Depends(get_db)):
-    student = db.query(models.Student).filter(models.Student.id == student_id).first()
-    if student is None:
-        raise HTTPException(status_code=404, detail="Student not found")
-    return student
-
-@router.get("/calculate-credits", response_model=schemas.CreditCalculation)
-@auth_required
-def calculate_credits(current_user: dict = Depends(security), db: Session = Depends(get_db)):
-    try:
-        # Firebaseの認証情報からUIDを取得
-        uid = current_user['uid']
-        
-        # UIDを使用して学生情報を取得
-        student = db.query(models.Student).filter(models.Student.uid == uid).first()
-        if not student:
+async def get_student_by_id(student_id: str, db: DbSession = Depends(get_read_db)):
+    def run(db: Session):
+        student = query_for(db, models.Student, Student).filter(models.Student.id == student_id).first()
+        if student is None:
             raise HTTPException(status_code=404, detail="Student not found")
+        return Student.model_validate(student)
 
-        course = student.course
-        completed_subjects = student.completed_subjects
-
-        credits = {
-            "compulsory": 0,
-            "limited_elective": 0,
-            "standard_elective": 0,
-            "elective": 0,
-            "total": 0
-        }
-
-        details = {
-            "compulsory_subjects": [],
-            "limited_elective_subjects": [],
-            "standard_elective_subjects": [],
-            "elective_subjects": []
-        }
-
-        for subject_id in completed_subjects:
-            subject = db.query(models.Subject).filter(models.Subject.id == subject_id).first()
-            if not subject:
-                continue
-            category = subject.course_categories.get(course)
-            if category == "必修科目":
-                credits["compulsory"] += subject.credit
-                details["compulsory_subjects"].append(subject_id)
-            elif category == "限定選択科目":
-                credits["limited_elective"] += subject.credit
-                details["limited_elective_subjects"].append(subject_id)
-            elif category == "標準選択科目":
-                credits["standard_elective"] += subject.credit
-                details["standard_elective_subjects"].append(subject_id)
-            else:
-                credits["elective"] += subject.credit
-                details["elective_subjects"].append(subject_id)
-            credits["total"] += subject.credit
-
-        requirements = schemas.CreditRequirement()
-        requirements_met = {
-            "compulsory": credits["compulsory"] >= requirements.required_compulsory,
-            "limited_elective": credits["limited_elective"] >= requirements.required_limited_elective,
-            "limited_standard_elective": (credits["limited_elective"] + credits["standard_elective"]) >= requirements.required_limited_standard_elective,
-            "total": credits["total"] >= requirements.required_total
-        }
-
-        return schemas.CreditCalculation(
-            student_id=student.id,
-            course=course,
-            credits=credits,
-            requirements_met=requirements_met,
-            details=details
-        )
-
-    except SQLAlchemyError as e:
-        logger.error(f"Database error: {str(e)}")
-        raise HTTPException(status_code=500, detail="Internal server error")
\ No newline at end of file
+    return await run_db(db, run)
@@ -1,96 +1,214 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, Security
+from fastapi.security import HTTPAuthorizationCredentials
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
+import logging
 
+from ... import admission
 from ... import models
-from ...database import SessionLocal
-from ...schemas.subject import Subject, SubjectCreate, SubjectUpdate
+from ... import catalog_sync
+from ... import credit_summary
+from ... import subject_catalog
+from ...cache_versions import CATALOG, bump_version, get_version
+from ...config import get_settings
+from ...database import DbSession, get_db, get_read_db, get_sync_db, run_db
+from ...firebase_auth import admin_required, security
+from .. import projections
+from ..pagination import PAGINATION_HEADERS
+from ..response_cache import VersionedResponseCache, cached_or_limited
+from ...schemas.subject import CatalogSync, CatalogSyncReport, Subject, SubjectCreate, SubjectUpdate
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter(
     prefix="/subjects",
     tags=["subjects"]
 )
 
-# データベースセッションの取得関数
-def get_db():
-    db = SessionLocal()
+# 各エンドポイントは async で定義し、ORM の処理は run_db 経由で実行する
+# （非同期モードでは AsyncSession.run_sync、同期モードではスレッドプール）
+
+# 科目カタログの GET レスポンスはシリアライズ済みのバイト列をカタログのバージョンごとにキャッシュする
+# バージョンは DB の cache_versions に保存し、書き込み系エンドポイントで同じトランザクション内で進める
+# （他のワーカーの書き込みもリクエストごとのバージョン確認で反映される）
+# 科目の詳細と単位計算は subject_catalog のスナップショットから作り、書き込みのコミット後に作り直して差し替える
+subject_cache = VersionedResponseCache(maxsize=get_settings().subject_cache_size)
+
+
+def _invalidate_catalog(db: Session) -> None:
+    bump_version(db, CATALOG)
+    subject_cache.clear()
+
+
+# 区分のコースの重複は一意索引の違反になるため、書き込む前に 400 で断る
+def _validate_categories(categories) -> None:
+    try:
+        catalog_sync.validate_categories(categories)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+# 一意制約の違反（同時に作成された区分など）はロールバックして 400 で返す
+def _commit(db: Session) -> None:
     try:
-        yield db
-    finally:
-        db.close()
+        db.commit()
+    except IntegrityError as e:
+        db.rollback()
+        raise HTTPException(status_code=400, detail=f"Integrity error: {getattr(e, 'orig', None) or e}")
 
 # 科目の一覧取得エンドポイント
+# cursor を指定するとキーセットページング（次ページのカーソルは X-Next-Cursor ヘッダで返す）
+# キャッシュに当たらない場合だけ lists の同時実行数の制限を受ける
 @router.get("/", response_model=List[Subject])
-def read_subjects(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    subjects = db.query(models.Subject).offset(skip).limit(limit).all()
-    return subjects
+async def read_subjects(
+    request: Request,
+    response: Response,
+    skip: int = 0,
+    limit: int = 100,
+    cursor: Optional[str] = None,
+    order_by: str = Query("id", pattern="^(id|name)$"),
+    include_total: bool = False,
+    db: DbSession = Depends(get_read_db),
+):
+    key = ("list", skip, limit, cursor, order_by, include_total)
+
+    def lookup(db: Session):
+        return subject_cache.get(get_version(db, CATALOG), key)
+
+    def run(db: Session):
+        version = get_version(db, CATALOG)
+        cached = subject_cache.get(version, key)
+        if cached is None:
+            subjects = projections.subject_page(db, response, skip, limit, cursor, order_by, include_total)
+            body = projections.dumps(subjects)
+            headers = {name: response.headers[name] for name in PAGINATION_HEADERS if name in response.headers}
+            cached = subject_cache.put(version, key, body, headers)
+        return cached
+
+    return (await cached_or_limited(db, "lists", lookup, run)).to_response(request)
 
 # 科目の作成エンドポイント
 @router.post("/", response_model=Subject)
-def create_subject(subject: SubjectCreate, db: Session = Depends(get_db)):
-    db_subject = models.Subject(name=subject.name, credit=subject.credit)
-    db.add(db_subject)
-    db.flush()  # to get the id of the newly created subject
-
-    for category in subject.categories:
-        db_category = models.SubjectCategory(
-            course=category.course,
-            category=category.category,
-            subject_id=db_subject.id
-        )
-        db.add(db_category)
+@admission.limited("admin_writes")
+async def create_subject(subject: SubjectCreate, db: DbSession = Depends(get_db)):
+    _validate_categories(subject.categories)
+
+    def run(db: Session):
+        db_subject = models.Subject(name=subject.name, credit=subject.credit)
+        db.add(db_subject)
+        db.flush()  # to get the id of the newly created subject
 
-    db.commit()
-    db.refresh(db_subject)
-    return db_subject
+        for category in subject.categories:
+            db_category = models.SubjectCategory(
+                course=category.course,
+                category=category.category,
+                subject_id=db_subject.id
+            )
+            db.add(db_category)
+
+        _invalidate_catalog(db)
+        subject_id = db_subject.id
+        _commit(db)
+        return subject_catalog.reload(db).subject(subject_id)
+
+    return await run_db(db, run)
+
+# 大学の公開する科目一覧からカタログ全体を同期するエンドポイント（管理者用）
+# 現在のカタログとの差分だけを 1 トランザクションの一括 upsert / DELETE で反映し、変更内容を返す
+@router.post("/sync", response_model=CatalogSyncReport)
+@admin_required
+@admission.limited("admin_writes")
+def sync_subjects(
+    catalog: CatalogSync,
+    credentials: HTTPAuthorizationCredentials = Security(security),
+    user=None,
+    db: Session = Depends(get_sync_db),
+):
+    try:
+        report = catalog_sync.sync_catalog(db, catalog.subjects, catalog.delete_missing, catalog.dry_run)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if report.changed and not report.dry_run:
+        _invalidate_catalog(db)
+        db.commit()
+        subject_catalog.reload(db)
+        logger.info(
+            f"Catalog synced: {len(report.subjects_created)} created, {len(report.subjects_updated)} updated, "
+            f"{len(report.subjects_deleted)} deleted, {report.students_refreshed} credit summaries refreshed"
+        )
+    return report
 
 # 科目の更新エンドポイント
 @router.put("/{subject_id}", response_model=Subject)
-def update_subject(subject_id: int, subject: SubjectUpdate, db: Session = Depends(get_db)):
-    db_subject = db.query(models.Subject).filter(models.Subject.id == subject_id).first()
-    if db_subject is None:
-        raise HTTPException(status_code=404, detail="Subject not found")
-    
-    # Update basic fields
-    db_subject.name = subject.name
-    db_subject.credit = subject.credit
-
-    # Update categories
-    # First, remove all existing categories
-    db.query(models.SubjectCategory).filter(models.SubjectCategory.subject_id == subject_id).delete()
-
-    # Then, add new categories
-    for category in subject.categories:
-        db_category = models.SubjectCategory(
-            course=category.course,
-            category=category.category,
-            subject_id=subject_id
+@admission.limited("admin_writes")
+async def update_subject(subject_id: int, subject: SubjectUpdate, db: DbSession = Depends(get_db)):
+    _validate_categories(subject.categories)
+
+    def run(db: Session):
+        db_subject = db.query(models.Subject).filter(models.Subject.id == subject_id).first()
+        if db_subject is None:
+            raise HTTPException(status_code=404, detail="Subject not found")
+        
+        # Update basic fields
+        db_subject.name = subject.name
+        db_subject.credit = subject.credit
+
+        # 区分は (subject_id, course) で upsert し、なくなったコースの区分だけを削除する（変わらない行の id は維持）
+        wanted = {subject_id: subject.categories}
+        catalog_sync.apply_category_diff(
+            db, catalog_sync.category_diff(catalog_sync.current_categories(db, [subject_id]), wanted)
         )
-        db.add(db_category)
+        db.expire(db_subject, ["categories"])
 
-    db.commit()
-    db.refresh(db_subject)
-    return db_subject
+        # 単位数・区分の変更をこの科目を修得している学生の単位集計に反映する
+        db.flush()
+        credit_summary.refresh_for_subjects(db, [subject_id])
+        _invalidate_catalog(db)
+        _commit(db)
+        return subject_catalog.reload(db).subject(subject_id)
+
+    return await run_db(db, run)
 
 # 科目の削除エンドポイント
 @router.delete("/{subject_id}")
-def delete_subject(subject_id: int, db: Session = Depends(get_db)):
-    db_subject = db.query(models.Subject).filter(models.Subject.id == subject_id).first()
-    if db_subject is None:
-        raise HTTPException(status_code=404, detail="Subject not found")
-    
-    # Delete associated categories
-    db.query(models.SubjectCategory).filter(models.SubjectCategory.subject_id == subject_id).delete()
-
-    # Delete the subject
-    db.delete(db_subject)
-    db.commit()
-    return {"detail": "Subject deleted successfully"}
+@admission.limited("admin_writes")
+async def delete_subject(subject_id: int, db: DbSession = Depends(get_db)):
+    def run(db: Session):
+        db_subject = db.query(models.Subject).filter(models.Subject.id == subject_id).first()
+        if db_subject is None:
+            raise HTTPException(status_code=404, detail="Subject not found")
+        
+        # 科目の削除で修得行も消えるため、影響を受ける学生は先に調べておく
+        affected = credit_summary.students_with_subjects(db, [subject_id])
+
+        # Delete associated categories
+        db.query(models.SubjectCategory).filter(models.SubjectCategory.subject_id == subject_id).delete()
+
+        # Delete the subject
+        db.delete(db_subject)
+        db.flush()
+        credit_summary.refresh_student_summaries(db, affected)
+        _invalidate_catalog(db)
+        db.commit()
+        subject_catalog.reload(db)
+        return {"detail": "Subject deleted successfully"}
+
+    return await run_db(db, run)
 
 # 特定の科目を取得するエンドポイント
 @router.get("/{subject_id}", response_model=Subject)
-def read_subject(subject_id: int, db: Session = Depends(get_db)):
-    db_subject = db.query(models.Subject).filter(models.Subject.id == subject_id).first()
-    if db_subject is None:
-        raise HTTPException(status_code=404, detail="Subject not found")
-    return db_subject
\ No newline at end of file
+async def read_subject(request: Request, subject_id: int, db: DbSession = Depends(get_read_db)):
+    key = ("detail", subject_id)
+
+    def run(db: Session):
+        version = get_version(db, CATALOG)
+        cached = subject_cache.get(version, key)
+        if cached is None:
+            subject = subject_catalog.get_snapshot(db, version).subject(subject_id)
+            if subject is None:
+                raise HTTPException(status_code=404, detail="Subject not found")
+            cached = subject_cache.put(version, key, subject.model_dump_json().encode("utf-8"))
+        return cached
+
+    return (await run_db(db, run)).to_response(request)
\ No newline at end of file
@@ -0,0 +1,92 @@
+import base64
+import json
+from typing import List, Optional
+
+from fastapi import HTTPException, Response
+from sqlalchemy import and_, func, or_
+from sqlalchemy.orm import Query
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+TOTAL_COUNT_HEADER = "X-Total-Count"
+PAGINATION_HEADERS = (NEXT_CURSOR_HEADER, TOTAL_COUNT_HEADER)
+
+# カーソルの並び順として使える列（name は同名があるため id で順序を確定させる。NULL の name は最後に並ぶ）
+ORDER_KEYS = ("id", "name")
+
+
+# 最後の行の並び順キーを不透明なカーソル文字列に変換する
+def encode_cursor(order_by: str, row) -> str:
+    values = [row.id] if order_by == "id" else [getattr(row, order_by), row.id]
+    payload = json.dumps({"o": order_by, "k": values}, ensure_ascii=False, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, order_by: str) -> List:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")).decode("utf-8"))
+        values = payload["k"]
+        expected = 1 if order_by == "id" else 2
+        if payload["o"] != order_by or len(values) != expected or not isinstance(values[-1], int):
+            raise ValueError("cursor does not match order_by")
+        if expected == 2 and values[0] is not None and not isinstance(values[0], str):
+            raise ValueError("cursor does not match order_by")
+        return values
+    except (ValueError, KeyError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+# 一覧クエリにキーセット（カーソル）またはオフセットのページングを適用する
+# cursor が指定されない場合は従来どおり skip を使う
+def paginate(
+    query: Query,
+    model,
+    response: Response,
+    skip: int = 0,
+    limit: int = 100,
+    cursor: Optional[str] = None,
+    order_by: str = "id",
+    include_total: bool = False,
+):
+    if include_total:
+        # 総件数は必要な場合のみ数える（大きなテーブルでは高コスト）
+        total = query.enable_eagerloads(False).order_by(None).with_entities(func.count(model.id)).scalar()
+        response.headers[TOTAL_COUNT_HEADER] = str(total)
+
+    if order_by == "id":
+        query = query.order_by(model.id)
+        if cursor is not None:
+            query = query.filter(model.id > decode_cursor(cursor, order_by)[0])
+        else:
+            query = query.offset(skip)
+        rows = query.limit(limit).all()
+    else:
+        rows = _paginate_nullable(query, model, getattr(model, order_by), order_by, skip, limit, cursor)
+
+    if limit > 0 and len(rows) == limit:
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(order_by, rows[-1])
+    return rows
+
+
+# NULL を含む列の順（値のある行を column, id の順に並べ、その後に NULL の行を id 順に並べる）
+# カーソルの先頭キーが None なら NULL の行の途中から続ける
+def _paginate_nullable(query: Query, model, column, order_by: str, skip: int, limit: int, cursor: Optional[str]):
+    if cursor is None:
+        return query.order_by(column.is_(None), column, model.id).offset(skip).limit(limit).all()
+
+    values = decode_cursor(cursor, order_by)
+    nulls = query.filter(column.is_(None)).order_by(model.id)
+    if values[0] is None:
+        return nulls.filter(model.id > values[1]).limit(limit).all()
+
+    # 先頭の column >= 値 で索引の範囲検索に乗せ、同値の行は id で絞り込む
+    # （NULL の行は範囲に含まれないため、値のある行が limit に満たなければ続けて読み込む）
+    rows = (
+        query.filter(and_(column >= values[0], or_(column > values[0], model.id > values[1])))
+        .order_by(column, model.id)
+        .limit(limit)
+        .all()
+    )
+    if len(rows) < limit:
+        rows += nulls.limit(limit - len(rows)).all()
+    return rows
@@ -0,0 +1,126 @@
+import json
+from typing import Any, Dict, Iterable, List, Optional
+
+from fastapi import Response
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from .. import models
+from .pagination import PAGINATION_HEADERS, paginate
+
+try:
+    import orjson
+except ImportError:  # orjson がなければ標準の json で同じバイト列を作る（遅い）
+    orjson = None
+
+# 一覧エンドポイント（GET /students/・GET /subjects/）の読み取り専用の高速経路
+#
+# ORM のオブジェクト（identity map への登録・リレーションの構築）と Pydantic の from_attributes による検証を経由せず、
+# 必要な列だけをタプルで読み込み、関連する行はページの ID に対する 1 回の IN 検索でまとめて読み込んで、
+# レスポンスの dict を直接組み立てる。
+# dict のキーの順序はレスポンスモデル（schemas.student.Student / schemas.subject.Subject）のフィールドの順序、
+# 関連する行の順序は selectinload と同じ（主キー・一意索引の順）にしてあり、
+# これまでのレスポンスとバイト単位で同じになる（tests/test_projections.py で比較している）。
+# レスポンスモデルにフィールドを追加した場合はここも合わせて変更すること。
+
+# 関連する行を読み込む IN 句の ID の数の上限（selectinload と同じ）
+IN_CHUNK_SIZE = 500
+
+
+# FastAPI（Pydantic の dump_json）と同じ形式（空白なし・非 ASCII はそのまま）の JSON
+def dumps(content: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(content)
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+
+# dict・list をそのまま高速に JSON にするレスポンス（検証済みのデータにだけ使う）
+class FastJSONResponse(Response):
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+# paginate が response に設定したページングのヘッダを引き継ぐ
+# （Response を直接返す場合、エンドポイントが受け取った response のヘッダは反映されない）
+def page_response(content: List[dict], response: Response) -> FastJSONResponse:
+    headers = {name: response.headers[name] for name in PAGINATION_HEADERS if name in response.headers}
+    return FastJSONResponse(content, headers=headers)
+
+
+def _chunks(ids: List[int]) -> Iterable[List[int]]:
+    for start in range(0, len(ids), IN_CHUNK_SIZE):
+        yield ids[start:start + IN_CHUNK_SIZE]
+
+
+# 学生の一覧（schemas.student.Student の dict）
+def student_page(
+    db: Session,
+    response: Response,
+    skip: int = 0,
+    limit: int = 100,
+    cursor: Optional[str] = None,
+    order_by: str = "id",
+    include_total: bool = False,
+) -> List[dict]:
+    s = models.Student
+    query = db.query(s.id, s.name, s.course, s.email, s.entrance_year)
+    rows = paginate(query, s, response, skip, limit, cursor, order_by, include_total)
+
+    completed: Dict[int, List[dict]] = {row.id: [] for row in rows}
+    ss = models.student_subject
+    for ids in _chunks(list(completed)):
+        related = db.execute(
+            select(ss.c.student_id, models.Subject.id, models.Subject.name)
+            .join(models.Subject, models.Subject.id == ss.c.subject_id)
+            .where(ss.c.student_id.in_(ids))
+            .order_by(ss.c.student_id, ss.c.subject_id)
+        )
+        for student_id, subject_id, name in related:
+            completed[student_id].append({"id": subject_id, "name": name})
+
+    return [
+        {
+            "name": row.name,
+            "course": row.course,
+            "id": row.id,
+            "email": row.email,
+            "entrance_year": row.entrance_year,
+            "completed_subjects": completed[row.id],
+        }
+        for row in rows
+    ]
+
+
+# 科目の一覧（schemas.subject.Subject の dict）
+def subject_page(
+    db: Session,
+    response: Response,
+    skip: int = 0,
+    limit: int = 100,
+    cursor: Optional[str] = None,
+    order_by: str = "id",
+    include_total: bool = False,
+) -> List[dict]:
+    subject = models.Subject
+    query = db.query(subject.id, subject.name, subject.credit)
+    rows = paginate(query, subject, response, skip, limit, cursor, order_by, include_total)
+
+    categories: Dict[int, List[dict]] = {row.id: [] for row in rows}
+    sc = models.SubjectCategory
+    for ids in _chunks(list(categories)):
+        related = db.execute(
+            select(sc.subject_id, sc.id, sc.course, sc.category)
+            .where(sc.subject_id.in_(ids))
+            .order_by(sc.subject_id, sc.course)
+        )
+        for subject_id, category_id, course, category in related:
+            categories[subject_id].append(
+                {"course": course, "category": category.value, "id": category_id, "subject_id": subject_id}
+            )
+
+    return [
+        {"name": row.name, "credit": row.credit, "id": row.id, "categories": categories[row.id]}
+        for row in rows
+    ]
@@ -0,0 +1,46 @@
+from functools import lru_cache
+import typing
+from typing import Optional, Type
+
+from pydantic import BaseModel
+from sqlalchemy import inspect
+from sqlalchemy.orm import Query, Session, joinedload, selectinload
+
+
+# フィールドの型注釈から入れ子のレスポンスモデルを取り出す（List[Model] / Optional[Model] など）
+def _nested_schema(annotation) -> Optional[Type[BaseModel]]:
+    if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+        return annotation
+    for arg in typing.get_args(annotation):
+        schema = _nested_schema(arg)
+        if schema is not None:
+            return schema
+    return None
+
+
+# レスポンスモデルが参照するリレーションの先読みオプションを作る
+# コレクションは selectinload（IN 句で 1 クエリ）、多対一は joinedload（JOIN で同じクエリ）を使う
+@lru_cache(maxsize=None)
+def eager_options(model, schema: Type[BaseModel], _depth: int = 0) -> tuple:
+    if _depth > 3:
+        return ()
+    relationships = inspect(model).relationships
+    options = []
+    for name, field in schema.model_fields.items():
+        relationship = relationships.get(name)
+        if relationship is None:
+            continue
+        attribute = getattr(model, name)
+        loader = selectinload(attribute) if relationship.uselist else joinedload(attribute)
+        nested = _nested_schema(field.annotation)
+        if nested is not None:
+            nested_options = eager_options(relationship.mapper.class_, nested, _depth + 1)
+            if nested_options:
+                loader = loader.options(*nested_options)
+        options.append(loader)
+    return tuple(options)
+
+
+# レスポンスモデルに合わせて関連を先読みするクエリを作る
+def query_for(db: Session, model, schema: Type[BaseModel]) -> Query:
+    return db.query(model).options(*eager_options(model, schema))
@@ -0,0 +1,81 @@
+import hashlib
+import math
+from dataclasses import dataclass
+from typing import Callable, Dict, Hashable, Optional
+
+from fastapi import Request, Response
+from sqlalchemy.orm import Session
+
+from .. import admission
+from ..auth_cache import TTLCache
+from ..database import DbSession, run_db
+
+
+def make_etag(body: bytes) -> str:
+    # 本文のハッシュから作る強い ETag（同じ本文ならワーカーが違っても同じ値）
+    return '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+
+
+# If-None-Match がいずれかの ETag に一致するか（弱い比較、"*" はすべてに一致）
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or candidate.removeprefix("W/") == etag:
+            return True
+    return False
+
+
+# シリアライズ済みのレスポンス本文と ETag、付随するヘッダ
+@dataclass(frozen=True)
+class CachedResponse:
+    body: bytes
+    etag: str
+    headers: Dict[str, str]
+
+    # 条件付き GET に一致すれば 304、そうでなければ本文をそのまま返す
+    def to_response(self, request: Request) -> Response:
+        # no-cache: ブラウザは保存してよいが、毎回 If-None-Match で再検証する
+        headers = {"ETag": self.etag, "Cache-Control": "no-cache", **self.headers}
+        if etag_matches(request.headers.get("if-none-match"), self.etag):
+            return Response(status_code=304, headers=headers)
+        return Response(content=self.body, media_type="application/json", headers=headers)
+
+
+# データのバージョンごとにレスポンスを保持するインプロセスキャッシュ
+# バージョンが進むと古いエントリは参照されなくなり、LRU で追い出される
+# （複数のデータに依存する場合はバージョンのタプルを使う）
+class VersionedResponseCache:
+    def __init__(self, maxsize: int = 1024):
+        self._entries = TTLCache(maxsize=maxsize, ttl=math.inf)
+
+    def get(self, version: Hashable, key: Hashable) -> Optional[CachedResponse]:
+        return self._entries.get((version, key))
+
+    def put(self, version: Hashable, key: Hashable, body: bytes, headers: Optional[Dict[str, str]] = None) -> CachedResponse:
+        cached = CachedResponse(body=body, etag=make_etag(body), headers=dict(headers or {}))
+        self._entries.set((version, key), cached)
+        return cached
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+# キャッシュを確認し、外れた場合だけ group の枠を取って build を実行する
+# （キャッシュに当たった応答と 304 は、高負荷時にも 503 で断られない）
+# lookup / build はセッションを受け取り、lookup はキャッシュ済みの応答か None、build は作った応答を返す
+async def cached_or_limited(
+    db: DbSession,
+    group: str,
+    lookup: Callable[[Session], Optional[CachedResponse]],
+    build: Callable[[Session], CachedResponse],
+) -> CachedResponse:
+    cached = await run_db(db, lookup)
+    if cached is not None:
+        return cached
+    async with admission.limiter(group).slot():
+        return await run_db(db, build)
@@ -0,0 +1,30 @@
+from pydantic import BaseModel
+from typing import Dict, List, Optional
+
+from .subject import SubjectCategoryEnum
+
+
+class Histogram(BaseModel):
+    bin_width: int
+    # counts[i] は単位数が [i * bin_width, (i + 1) * bin_width) の学生数（最後の 0 でない階級まで）
+    counts: List[int]
+    mean: float
+    max: int
+
+class CourseStatistics(BaseModel):
+    course: Optional[str] = None
+    students: int
+    # 区分ごと（Credits のフィールド名）と合計の単位数の分布
+    credits: Dict[str, Histogram]
+    # RequirementsMet の項目ごとの充足率（0〜1）
+    requirements_met: Dict[str, float]
+    # すべての項目を満たす学生の割合
+    all_requirements_met: float
+
+class SubjectEnrollment(BaseModel):
+    course: Optional[str] = None  # 修得した学生のコース
+    subject_id: int
+    name: Optional[str] = None
+    credit: Optional[int] = None
+    category: SubjectCategoryEnum  # そのコースでの区分（区分がなければ ELECTIVE）
+    students: int
@@ -1,5 +1,5 @@
-from pydantic import BaseModel
-from typing import List ,Dict
+from pydantic import BaseModel, Field
+from typing import List ,Dict, Literal, Optional
 class CreditRequirement(BaseModel):
     required_compulsory: int = 26
     required_limited_elective: int = 47
@@ -31,4 +31,30 @@ class CreditCalculation(BaseModel):
     course: str
     credits: Credits
     requirements_met: RequirementsMet
-    details: CreditDetails
\ No newline at end of file
+    details: CreditDetails
+
+class StudentCreditSummary(BaseModel):
+    student_id: str
+    course: str
+    credits: Credits
+    requirements_met: RequirementsMet
+
+class GraduationPlanRequest(BaseModel):
+    # 省略した場合はログイン中の学生のコース・修得科目を使う（指定すると仮定の条件で計画できる）
+    course: Optional[str] = Field(None, pattern="^[ABC]$")
+    entrance_year: Optional[int] = None
+    completed_subjects: Optional[List[int]] = None
+    # count: 科目数が最小、credits: 単位数が最小
+    objective: Literal["count", "credits"] = "count"
+    # 計画に含めない科目ID（履修できない科目など）
+    excluded_subjects: List[int] = []
+
+class GraduationPlan(BaseModel):
+    feasible: bool
+    objective: str
+    course: str
+    subject_ids: List[int]  # 追加で修得すべき科目ID
+    added_credits: int
+    planned: CreditDetails  # 追加する科目の区分ごとの内訳
+    credits: Credits  # 計画どおり修得した後の単位
+    requirements_met: RequirementsMet
@@ -0,0 +1,33 @@
+from datetime import datetime
+from pydantic import BaseModel, ConfigDict, Field
+from typing import Optional
+
+
+# バックグラウンドジョブの状態（時刻は UTC）
+class Job(BaseModel):
+    id: int
+    kind: str
+    status: str  # queued / running / succeeded / failed / cancelled
+    params: dict
+    progress: int
+    total: Optional[int] = None
+    cancel_requested: bool
+    summary: Optional[dict] = None
+    error: Optional[str] = None
+    result_media_type: Optional[str] = None  # 結果ファイルがある場合のみ
+    created_by: Optional[str] = None
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+    model_config = ConfigDict(from_attributes=True)
+
+
+class RebuildCreditSummaryJob(BaseModel):
+    chunk_size: int = Field(1000, ge=1, le=10000)
+
+
+class ExportStudentsJob(BaseModel):
+    format: str = Field("ndjson", pattern="^(ndjson|csv)$")
+    course: Optional[str] = Field(None, pattern="^[ABC]$")
+    chunk_size: int = Field(1000, ge=1, le=10000)
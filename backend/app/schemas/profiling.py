@@ -0,0 +1,34 @@
+from pydantic import BaseModel, Field
+from typing import List, Literal, Optional
+
+
+class ProfilingConfig(BaseModel):
+    mode: Literal["off", "sample", "header"]
+    # mode="sample" のときにリクエストを計測する確率
+    sample_rate: float = Field(0.0, ge=0.0, le=1.0)
+    # このパスで始まるリクエストだけを計測する（例: /students/calculate-credits）
+    path_prefix: Optional[str] = None
+    # この件数を計測したら自動的に無効にする（None は無制限）
+    max_requests: Optional[int] = Field(None, ge=1)
+    buffer_size: Optional[int] = Field(None, ge=1, le=1000)
+
+class ProfileSummary(BaseModel):
+    id: int
+    created_at: float
+    method: str
+    path: str
+    route: str
+    status: int
+    duration_ms: float
+    profiled_ms: float
+
+class ProfilingStatus(BaseModel):
+    mode: str
+    sample_rate: float
+    path_prefix: Optional[str] = None
+    remaining: Optional[int] = None
+    buffer_size: int
+    header: str
+    # mode="header" のとき、計測したいリクエストの header に付ける値
+    header_token: Optional[str] = None
+    profiles: List[ProfileSummary]
@@ -0,0 +1,19 @@
+from pydantic import ConfigDict, Field
+from typing import Optional
+
+from .credit_calculation import CreditRequirement
+
+
+class RequirementRuleBase(CreditRequirement):
+    # None は全コース共通
+    course: Optional[str] = Field(None, pattern="^[ABC]$")
+    # この年度以降の入学者に適用（None は年度によらない既定値）
+    entrance_year: Optional[int] = None
+
+class RequirementRuleCreate(RequirementRuleBase):
+    pass
+
+class RequirementRule(RequirementRuleBase):
+    id: int
+
+    model_config = ConfigDict(from_attributes=True)
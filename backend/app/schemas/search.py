@@ -0,0 +1,11 @@
+from pydantic import BaseModel
+from typing import Literal, Optional
+
+
+class SearchResult(BaseModel):
+    kind: Literal["student", "subject"]
+    id: int
+    name: Optional[str] = None
+    email: Optional[str] = None  # 学生のみ
+    # 関連度（bm25 の符号を反転したもの、大きいほど上位）。索引を使わない検索では 0
+    score: float
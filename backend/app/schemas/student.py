@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field, ConfigDict
-from typing import List
+from typing import List, Optional
 
 class SubjectBase(BaseModel):
     id: int
@@ -16,6 +16,7 @@ class StudentBase(BaseModel):
 class Student(StudentBase):
     id: int
     email: str  # 追加して、返す際に利用する場合
+    entrance_year: Optional[int] = None
     completed_subjects: List[SubjectBase]
 
     model_config = ConfigDict(from_attributes=True)
@@ -25,6 +26,25 @@ class Student(StudentBase):
 class StudentCreate(BaseModel):
     name: str
     email: str
-    course: str
+    course: str = Field(..., pattern="^[ABC]$")
     uid: str  # ここに uid を追加
+    entrance_year: Optional[int] = None  # 入学年度（卒業要件の判定に使う）
     completed_subjects: List[int] = Field(default=[], description="List of completed subject IDs")
+
+
+# 修得科目の差分更新（PATCH /students/{id}/subjects）
+class StudentSubjectsUpdate(BaseModel):
+    add: List[int] = Field(default=[], description="Subject IDs to add")
+    remove: List[int] = Field(default=[], description="Subject IDs to remove")
+
+
+class ImportRowError(BaseModel):
+    row: int  # 入力ファイル上の行番号（1 始まり、CSV はヘッダ行を含む）
+    error: str
+
+
+class StudentImportResult(BaseModel):
+    total: int
+    created: int
+    failed: int
+    errors: List[ImportRowError]
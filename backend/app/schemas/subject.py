@@ -1,4 +1,4 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict, Field
 from typing import List
 from enum import Enum
 
@@ -19,8 +19,7 @@ class SubjectCategory(SubjectCategoryBase):
     id: int
     subject_id: int
 
-    class Config:
-        orm_mode = True
+    model_config = ConfigDict(from_attributes=True)
 
 class SubjectBase(BaseModel):
     name: str
@@ -36,5 +35,28 @@ class Subject(SubjectBase):
     id: int
     categories: List[SubjectCategory]
 
-    class Config:
-        orm_mode = True
\ No newline at end of file
+    model_config = ConfigDict(from_attributes=True)
+
+
+# カタログの一括同期（POST /subjects/sync）
+class CatalogSubject(SubjectBase):
+    id: int
+    categories: List[SubjectCategoryCreate] = []
+
+class CatalogSync(BaseModel):
+    subjects: List[CatalogSubject]
+    # true の場合は subjects にない科目を削除する
+    delete_missing: bool = False
+    # true の場合は差分の報告だけを行い、何も変更しない
+    dry_run: bool = False
+
+class CatalogSyncReport(BaseModel):
+    subjects_created: List[int] = Field(default_factory=list)
+    subjects_updated: List[int] = Field(default_factory=list)  # 名前・単位数が変わった科目
+    subjects_deleted: List[int] = Field(default_factory=list)
+    categories_upserted: int = 0
+    categories_deleted: int = 0
+    unchanged: int = 0  # 入力のうち変更のなかった科目の数
+    students_refreshed: int = 0  # 単位集計を更新した学生の数
+    changed: bool = False
+    dry_run: bool = False
@@ -0,0 +1,170 @@
+import string
+from functools import lru_cache
+from typing import List, Optional, Tuple
+
+from sqlalchemy import Integer, String, bindparam, column, func, literal, literal_column, null, or_, select, table, union_all
+from sqlalchemy.orm import Session
+
+from . import models
+from .schemas.search import SearchResult
+
+# 学生（氏名・メールアドレス）と科目（科目名）の全文検索
+#
+# SQLite では models.SEARCH_INDEXES の FTS5 索引を使う。空白で区切った語ごとの部分一致の AND 検索で、
+# 3 文字以上の語は trigram の索引で絞り込んで bm25 で順位付けし、
+# 3 文字未満の語（「林」「田中」など）は bigram の索引で絞り込む（元の表は走査しない）。
+# 順位付けする場合は順位の上位 skip + limit 件だけを FTS5 の中で選んでから元の表と結合する
+# （多くの行に一致する語でも、結合と並べ替えは limit 件程度で済む）。
+# SQLite 以外のデータベースではすべての語を ILIKE で検索する。
+# 順位付けしない結果（3 文字未満の語だけの場合・ILIKE）は名前の短い順に並べる。
+
+KINDS = ("student", "subject")
+# trigram の索引で検索できる語の最小の文字数
+MIN_INDEXED_LENGTH = 3
+# bm25 の列の重み（氏名の一致をメールアドレスの一致より上位にする）
+STUDENT_WEIGHTS = (10.0, 1.0)
+
+
+def split_terms(q: str) -> Tuple[List[str], List[str]]:
+    terms = list(dict.fromkeys(q.split()))
+    indexed = [term for term in terms if len(term) >= MIN_INDEXED_LENGTH]
+    return indexed, [term for term in terms if len(term) < MIN_INDEXED_LENGTH]
+
+
+# FTS5 の検索式（各語を 1 つのフレーズとして AND で結ぶ。演算子や記号は語の一部として扱う）
+def match_expression(terms: List[str]) -> str:
+    return " AND ".join('"' + term.replace('"', '""') + '"' for term in terms)
+
+
+_ASCII_LOWER = str.maketrans(string.ascii_uppercase, string.ascii_lowercase)
+
+
+# bigram の索引の語（ASCII を小文字にした UTF-8 の 16 進数。索引のトリガーの lower / hex と同じ変換）
+def bigram_token(term: str) -> str:
+    return term.translate(_ASCII_LOWER).encode("utf-8").hex()
+
+
+# bigram の索引の検索式（2 文字の語は一致する bigram、1 文字の語はその文字で始まる bigram）
+def bigram_expression(terms: List[str]) -> str:
+    return " AND ".join('"' + bigram_token(term) + '"' + ("*" if len(term) == 1 else "") for term in terms)
+
+
+def _like_pattern(term: str) -> str:
+    return "%" + term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+
+
+def _contains(columns, term: str):
+    pattern = _like_pattern(term)
+    return or_(*(c.ilike(pattern, escape="\\") for c in columns))
+
+
+def _match(index_name: str, expression):
+    return literal_column(index_name).op("MATCH")(expression)
+
+
+# 種類ごとの (モデル, FTS5 の索引, bm25 の列の重み, 検索する列, 結果の列)
+def _kind(kind: str):
+    if kind == "student":
+        model, index_name, weights = models.Student, "student_search", STUDENT_WEIGHTS
+        searched = [model.name, model.email]
+        email = model.email
+    else:
+        model, index_name, weights = models.Subject, "subject_search", ()
+        searched = [model.name]
+        email = null().cast(String)
+    columns = [literal(kind).label("kind"), model.id.label("id"), model.name.label("name"), email.label("email")]
+    return model, index_name, weights, searched, columns
+
+
+# すべての語を ILIKE で検索する（SQLite 以外のデータベース）
+def _like_query(kind: str, terms: List[str]):
+    model, _, _, searched, columns = _kind(kind)
+    query = select(*columns, literal(0.0).label("rank")).select_from(model)
+    for term in terms:
+        query = query.where(_contains(searched, term))
+    return query
+
+
+# FTS5 の索引で検索する（検索式と件数はバインド変数 match / bigrams / ranked_limit で渡す）
+# ranked: 3 文字以上の語を trigram の索引で検索して順位付けする
+# filtered: 3 文字未満の語を bigram の索引で絞り込む
+# limited: 順位の上位 ranked_limit 件だけを返す
+def _index_query(kind: str, ranked: bool, filtered: bool, limited: bool):
+    model, index_name, weights, _, columns = _kind(kind)
+    matched_short = None
+    if filtered:
+        bigrams = table(f"{index_name}_bigram", column("rowid"))
+        matched_short = select(bigrams.c.rowid).where(_match(bigrams.name, bindparam("bigrams", type_=String)))
+    if not ranked:
+        return select(*columns, literal(0.0).label("rank")).select_from(model).where(model.id.in_(matched_short))
+
+    index = table(index_name, column("rowid"), column("rank"))
+    top = select(index.c.rowid, index.c.rank).where(_match(index_name, bindparam("match", type_=String)))
+    if weights:
+        # 列の重みを付けた bm25 を FTS5 の rank 列として使う
+        top = top.where(index.c.rank.op("MATCH")(f"bm25({', '.join(str(w) for w in weights)})"))
+    if matched_short is not None:
+        # 単項の + で rowid の IN を FTS5 に渡さない（渡すと IN の値ごとに trigram の索引を検索し直す）
+        top = top.where(literal_column(f"+{index_name}.rowid").in_(matched_short))
+    if limited:
+        top = top.order_by(index.c.rank, index.c.rowid).limit(bindparam("ranked_limit", type_=Integer))
+    top = top.subquery(f"{kind}_ranked")
+    return select(*columns, top.c.rank).select_from(top).join(model, model.id == top.c.rowid)
+
+
+def _union(queries):
+    return (union_all(*queries) if len(queries) > 1 else queries[0]).subquery("results")
+
+
+# 索引を使う検索の副問い合わせは語の内容によらないため、組み合わせごとに 1 回だけ作る
+@lru_cache(maxsize=None)
+def _index_results(kinds: Tuple[str, ...], ranked: bool, filtered: bool, limited: bool):
+    return _union([_index_query(k, ranked, filtered, limited) for k in kinds])
+
+
+# (検索結果の副問い合わせ, 順位付けしたかどうか, バインド変数)（語がない場合は None）
+def _results(db: Session, q: str, kind: Optional[str] = None, limited: bool = False):
+    indexed, short = split_terms(q)
+    if not indexed and not short:
+        return None
+    kinds = KINDS if kind is None else (kind,)
+    if db.get_bind().dialect.name != "sqlite":
+        return _union([_like_query(k, indexed + short) for k in kinds]), False, {}
+    params = {}
+    if indexed:
+        params["match"] = match_expression(indexed)
+    if short:
+        params["bigrams"] = bigram_expression(short)
+    return _index_results(kinds, bool(indexed), bool(short), limited), bool(indexed), params
+
+
+# 関連度順の検索結果（skip / limit でページング）
+def search(db: Session, q: str, kind: Optional[str] = None, skip: int = 0, limit: int = 20) -> List[SearchResult]:
+    found = _results(db, q, kind, limited=True)
+    if found is None:
+        return []
+    results, ranked, params = found
+    if ranked:
+        params["ranked_limit"] = skip + limit
+    # 種類ごとに選んだ上位の行と同じ順（順位が同じなら ID 順）で並べる
+    order = results.c.rank if ranked else func.length(results.c.name)
+    rows = db.execute(
+        select(results)
+        .order_by(order, results.c.kind, results.c.id)
+        .offset(skip)
+        .limit(limit),
+        params,
+    )
+    return [
+        SearchResult(kind=row.kind, id=row.id, name=row.name, email=row.email, score=-row.rank if row.rank else 0.0)
+        for row in rows
+    ]
+
+
+# 検索結果の総件数
+def count(db: Session, q: str, kind: Optional[str] = None) -> int:
+    found = _results(db, q, kind)
+    if found is None:
+        return 0
+    results, _, params = found
+    return db.execute(select(func.count()).select_from(results), params).scalar_one()
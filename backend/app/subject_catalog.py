@@ -0,0 +1,160 @@
+import threading
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session
+
+from . import credit_engine, models
+from .cache_versions import CATALOG, get_version
+from .schemas.subject import Subject, SubjectCategory
+
+# 科目カタログ（subjects / subject_category）のプロセス内スナップショット
+#
+# カタログは数百件程度でほとんど変わらないため、単位計算と科目の参照のたびに DB から読み込まず、
+# 配列（credit_engine.CreditCatalog）と科目ID → 位置の索引にまとめた不変のスナップショットを共有する。
+# スナップショットはカタログのバージョン（cache_versions）ごとに作り、バージョンが変われば作り直して差し替える
+# （他のワーカーの書き込みはバージョンの確認で反映される。確認は主キーでの 1 行の読み込みのみ）。
+# カタログを書き換えたセッションは、コミットまではキャッシュを使わずそのセッションから読み込む
+# （同じトランザクション内の単位集計の再計算に未コミットの変更を反映するため）。
+
+# カタログを変更したセッションの印（Session.info のキー）
+_CHANGED = "subject_catalog_changed"
+_CATALOG_TABLES = frozenset({models.Subject.__tablename__, models.SubjectCategory.__tablename__})
+
+# 科目ごとの区分（区分の行ID, コース, 区分の値）
+CategoryRecords = Tuple[Tuple[int, str, str], ...]
+
+
+class CatalogSnapshot:
+    __slots__ = ("version", "catalog", "names", "categories", "_index")
+
+    def __init__(
+        self,
+        version: int,
+        catalog: credit_engine.CreditCatalog,
+        names: Sequence[str],
+        categories: Sequence[CategoryRecords],
+    ):
+        for array in (catalog.subject_ids, catalog.credits, catalog.category_table):
+            array.flags.writeable = False
+        self.version = version
+        self.catalog = catalog  # 科目ID（昇順）・単位数・コース×科目の区分コード
+        self.names = tuple(names)  # catalog.subject_ids と同じ順
+        self.categories = tuple(categories)  # 〃（科目ごとにコース順）
+        self._index: Dict[int, int] = {int(subject_id): i for i, subject_id in enumerate(catalog.subject_ids)}
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def __contains__(self, subject_id: int) -> bool:
+        return subject_id in self._index
+
+    # GET /subjects/{id} のレスポンス（存在しない科目は None）
+    def subject(self, subject_id: int) -> Optional[Subject]:
+        i = self._index.get(subject_id)
+        if i is None:
+            return None
+        return Subject(
+            id=subject_id,
+            name=self.names[i],
+            credit=int(self.catalog.credits[i]),
+            categories=[
+                SubjectCategory(id=category_id, subject_id=subject_id, course=course, category=category)
+                for category_id, course, category in self.categories[i]
+            ],
+        )
+
+
+# subjects と subject_category を 1 回ずつ読み込んでスナップショットを作る
+def build(db: Session, version: int = 0) -> CatalogSnapshot:
+    s, sc = models.Subject, models.SubjectCategory
+    subjects = db.execute(select(s.id, s.name, s.credit).order_by(s.id)).all()
+    rows = db.execute(select(sc.id, sc.subject_id, sc.course, sc.category).order_by(sc.subject_id, sc.course)).all()
+
+    index = {row.id: i for i, row in enumerate(subjects)}
+    categories: List[list] = [[] for _ in subjects]
+    for row in rows:
+        i = index.get(row.subject_id)
+        if i is not None:
+            categories[i].append((row.id, row.course, row.category.value))
+
+    return CatalogSnapshot(
+        version=version,
+        catalog=credit_engine.make_catalog(
+            [(row.id, row.credit) for row in subjects],
+            [(row.course, row.subject_id, row.category) for row in rows],
+        ),
+        names=[row.name for row in subjects],
+        categories=[tuple(records) for records in categories],
+    )
+
+
+_lock = threading.Lock()
+_snapshot: Optional[CatalogSnapshot] = None
+
+
+# 現在のカタログのスナップショットを返す（バージョンが変わっていなければ作成済みのものを共有する）
+# version を確認済みの場合は渡すと、バージョンの読み込みを省略する
+def get_snapshot(db: Session, version: Optional[int] = None) -> CatalogSnapshot:
+    global _snapshot
+    if version is None:
+        version = get_version(db, CATALOG)
+    if db.info.get(_CHANGED):
+        return build(db, version)
+    snapshot = _snapshot
+    if snapshot is not None and snapshot.version == version:
+        return snapshot
+    snapshot = build(db, version)
+    with _lock:
+        # 遅れて読み込んだ古いバージョン（参照専用のレプリカなど）では差し替えない
+        if _snapshot is None or _snapshot.version <= version:
+            _snapshot = snapshot
+    return snapshot
+
+
+# 単位計算に渡すカタログ（credit_engine.calculate_cohort_credits などの catalog 引数）
+def get_catalog(db: Session) -> credit_engine.CreditCatalog:
+    return get_snapshot(db).catalog
+
+
+def invalidate() -> None:
+    global _snapshot
+    with _lock:
+        _snapshot = None
+
+
+# カタログを変更したトランザクションのコミット後に呼ぶ。新しいスナップショットを作って差し替える
+def reload(db: Session) -> CatalogSnapshot:
+    invalidate()
+    return get_snapshot(db)
+
+
+# ORM の変更・一括の INSERT / UPDATE / DELETE のどちらでカタログを書き換えても、セッションに印を付ける
+@event.listens_for(Session, "before_flush")
+def _mark_flushed_changes(session, flush_context, instances):
+    catalog_types = (models.Subject, models.SubjectCategory)
+    # 修得科目の関連（Subject.students）だけの変更はカタログの変更として扱わない
+    if any(isinstance(obj, catalog_types) for obj in (*session.new, *session.deleted)) or any(
+        isinstance(obj, catalog_types) and session.is_modified(obj, include_collections=False) for obj in session.dirty
+    ):
+        session.info[_CHANGED] = True
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _mark_statement_changes(orm_execute_state):
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        table = getattr(orm_execute_state.statement, "table", None)
+        if getattr(table, "name", None) in _CATALOG_TABLES:
+            orm_execute_state.session.info[_CHANGED] = True
+
+
+# コミットしたら共有のスナップショットを捨てる（バージョンを進めない書き込みも次の参照で反映される）
+@event.listens_for(Session, "after_commit")
+def _discard_after_commit(session):
+    if session.info.pop(_CHANGED, False):
+        invalidate()
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_after_rollback(session):
+    session.info.pop(_CHANGED, None)
@@ -0,0 +1,110 @@
+"""ベンチマーク用の合成データ生成
+
+シードを固定した乱数で、本番規模（既定: 学生 50,000 人・科目 800・コース A/B/C）のデータを作る。
+同じ引数なら同じデータになるため、実行間で結果を比較できる。
+
+- 科目: 単位は 1〜4（2 単位が中心）。各コースに 8 割の科目を登録し、区分は必修が少なめの分布
+- 学生: 氏名は 2 文字の姓（SURNAMES を順に割り当てる）と学生番号。コースは均等、入学年度は 2019〜2024。
+  修得科目数は学年相当の平均 0〜60 科目程度に正規分布で散らし、自コースの科目を 9 割の確率で選ぶ
+"""
+import random
+from dataclasses import asdict, dataclass
+from typing import Iterator, List
+
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+from app import credit_summary, models
+from app.credit_engine import COURSES
+
+CATEGORY_WEIGHTS = {
+    models.SubjectCategoryEnum.COMPULSORY: 2,
+    models.SubjectCategoryEnum.LIMITED_ELECTIVE: 3,
+    models.SubjectCategoryEnum.STANDARD_ELECTIVE: 3,
+    models.SubjectCategoryEnum.ELECTIVE: 2,
+}
+CREDITS = (1, 2, 2, 2, 2, 4)
+ENTRANCE_YEARS = range(2019, 2025)
+# 入学年度ごとの平均修得科目数（2024 年度入学は 0 に近く、2019 年度入学はほぼ卒業要件を満たす）
+SUBJECTS_PER_YEAR = 12
+CHUNK_SIZE = 5000
+# 学生の姓（2 文字。全文検索のベンチマークで、trigram の索引で検索できない短い語として使う）
+SURNAMES = (
+    "佐藤", "鈴木", "高橋", "田中", "伊藤", "渡辺", "山本", "中村", "小林", "加藤",
+    "吉田", "山田", "山口", "松本", "井上", "木村", "清水", "山崎", "池田", "阿部",
+)
+
+
+@dataclass(frozen=True)
+class Dataset:
+    students: int = 50_000
+    subjects: int = 800
+    seed: int = 0
+
+    # 学生 i（1 始まり）の UID（ベンチマークのトークン生成に使う）
+    @staticmethod
+    def uid(student_id: int) -> str:
+        return f"bench-{student_id:06d}"
+
+    def as_dict(self) -> dict:
+        return asdict(self)
+
+
+def _chunks(rows: Iterator[dict], size: int = CHUNK_SIZE) -> Iterator[List[dict]]:
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+# 空のデータベースに合成データを挿入し、単位集計も作成する（挿入した修得記録の件数を返す）
+def generate(db: Session, dataset: Dataset = Dataset()) -> int:
+    rng = random.Random(dataset.seed)
+    categories, weights = zip(*CATEGORY_WEIGHTS.items())
+
+    subject_ids = list(range(1, dataset.subjects + 1))
+    db.execute(insert(models.Subject), [
+        {"id": i, "name": f"科目{i:04d}", "credit": rng.choice(CREDITS)} for i in subject_ids
+    ])
+    course_subjects = {}
+    category_rows = []
+    for course in COURSES:
+        offered = sorted(rng.sample(subject_ids, int(len(subject_ids) * 0.8)))
+        course_subjects[course] = offered
+        category_rows.extend(
+            {"subject_id": i, "course": course, "category": rng.choices(categories, weights)[0]} for i in offered
+        )
+    db.execute(insert(models.SubjectCategory), category_rows)
+
+    students = []
+    for i in range(1, dataset.students + 1):
+        course = COURSES[i % len(COURSES)]
+        year = rng.choice(ENTRANCE_YEARS)
+        students.append((i, course, year))
+    for chunk in _chunks({
+        "id": i, "name": f"{SURNAMES[i % len(SURNAMES)]} {i:06d}", "course": course,
+        "email": f"{Dataset.uid(i)}@example.com", "uid": Dataset.uid(i), "entrance_year": year,
+    } for i, course, year in students):
+        db.execute(insert(models.Student), chunk)
+
+    def enrollments():
+        for i, course, year in students:
+            mean = (max(ENTRANCE_YEARS) - year) * SUBJECTS_PER_YEAR
+            n = max(0, min(int(rng.gauss(mean, 6)), len(course_subjects[course])))
+            own = rng.sample(course_subjects[course], n - n // 10)
+            other = rng.sample(subject_ids, n // 10)
+            for subject_id in set(own) | set(other):
+                yield {"student_id": i, "subject_id": subject_id}
+
+    count = 0
+    for chunk in _chunks(enrollments()):
+        db.execute(insert(models.student_subject), chunk)
+        count += len(chunk)
+    db.commit()
+
+    credit_summary.rebuild(db)
+    return count
@@ -0,0 +1,317 @@
+"""負荷・レイテンシのベンチマーク
+
+合成データ（benchmarks.data）を入れた SQLite に対して、FastAPI の app をプロセス内（ASGI 直結）で呼び出し、
+シナリオごとに p50/p95/p99 のレイテンシとスループットを測る。
+認証付きのエンドポイントは benchmarks.local_auth の署名器で発行したトークンを使う（ネットワーク不要）。
+
+各シナリオは並列数 1（レイテンシ）と --concurrency（スループット）の 2 通りで実行する。
+データベースは同じ引数なら再利用する（作り直す場合は --regenerate）。
+
+    python -m benchmarks.load run --output before.json
+    python -m benchmarks.load run --students 5000 --requests 200 --concurrency 16 --output after.json
+    python -m benchmarks.load compare before.json after.json --threshold 10
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from dataclasses import dataclass
+from typing import Callable, List, Optional, Tuple
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PERCENTILES = (50, 95, 99)
+# benchmarks.data が生成するデータの版（生成するデータを変えたら上げ、既存のデータベースを再利用しない）
+DATA_VERSION = 2
+# 認証付きシナリオで使う学生数（最初のリクエストだけ署名検証が走り、以降はトークンキャッシュに当たる）
+TOKEN_USERS = 500
+
+
+@dataclass(frozen=True)
+class Scenario:
+    name: str
+    method: str
+    # (乱数, 学生数, 科目数) からパスを作る
+    path: Callable[[random.Random, int, int], str]
+    auth: Optional[str] = None  # None / "student" / "admin"
+    json: Optional[dict] = None
+    # --requests に対する比率（重い一括処理は少なくする）
+    weight: float = 1.0
+
+
+SCENARIOS = (
+    Scenario("read_students", "GET", lambda rng, n, m: f"/students/?limit=100&skip={rng.randrange(0, min(n, 5000), 100)}"),
+    Scenario("read_students_cursor", "GET", lambda rng, n, m: "/students/?limit=100&cursor=" + _cursor(rng.randrange(n))),
+    Scenario("read_subjects", "GET", lambda rng, n, m: f"/subjects/?limit=100&skip={rng.randrange(0, m, 100)}"),
+    Scenario("read_subject", "GET", lambda rng, n, m: f"/subjects/{rng.randrange(1, m + 1)}"),
+    Scenario("calculate_credits", "GET", lambda rng, n, m: "/students/calculate-credits", auth="student"),
+    Scenario("plan_graduation", "POST", lambda rng, n, m: "/students/plan", auth="student", json={}),
+    Scenario(
+        "calculate_credits_batch", "GET", lambda rng, n, m: f"/students/calculate-credits/batch?course={rng.choice('ABC')}",
+        auth="admin", weight=0.05,
+    ),
+    # 全文検索（学生番号の一部による部分一致）
+    Scenario("search", "GET", lambda rng, n, m: f"/api/admin/search/?q={rng.randrange(n) // 10:05d}", auth="admin"),
+    # 全文検索（2 文字の姓。学生の 1/20 に一致する）
+    Scenario("search_surname", "GET", lambda rng, n, m: "/api/admin/search/?q=" + _surname(rng), auth="admin"),
+    # 全文検索（全学生のメールアドレスに一致する語。順位の上位だけを選べるか）
+    Scenario("search_broad", "GET", lambda rng, n, m: "/api/admin/search/?q=example", auth="admin"),
+)
+
+
+def _cursor(student_id: int) -> str:
+    from types import SimpleNamespace
+
+    from app.routers.pagination import encode_cursor
+
+    return encode_cursor("id", SimpleNamespace(id=student_id))
+
+
+def _surname(rng: random.Random) -> str:
+    from benchmarks.data import SURNAMES
+
+    return rng.choice(SURNAMES)
+
+
+def percentile_summary(latencies_ms: List[float]) -> dict:
+    import numpy as np
+
+    values = np.asarray(latencies_ms, dtype=float)
+    return {
+        "mean": float(values.mean()),
+        **{f"p{p}": float(np.percentile(values, p)) for p in PERCENTILES},
+        "max": float(values.max()),
+    }
+
+
+# 1 シナリオを指定の並列数で実行する
+async def run_scenario(client, scenario: Scenario, tokens, dataset, requests: int, concurrency: int, seed: int) -> dict:
+    rng = random.Random(seed)
+    jobs = []
+    for _ in range(requests):
+        headers = {}
+        if scenario.auth == "admin":
+            headers["Authorization"] = f"Bearer {tokens['admin']}"
+        elif scenario.auth == "student":
+            headers["Authorization"] = f"Bearer {rng.choice(tokens['students'])}"
+        jobs.append((scenario.path(rng, dataset.students, dataset.subjects), headers))
+
+    latencies: List[float] = []
+    errors: List[int] = []
+    queue = iter(jobs)
+
+    async def worker():
+        for path, headers in queue:
+            start = time.perf_counter()
+            response = await client.request(scenario.method, path, headers=headers, json=scenario.json)
+            latencies.append((time.perf_counter() - start) * 1000)
+            if response.status_code >= 400:
+                errors.append(response.status_code)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    return {
+        "scenario": scenario.name,
+        "concurrency": concurrency,
+        "requests": requests,
+        "errors": len(errors),
+        "error_statuses": sorted(set(errors)),
+        "throughput_rps": requests / elapsed,
+        "latency_ms": percentile_summary(latencies),
+    }
+
+
+async def _run_all(dataset, requests: int, concurrency: int, warmup: int, seed: int, only=None) -> List[dict]:
+    import httpx
+
+    from app.main import app
+    from benchmarks.data import Dataset
+    from benchmarks.local_auth import LocalTokenSigner
+
+    # リクエストごとのアクセスログを出さない
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+
+    signer = LocalTokenSigner()
+    signer.install()
+    rng = random.Random(seed)
+    users = rng.sample(range(1, dataset.students + 1), min(TOKEN_USERS, dataset.students))
+    tokens = {
+        "students": [signer.token(Dataset.uid(i)) for i in users],
+        "admin": signer.token("bench-admin", admin=True),
+    }
+
+    results = []
+    transport = httpx.ASGITransport(app=app)
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            for scenario in SCENARIOS:
+                if only and scenario.name not in only:
+                    continue
+                n = max(1, int(requests * scenario.weight))
+                # ウォームアップ（接続プール・カタログ・キャッシュの初期化を計測から除く）
+                await run_scenario(client, scenario, tokens, dataset, max(1, int(warmup * scenario.weight)), 1, seed)
+                for c in sorted({1, concurrency}):
+                    results.append(await run_scenario(client, scenario, tokens, dataset, n, c, seed + c))
+    return results
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], cwd=BACKEND_DIR, capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def default_database(students: int, subjects: int, seed: int) -> str:
+    return os.path.join(tempfile.gettempdir(), f"mateko-bench-v{DATA_VERSION}-{students}-{subjects}-{seed}.db")
+
+
+# データベースを用意して全シナリオを実行する
+# app のエンジンは import 時に DATABASE_URL から作られるため、環境変数を設定してから import する
+def run(
+    students: int = 50_000,
+    subjects: int = 800,
+    seed: int = 0,
+    requests: int = 500,
+    concurrency: int = 8,
+    warmup: int = 20,
+    database: Optional[str] = None,
+    regenerate: bool = False,
+    only=None,
+) -> dict:
+    if "app.database" in sys.modules:
+        raise RuntimeError("benchmarks.load.run must be called before app is imported")
+
+    database = database or default_database(students, subjects, seed)
+    if regenerate and os.path.exists(database):
+        os.remove(database)
+    generated = not os.path.exists(database)
+    os.environ.update({
+        "DATABASE_URL": f"sqlite:///{database}",
+        "FIREBASE_INIT": "false",
+        "SETUP_ADMIN_CLAIMS": "false",
+        "DB_CREATE_ALL": "true",
+    })
+
+    from app.database import SessionLocal, engine
+    from app.models import Base
+    from benchmarks.data import Dataset, generate
+
+    dataset = Dataset(students=students, subjects=subjects, seed=seed)
+    generate_s = None
+    if generated:
+        Base.metadata.create_all(bind=engine)
+        start = time.perf_counter()
+        with SessionLocal() as db:
+            generate(db, dataset)
+        generate_s = time.perf_counter() - start
+
+    results = asyncio.run(_run_all(dataset, requests, concurrency, warmup, seed, only))
+    return {
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "git_commit": _git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "dataset": dataset.as_dict(),
+        "database": database,
+        "generated": generated,
+        "generate_s": generate_s,
+        "database_async": os.getenv("DATABASE_ASYNC", "false"),
+        "results": results,
+    }
+
+
+def _key(result: dict) -> Tuple[str, int]:
+    return result["scenario"], result["concurrency"]
+
+
+# 2 回の結果を比較し、p95 が threshold % を超えて悪化したシナリオを返す
+def compare(before: dict, after: dict, threshold: float = 10.0) -> Tuple[List[str], List[str]]:
+    lines = [f"{'scenario':<28}{'c':>4}{'p50':>18}{'p95':>18}{'p99':>18}{'rps':>18}"]
+    regressions = []
+    previous = {_key(r): r for r in before["results"]}
+    for result in after["results"]:
+        old = previous.get(_key(result))
+        if old is None:
+            continue
+        cells = []
+        for metric in ("p50", "p95", "p99"):
+            a, b = old["latency_ms"][metric], result["latency_ms"][metric]
+            cells.append(f"{b:8.2f} ({(b - a) / a * 100:+6.1f}%)" if a else f"{b:8.2f}")
+        a, b = old["throughput_rps"], result["throughput_rps"]
+        cells.append(f"{b:8.1f} ({(b - a) / a * 100:+6.1f}%)" if a else f"{b:8.1f}")
+        lines.append(f"{result['scenario']:<28}{result['concurrency']:>4}" + "".join(f"{c:>18}" for c in cells))
+
+        a, b = old["latency_ms"]["p95"], result["latency_ms"]["p95"]
+        if a and (b - a) / a * 100 > threshold:
+            regressions.append(f"{result['scenario']} (c={result['concurrency']})")
+    return lines, regressions
+
+
+def _print_results(result: dict) -> None:
+    print(f"{'scenario':<28}{'c':>4}{'p50':>10}{'p95':>10}{'p99':>10}{'rps':>10}{'errors':>8}")
+    for r in result["results"]:
+        latency = r["latency_ms"]
+        print(
+            f"{r['scenario']:<28}{r['concurrency']:>4}{latency['p50']:>10.2f}{latency['p95']:>10.2f}"
+            f"{latency['p99']:>10.2f}{r['throughput_rps']:>10.1f}{r['errors']:>8}"
+        )
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="ベンチマークを実行する")
+    run_parser.add_argument("--students", type=int, default=50_000)
+    run_parser.add_argument("--subjects", type=int, default=800)
+    run_parser.add_argument("--seed", type=int, default=0)
+    run_parser.add_argument("--requests", type=int, default=500, help="シナリオ・並列数ごとのリクエスト数")
+    run_parser.add_argument("--concurrency", type=int, default=8)
+    run_parser.add_argument("--warmup", type=int, default=20)
+    run_parser.add_argument("--database", help="SQLite ファイル（既定は一時ディレクトリ）")
+    run_parser.add_argument("--regenerate", action="store_true", help="データベースを作り直す")
+    run_parser.add_argument("--scenario", action="append", dest="only", help="実行するシナリオ（複数指定可）")
+    run_parser.add_argument("--output", help="結果を JSON で保存するファイル")
+
+    compare_parser = commands.add_parser("compare", help="2 回の結果を比較する")
+    compare_parser.add_argument("before")
+    compare_parser.add_argument("after")
+    compare_parser.add_argument("--threshold", type=float, default=10.0, help="p95 の悪化を失敗とする割合（%%）")
+
+    args = parser.parse_args(argv)
+    if args.command == "compare":
+        with open(args.before) as f:
+            before = json.load(f)
+        with open(args.after) as f:
+            after = json.load(f)
+        lines, regressions = compare(before, after, args.threshold)
+        print("\n".join(lines))
+        if regressions:
+            print("p95 regressions: " + ", ".join(regressions))
+            return 1
+        return 0
+
+    result = run(
+        students=args.students, subjects=args.subjects, seed=args.seed, requests=args.requests,
+        concurrency=args.concurrency, warmup=args.warmup, database=args.database,
+        regenerate=args.regenerate, only=args.only,
+    )
+    _print_results(result)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,66 @@
+"""Firebase の代わりにローカルで ID トークンを発行する署名器（ベンチマーク用）
+
+起動時に RSA 鍵と自己署名証明書を作り、firebase_auth の公開鍵キャッシュに登録する。
+発行するトークンは Firebase の ID トークンと同じ形式（RS256・kid・aud/iss/sub）なので、
+認証付きのエンドポイントも本番と同じ検証処理（署名検証・トークンキャッシュ）を通る。
+admin クレームをトークンに含めるため、カスタムクレームの取得（ネットワーク）も発生しない。
+"""
+import datetime
+import os
+import time
+
+from cryptography import x509
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from cryptography.x509.oid import NameOID
+
+import google.auth.crypt
+import google.auth.jwt
+
+from app import firebase_auth
+
+DEFAULT_PROJECT_ID = "mateko-credit-bench"
+KEY_ID = "local-bench-key"
+
+
+class LocalTokenSigner:
+    def __init__(self, project_id: str = DEFAULT_PROJECT_ID, key_id: str = KEY_ID):
+        self.project_id = project_id
+        self.key_id = key_id
+        key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+        self._signer = google.auth.crypt.RSASigner.from_string(
+            key.private_bytes(
+                serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()
+            ),
+            key_id=key_id,
+        )
+        name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, key_id)])
+        now = datetime.datetime.now(datetime.timezone.utc)
+        cert = (
+            x509.CertificateBuilder()
+            .subject_name(name).issuer_name(name).public_key(key.public_key())
+            .serial_number(x509.random_serial_number())
+            .not_valid_before(now - datetime.timedelta(days=1))
+            .not_valid_after(now + datetime.timedelta(days=1))
+            .sign(key, hashes.SHA256())
+        )
+        self.certificate = cert.public_bytes(serialization.Encoding.PEM).decode("ascii")
+
+    # firebase_auth が本署名器のトークンを検証するように設定する
+    # （公開鍵キャッシュを差し替え、プロジェクトIDは GOOGLE_CLOUD_PROJECT から読ませる）
+    def install(self) -> None:
+        os.environ["GOOGLE_CLOUD_PROJECT"] = self.project_id
+        firebase_auth.signing_keys.set({self.key_id: self.certificate}, ttl=24 * 3600)
+
+    def token(self, uid: str, admin: bool = False, ttl: int = 3600) -> str:
+        now = int(time.time())
+        payload = {
+            "iss": firebase_auth.ID_TOKEN_ISSUER_PREFIX + self.project_id,
+            "aud": self.project_id,
+            "sub": uid,
+            "iat": now,
+            "exp": now + ttl,
+            "auth_time": now,
+            "admin": admin,
+        }
+        return google.auth.jwt.encode(self._signer, payload).decode("ascii")
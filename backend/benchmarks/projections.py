@@ -0,0 +1,132 @@
+"""一覧エンドポイントのシリアライズ経路のベンチマーク
+
+GET /students/・GET /subjects/ の 1 ページ分の処理（クエリ・オブジェクトの構築・JSON へのシリアライズ）を、
+ORM + Pydantic の経路（query_for → model_validate → dump_json）と、
+列のタプルから dict を直接組み立てる経路（app.routers.projections）で比べる。
+両者のバイト列が同じであることも確認する。データベースは benchmarks.load と共用する。
+
+    python -m benchmarks.projections
+    python -m benchmarks.projections --students 50000 --limit 100 --pages 200 --output projections.json
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import time
+from typing import Callable, Dict, List, Optional
+
+from benchmarks.load import default_database
+
+
+def _timed(fn: Callable[[], bytes], repeat: int) -> Dict[str, float]:
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return {"median_ms": statistics.median(samples), "min_ms": min(samples)}
+
+
+def run(
+    students: int = 50_000,
+    subjects: int = 800,
+    seed: int = 0,
+    limit: int = 100,
+    pages: int = 100,
+    database: Optional[str] = None,
+    regenerate: bool = False,
+) -> dict:
+    if "app.database" in sys.modules:
+        raise RuntimeError("benchmarks.projections.run must be called before app is imported")
+
+    database = database or default_database(students, subjects, seed)
+    if regenerate and os.path.exists(database):
+        os.remove(database)
+    os.environ.update({
+        "DATABASE_URL": f"sqlite:///{database}",
+        "FIREBASE_INIT": "false",
+        "SETUP_ADMIN_CLAIMS": "false",
+    })
+
+    from fastapi import Response
+    from pydantic import TypeAdapter
+
+    from app import models
+    from app.database import SessionLocal, engine
+    from app.routers import projections
+    from app.routers.pagination import paginate
+    from app.routers.queries import query_for
+    from app.schemas.student import Student
+    from app.schemas.subject import Subject
+    from benchmarks.data import Dataset, generate
+
+    dataset = Dataset(students=students, subjects=subjects, seed=seed)
+    if not os.path.exists(database) or os.path.getsize(database) == 0:
+        models.Base.metadata.create_all(bind=engine)
+        with SessionLocal() as db:
+            generate(db, dataset)
+
+    endpoints = {
+        "students": (models.Student, Student, projections.student_page, students),
+        "subjects": (models.Subject, Subject, projections.subject_page, subjects),
+    }
+    rng = random.Random(seed)
+    results = []
+    for name, (model, schema, page, rows) in endpoints.items():
+        adapter = TypeAdapter(List[schema])
+        skips = [rng.randrange(0, max(rows - limit, 1)) for _ in range(pages)]
+
+        def orm(skip):
+            with SessionLocal() as db:
+                items = paginate(query_for(db, model, schema), model, Response(), skip, limit)
+                return adapter.dump_json([schema.model_validate(item) for item in items])
+
+        def projection(skip):
+            with SessionLocal() as db:
+                return projections.dumps(page(db, Response(), skip, limit))
+
+        mismatches = sum(orm(skip) != projection(skip) for skip in skips[:10])
+        iterator = iter(skips)
+        orm_timing = _timed(lambda: orm(next(iterator)), pages)
+        iterator = iter(skips)
+        projection_timing = _timed(lambda: projection(next(iterator)), pages)
+        results.append({
+            "endpoint": name,
+            "limit": limit,
+            "orm": orm_timing,
+            "projection": projection_timing,
+            "speedup": orm_timing["median_ms"] / projection_timing["median_ms"],
+            "mismatches": mismatches,
+        })
+    return {"dataset": dataset.as_dict(), "database": database, "results": results}
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--students", type=int, default=50_000)
+    parser.add_argument("--subjects", type=int, default=800)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--limit", type=int, default=100, help="1 ページの件数")
+    parser.add_argument("--pages", type=int, default=100, help="計測するページ数")
+    parser.add_argument("--database", help="SQLite ファイル（既定は benchmarks.load と同じ）")
+    parser.add_argument("--regenerate", action="store_true", help="データベースを作り直す")
+    parser.add_argument("--output", help="結果を JSON で保存するファイル")
+    args = parser.parse_args(argv)
+
+    result = run(args.students, args.subjects, args.seed, args.limit, args.pages, args.database, args.regenerate)
+    print(f"{'endpoint':<10} {'orm ms':>8} {'projection ms':>14} {'speedup':>8} {'mismatches':>10}")
+    for r in result["results"]:
+        print(
+            f"{r['endpoint']:<10} {r['orm']['median_ms']:8.2f} {r['projection']['median_ms']:14.2f}"
+            f" {r['speedup']:7.1f}x {r['mismatches']:10d}"
+        )
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=2)
+    return 1 if any(r["mismatches"] for r in result["results"]) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
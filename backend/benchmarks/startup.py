@@ -0,0 +1,93 @@
+"""起動時間のベンチマーク
+
+新しいプロセスで app.main の import 時間・lifespan の起動時間・最初のリクエストの応答時間を測る。
+コールドスタート（ワーカー起動・オートスケール）が遅くなっていないかの確認に使う。
+
+    python -m benchmarks.startup --runs 5
+    python -m benchmarks.startup --runs 5 --output startup.json
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 子プロセスで実行する計測コード（import 前の状態から測るため別プロセスで実行する）
+_CHILD = """
+import json, sys, time
+t0 = time.perf_counter()
+from app.main import app
+t1 = time.perf_counter()
+imported = sorted(m for m in ("firebase_admin", "requests") if m in sys.modules)
+from fastapi.testclient import TestClient
+t2 = time.perf_counter()
+with TestClient(app, raise_server_exceptions=False) as client:
+    t3 = time.perf_counter()
+    status = client.get("/subjects/").status_code
+    t4 = time.perf_counter()
+print(json.dumps({
+    "import_ms": (t1 - t0) * 1000,
+    "startup_ms": (t3 - t2) * 1000,
+    "first_request_ms": (t4 - t3) * 1000,
+    "status": status,
+    "heavy_modules_at_import": imported,
+}))
+"""
+
+METRICS = ("import_ms", "startup_ms", "first_request_ms")
+
+
+# 1 回分の計測（新しいプロセスを起動して結果を返す）
+def measure_once(env=None) -> dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        child_env = dict(os.environ)
+        child_env.update({
+            "DATABASE_URL": f"sqlite:///{os.path.join(tmp, 'startup.db')}",
+            "FIREBASE_INIT": "false",
+            "SETUP_ADMIN_CLAIMS": "false",
+            "DB_CREATE_ALL": "true",
+        })
+        child_env.update(env or {})
+        output = subprocess.run(
+            [sys.executable, "-c", _CHILD],
+            cwd=BACKEND_DIR, env=child_env, capture_output=True, text=True, check=True,
+        ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def run(runs: int = 5, env=None) -> dict:
+    samples = [measure_once(env) for _ in range(runs)]
+    return {
+        "runs": runs,
+        **{
+            metric: {
+                "median": statistics.median(s[metric] for s in samples),
+                "max": max(s[metric] for s in samples),
+            }
+            for metric in METRICS
+        },
+        "heavy_modules_at_import": samples[-1]["heavy_modules_at_import"],
+        "samples": samples,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--output", help="結果を JSON で保存するファイル")
+    args = parser.parse_args(argv)
+
+    result = run(args.runs)
+    for metric in METRICS:
+        print(f"{metric:>18}: median {result[metric]['median']:8.1f}  max {result[metric]['max']:8.1f}")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
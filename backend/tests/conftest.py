@@ -0,0 +1,100 @@
+import os
+
+import pytest
+
+# テストでは Firebase の初期化・管理者クレームの設定・起動時の create_all を行わない
+# （app の import より前に設定する必要があるため conftest で指定する）
+os.environ.setdefault("FIREBASE_INIT", "false")
+os.environ.setdefault("SETUP_ADMIN_CLAIMS", "false")
+os.environ.setdefault("DB_CREATE_ALL", "false")
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+
+# 科目カタログ・集計のレスポンスキャッシュ、要件の判定器とカタログのスナップショットはプロセス全体で共有されるため、テストごとに空にする
+# （テストごとに別のデータベースを使うが、バージョンはどれも 0 から始まる）
+@pytest.fixture(autouse=True)
+def clear_process_caches():
+    from app import requirements, subject_catalog
+    from app.routers.admin import analytics, subjects
+
+    subjects.subject_cache.clear()
+    analytics.analytics_cache.clear()
+    requirements.invalidate()
+    subject_catalog.invalidate()
+    yield
+    subjects.subject_cache.clear()
+    analytics.analytics_cache.clear()
+    requirements.invalidate()
+    subject_catalog.invalidate()
+
+
+# テスト用のインメモリデータベース（テストごとに作り、表は create_all で作成する）
+@pytest.fixture()
+def engine():
+    from sqlalchemy import create_engine
+    from sqlalchemy.pool import StaticPool
+
+    from app.database import Base
+
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine)
+    yield engine
+    Base.metadata.drop_all(bind=engine)
+    engine.dispose()
+
+
+@pytest.fixture()
+def session_factory(engine):
+    from sqlalchemy.orm import sessionmaker
+
+    return sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+# テストで直接使うセッション（初期データはモジュールごとに db を上書きして入れる）
+@pytest.fixture()
+def db(session_factory):
+    session = session_factory()
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+# トークンの値をそのまま UID として扱い、"admin" のトークンだけを管理者とする
+@pytest.fixture()
+def fake_auth(monkeypatch):
+    from app import firebase_auth
+
+    async def verify_token_async(token):
+        return {"uid": token, "admin": token == "admin"}
+
+    monkeypatch.setattr(firebase_auth, "verify_token_async", verify_token_async)
+
+
+# 指定したルーターだけを含むテスト用の app を作る関数
+# データベースの依存関係（get_db / get_read_db / get_sync_db）は session_factory のセッションに差し替える
+@pytest.fixture()
+def app_factory(request, fake_auth):
+    from fastapi import FastAPI
+
+    from app.database import get_db, get_read_db, get_sync_db
+
+    def make_app(*routers, sessions=None, lifespan=None) -> FastAPI:
+        if sessions is None:
+            sessions = request.getfixturevalue("session_factory")
+
+        def override_get_db():
+            db = sessions()
+            try:
+                yield db
+            finally:
+                db.close()
+
+        app = FastAPI(lifespan=lifespan)
+        for router in routers:
+            app.include_router(router)
+        for dependency in (get_db, get_read_db, get_sync_db):
+            app.dependency_overrides[dependency] = override_get_db
+        return app
+
+    return make_app
@@ -0,0 +1,30 @@
+from contextlib import contextmanager
+from typing import Callable, Iterable, List
+
+from sqlalchemy import event
+
+
+# ブロック内で発行された SQL 文を記録するコンテキストマネージャ
+@contextmanager
+def count_queries(engine):
+    statements: List[str] = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+
+
+# ページサイズを変えてもクエリ数が増えないこと（N+1 が無いこと）を確認する
+def assert_constant_query_count(engine, call: Callable[[int], object], sizes: Iterable[int] = (1, 10, 50)):
+    counts = {}
+    for size in sizes:
+        with count_queries(engine) as statements:
+            call(size)
+        counts[size] = len(statements)
+    assert len(set(counts.values())) == 1, f"query count grows with page size: {counts}"
+    return counts
@@ -0,0 +1,181 @@
+import asyncio
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app import admission, firebase_auth, metrics, models
+from app.admission import GroupLimit, Limiter, Overloaded
+from app.database import Base, get_db, get_read_db
+from app.routers.admin import students, subjects
+
+# テスト用のインメモリデータベース
+engine = create_engine(
+    "sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool
+)
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+def override_get_db():
+    try:
+        db = TestingSessionLocal()
+        yield db
+    finally:
+        db.close()
+
+
+@pytest.fixture(autouse=True)
+def reset():
+    metrics.reset()
+    yield
+    admission.configure()
+
+
+def test_requests_beyond_the_queue_are_shed_immediately():
+    limiter = Limiter("test", GroupLimit(concurrency=2, queue_size=2, timeout=5.0))
+    order = []
+
+    async def main():
+        release = asyncio.Event()
+
+        async def work(i):
+            async with limiter.slot():
+                order.append(i)
+                await release.wait()
+
+        tasks = [asyncio.create_task(work(i)) for i in range(4)]
+        await asyncio.sleep(0.01)
+        assert (limiter.active, limiter.queued) == (2, 2)
+        assert metrics.admission_queue_depth.value(group="test") == 2
+
+        with pytest.raises(Overloaded) as excinfo:
+            await limiter.acquire()
+        assert excinfo.value.status_code == 503
+        assert excinfo.value.headers["Retry-After"] == "5"
+
+        release.set()
+        await asyncio.gather(*tasks)
+
+    asyncio.run(main())
+    # 待っていたリクエストは先着順に実行され、すべての枠が返される
+    assert order == [0, 1, 2, 3]
+    assert (limiter.active, limiter.queued) == (0, 0)
+    assert metrics.admission_shed.value(group="test", reason="queue_full") == 1
+    assert metrics.admission_wait.count(group="test") == 2
+    assert metrics.admission_in_flight.value(group="test") == 0
+
+
+def test_waiting_past_the_deadline_is_shed():
+    limiter = Limiter("test", GroupLimit(concurrency=1, queue_size=5, timeout=0.05))
+
+    async def main():
+        await limiter.acquire()
+        with pytest.raises(Overloaded) as excinfo:
+            await limiter.acquire()
+        assert excinfo.value.headers["Retry-After"] == "1"
+        assert limiter.queued == 0
+
+        # キャンセルされた待ちも待ち行列から取り除かれる
+        waiter = asyncio.create_task(limiter.acquire())
+        await asyncio.sleep(0.01)
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        assert limiter.queued == 0
+
+        limiter.release()
+        # 枠が空いていればすぐに入れる
+        async with limiter.slot():
+            assert limiter.active == 1
+
+    asyncio.run(main())
+    assert limiter.active == 0
+    assert metrics.admission_shed.value(group="test", reason="deadline") == 1
+
+
+def test_unlimited_group_does_not_count():
+    limiter = Limiter("test", GroupLimit(concurrency=0, queue_size=0, timeout=1.0))
+
+    async def main():
+        async with limiter.slot():
+            async with limiter.slot():
+                assert limiter.active == 0
+
+    asyncio.run(main())
+
+
+def test_parse_limits():
+    assert admission.parse_limits(["credits=4:32:2", " lists=1:0:0.5"]) == {
+        "credits": GroupLimit(4, 32, 2.0),
+        "lists": GroupLimit(1, 0, 0.5),
+    }
+    with pytest.raises(ValueError):
+        admission.parse_limits(["credits=4:32"])
+
+
+@pytest.fixture()
+def client():
+    Base.metadata.create_all(bind=engine)
+    db = TestingSessionLocal()
+    db.add(models.Student(id=1, name="学生", course="A", email="s@example.com", uid="uid-1"))
+    db.commit()
+    db.close()
+    app = FastAPI()
+    app.include_router(students.router)
+    app.include_router(subjects.router)
+    app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_read_db] = override_get_db
+    yield TestClient(app)
+    Base.metadata.drop_all(bind=engine)
+
+
+def test_saturated_group_returns_503_while_other_routes_stay_available(client):
+    admission.configure({"lists": GroupLimit(concurrency=1, queue_size=0, timeout=3.0)})
+    lists = admission.limiter("lists")
+    asyncio.run(lists.acquire())
+    try:
+        response = client.get("/students/")
+        assert response.status_code == 503
+        assert response.headers["Retry-After"] == "3"
+        # 制限していない参照は影響を受けない
+        assert client.get("/students/1").status_code == 200
+    finally:
+        lists.release()
+    assert client.get("/students/").status_code == 200
+    assert "admission_shed_total{group=\"lists\",reason=\"queue_full\"} 1" in metrics.render()
+
+
+# キャッシュに当たる一覧の応答（304 を含む）は、lists の枠が埋まっていても返る
+def test_cached_lists_are_served_while_the_group_is_saturated(client):
+    cached = client.get("/subjects/")
+    assert cached.status_code == 200
+    admission.configure({"lists": GroupLimit(concurrency=1, queue_size=0, timeout=3.0)})
+    lists = admission.limiter("lists")
+    asyncio.run(lists.acquire())
+    try:
+        response = client.get("/subjects/")
+        assert (response.status_code, response.content) == (200, cached.content)
+        response = client.get("/subjects/", headers={"If-None-Match": cached.headers["ETag"]})
+        assert response.status_code == 304
+        # キャッシュに当たらない一覧は枠を取るため断られる
+        assert client.get("/subjects/", params={"limit": 10}).status_code == 503
+    finally:
+        lists.release()
+    assert lists.active == 0
+    assert client.get("/subjects/", params={"limit": 10}).status_code == 200
+
+
+def test_token_verification_is_limited(client, monkeypatch):
+    monkeypatch.setattr(firebase_auth, "verify_token", lambda token: {"uid": token})
+    admission.configure({"auth": GroupLimit(concurrency=1, queue_size=0, timeout=1.0)})
+    auth = admission.limiter("auth")
+    asyncio.run(auth.acquire())
+    try:
+        response = client.get("/students/calculate-credits", headers={"Authorization": "Bearer uid-1"})
+        assert response.status_code == 503
+    finally:
+        auth.release()
+    assert metrics.admission_shed.value(group="auth", reason="queue_full") == 1
@@ -0,0 +1,142 @@
+import random
+from collections import Counter
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+from app import analytics, credit_engine, credit_summary, models
+from app.routers.admin import analytics as analytics_router
+from app.routers.admin import requirements as requirements_router
+from app.routers.admin import students, subjects
+
+from query_count import count_queries
+
+ADMIN = {"Authorization": "Bearer admin"}
+CATEGORIES = list(models.SubjectCategoryEnum)
+
+
+@pytest.fixture()
+def db(db):
+    rng = random.Random(0)
+    for i in range(1, 41):
+        subject = models.Subject(id=i, name=f"科目{i}", credit=rng.choice((1, 2, 2, 4)))
+        # 一部の科目はコース C の区分を持たない（自由選択として数える）
+        subject.categories = [
+            models.SubjectCategory(course=course, category=rng.choice(CATEGORIES))
+            for course in ("A", "B", "C") if course != "C" or i % 3
+        ]
+        db.add(subject)
+    db.add_all([
+        models.Student(id=i, name=f"学生{i}", course="ABC"[i % 3], email=f"{i}@example.com", uid=f"uid-{i}")
+        for i in range(1, 61)
+    ])
+    db.flush()
+    db.execute(models.student_subject.insert(), [
+        {"student_id": i, "subject_id": j} for i in range(1, 61) for j in rng.sample(range(1, 41), rng.randint(0, 35))
+    ])
+    db.commit()
+    credit_summary.rebuild(db)
+    return db
+
+
+@pytest.fixture()
+def client(db, app_factory):
+    app = app_factory(analytics_router.router, students.router, subjects.router, requirements_router.router)
+    return TestClient(app)
+
+
+def course_statistics(client, **params):
+    response = client.get("/api/admin/analytics/courses", params=params, headers=ADMIN)
+    assert response.status_code == 200
+    return {row["course"]: row for row in response.json()}
+
+
+@pytest.mark.parametrize("bin_width", [1, 4, 7])
+def test_course_statistics_match_per_student_calculation(client, db, bin_width):
+    result = credit_engine.calculate_cohort_credits(db)
+    statistics = course_statistics(client, bin_width=bin_width)
+    assert list(statistics) == ["A", "B", "C"]
+
+    courses = np.array(result.courses)
+    values = np.column_stack([result.category_credits, result.total])
+    for course, row in statistics.items():
+        mask = courses == course
+        assert row["students"] == mask.sum()
+        for i, field in enumerate(analytics.HISTOGRAM_FIELDS):
+            column = values[mask, i]
+            expected = np.bincount(column // bin_width)
+            histogram = row["credits"][field]
+            assert histogram["counts"] == expected.tolist()
+            assert histogram["mean"] == pytest.approx(column.mean())
+            assert histogram["max"] == column.max()
+        met = result.requirements_met[mask]
+        for i, field in enumerate(credit_engine.REQUIREMENT_FIELDS):
+            assert row["requirements_met"][field] == pytest.approx(met[:, i].mean())
+        assert row["all_requirements_met"] == pytest.approx(met.all(axis=1).mean())
+
+    assert list(course_statistics(client, course="B", bin_width=bin_width)) == ["B"]
+
+
+def test_subject_enrollments_match_enrollment_rows(client, db):
+    ss = models.student_subject
+    courses = {s.id: s.course for s in db.query(models.Student)}
+    expected = Counter((courses[student_id], subject_id) for student_id, subject_id in db.execute(ss.select()))
+    categories = {(c.course, c.subject_id): c.category.value for c in db.query(models.SubjectCategory)}
+
+    response = client.get("/api/admin/analytics/subjects", headers=ADMIN)
+    assert response.status_code == 200
+    rows = response.json()
+    assert {(r["course"], r["subject_id"]): r["students"] for r in rows} == dict(expected)
+    for r in rows:
+        assert r["category"] == categories.get((r["course"], r["subject_id"]), "ELECTIVE")
+    # コースごとに修得者の多い順
+    for course in "ABC":
+        counts = [r["students"] for r in rows if r["course"] == course]
+        assert counts == sorted(counts, reverse=True)
+
+    response = client.get("/api/admin/analytics/subjects", params={"course": "C"}, headers=ADMIN)
+    assert {r["course"] for r in response.json()} == {"C"}
+
+
+def test_results_are_cached_until_data_changes(client, db, engine):
+    course_statistics(client)
+    with count_queries(engine) as statements:
+        before = course_statistics(client)
+    # キャッシュに当たればバージョンの確認だけ
+    assert len(statements) == 1
+
+    # 修得記録の変更
+    student = db.get(models.Student, 1)
+    added = sorted(set(range(1, 41)) - {s.id for s in student.completed_subjects})[:3]
+    assert client.patch("/students/1/subjects", json={"add": added}).status_code == 200
+    after = course_statistics(client)
+    assert after[student.course]["credits"]["total"]["mean"] > before[student.course]["credits"]["total"]["mean"]
+
+    # 科目カタログの変更（修得者数の区分）
+    rows = client.get("/api/admin/analytics/subjects", params={"course": "A"}, headers=ADMIN).json()
+    subject_id = rows[0]["subject_id"]
+    response = client.put(f"/subjects/{subject_id}", json={
+        "name": "改名", "credit": 2, "categories": [{"course": "A", "category": "COMPULSORY"}],
+    })
+    assert response.status_code == 200
+    rows = client.get("/api/admin/analytics/subjects", params={"course": "A"}, headers=ADMIN).json()
+    changed = next(r for r in rows if r["subject_id"] == subject_id)
+    assert (changed["name"], changed["category"]) == ("改名", "COMPULSORY")
+
+    # 卒業要件ルールの変更（充足率）
+    response = client.put("/api/admin/requirements/", json={
+        "course": None, "entrance_year": None, "required_compulsory": 0, "required_limited_elective": 0,
+        "required_limited_standard_elective": 0, "required_total": 0,
+    }, headers=ADMIN)
+    assert response.status_code == 200
+    assert all(row["all_requirements_met"] == 1.0 for row in course_statistics(client).values())
+
+
+def test_conditional_get_and_admin_only(client):
+    response = client.get("/api/admin/analytics/courses", headers=ADMIN)
+    etag = response.headers["ETag"]
+    response = client.get("/api/admin/analytics/courses", headers={**ADMIN, "If-None-Match": etag})
+    assert response.status_code == 304
+    response = client.get("/api/admin/analytics/courses", headers={"Authorization": "Bearer uid-1"})
+    assert response.status_code == 403
@@ -0,0 +1,56 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.pool import NullPool
+
+from app.database import Base, async_url, get_db, get_read_db
+from app.routers.admin import subjects
+
+
+# 非同期モード（AsyncSession）で科目ルーターが動作することを確認する
+@pytest.fixture()
+def client(tmp_path):
+    url = f"sqlite:///{tmp_path / 'async.db'}"
+    Base.metadata.create_all(bind=create_engine(url))
+
+    async_engine = create_async_engine(async_url(url), poolclass=NullPool)
+    AsyncTestingSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+    async def override_get_db():
+        async with AsyncTestingSessionLocal() as db:
+            assert isinstance(db, AsyncSession)
+            yield db
+
+    app = FastAPI()
+    app.include_router(subjects.router)
+    app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_read_db] = override_get_db
+    with TestClient(app) as c:
+        yield c
+
+
+def test_async_url():
+    assert async_url("sqlite:///./app.db") == "sqlite+aiosqlite:///./app.db"
+    assert async_url("postgresql://u:p@db/app") == "postgresql+asyncpg://u:p@db/app"
+    assert async_url("postgresql+psycopg2://u:p@db/app") == "postgresql+asyncpg://u:p@db/app"
+
+
+def test_subject_crud_with_async_session(client):
+    payload = {"name": "数学", "credit": 2, "categories": [{"course": "A", "category": "COMPULSORY"}]}
+    created = client.post("/subjects/", json=payload)
+    assert created.status_code == 200
+    subject_id = created.json()["id"]
+    assert created.json()["categories"][0]["category"] == "COMPULSORY"
+
+    payload["categories"].append({"course": "B", "category": "ELECTIVE"})
+    updated = client.put(f"/subjects/{subject_id}", json=payload)
+    assert len(updated.json()["categories"]) == 2
+
+    listed = client.get("/subjects/")
+    assert [s["id"] for s in listed.json()] == [subject_id]
+    assert client.get(f"/subjects/{subject_id}").json()["name"] == "数学"
+
+    assert client.delete(f"/subjects/{subject_id}").status_code == 200
+    assert client.get(f"/subjects/{subject_id}").status_code == 404
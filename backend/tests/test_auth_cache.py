@@ -0,0 +1,104 @@
+import threading
+
+from app.auth_cache import SigningKeyCache, TTLCache
+
+
+class FakeClock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def test_ttl_cache_expires_entries():
+    clock = FakeClock()
+    cache = TTLCache(maxsize=10, ttl=60, clock=clock)
+    cache.set("a", 1)
+    cache.set("b", 2, expires_at=clock.now + 5)
+    assert cache.get("a") == 1
+    assert cache.get("b") == 2
+
+    clock.now += 10
+    assert cache.get("a") == 1
+    assert cache.get("b") is None
+
+    clock.now += 60
+    assert cache.get("a") is None
+
+
+def test_ttl_cache_evicts_least_recently_used():
+    cache = TTLCache(maxsize=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+    assert cache.get("a") == 1
+    assert cache.get("b") is None
+    assert cache.get("c") == 3
+
+
+def test_signing_key_cache_fetches_once_until_expiry():
+    clock = FakeClock()
+    calls = []
+
+    def fetch():
+        calls.append(clock.now)
+        return {"kid-1": "cert"}, 3600
+
+    keys = SigningKeyCache(fetch, refresh_margin=300, clock=clock)
+    assert keys.get() == {"kid-1": "cert"}
+    clock.now += 1000
+    assert keys.get() == {"kid-1": "cert"}
+    assert len(calls) == 1
+
+    # 期限切れ後は同期的に再取得する
+    clock.now += 3600
+    keys.get()
+    assert len(calls) == 2
+
+
+def test_signing_key_cache_refreshes_in_background_before_expiry():
+    clock = FakeClock()
+    release = threading.Event()
+    fetched = threading.Event()
+    versions = iter([{"kid-1": "old"}, {"kid-2": "new"}])
+
+    def fetch():
+        keys = next(versions)
+        if "kid-2" in keys:
+            # 裏の取得が終わるまでは古い鍵が返されることを確認するため待機する
+            release.wait(timeout=5)
+            fetched.set()
+        return keys, 3600
+
+    keys = SigningKeyCache(fetch, refresh_margin=300, clock=clock)
+    assert keys.get() == {"kid-1": "old"}
+
+    # 期限の 5 分前を過ぎると古い鍵を返しつつ裏で更新する
+    clock.now += 3400
+    assert keys.get() == {"kid-1": "old"}
+    release.set()
+    assert fetched.wait(timeout=5)
+    for _ in range(100):
+        if keys.get() == {"kid-2": "new"}:
+            break
+        threading.Event().wait(0.01)
+    assert keys.get() == {"kid-2": "new"}
+
+
+def test_signing_key_cache_rate_limits_forced_refresh():
+    clock = FakeClock()
+    calls = []
+
+    def fetch():
+        calls.append(clock.now)
+        return {"kid-1": "cert"}, 3600
+
+    keys = SigningKeyCache(fetch, clock=clock)
+    keys.get()
+    keys.refresh(min_interval=60)
+    assert len(calls) == 1
+    clock.now += 61
+    keys.refresh(min_interval=60)
+    assert len(calls) == 2
@@ -0,0 +1,97 @@
+import json
+
+import pytest
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app import bulk_import, models, requirements, subject_catalog
+from app.cache_versions import ENROLLMENTS, bump_version
+from app.database import Base
+
+from query_count import count_queries
+
+# テスト用のインメモリデータベース
+engine = create_engine(
+    "sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool
+)
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+@pytest.fixture()
+def db():
+    Base.metadata.create_all(bind=engine)
+    session = TestingSessionLocal()
+    session.add_all([models.Subject(id=i, name=f"科目{i}", credit=2) for i in range(1, 4)])
+    session.add(models.Student(name="既存", course="A", email="exists@example.com", uid="uid-exists"))
+    session.commit()
+    try:
+        yield session
+    finally:
+        session.close()
+        Base.metadata.drop_all(bind=engine)
+
+
+def enrollments(db):
+    ss = models.student_subject
+    return sorted(db.execute(select(ss.c.student_id, ss.c.subject_id)).all())
+
+
+def test_import_ndjson_reports_row_errors(db):
+    lines = [
+        {"name": "学生1", "email": "s1@example.com", "course": "A", "uid": "uid-1", "completed_subjects": [1, 2]},
+        {"name": "学生2", "email": "s2@example.com", "course": "B", "uid": "uid-2", "completed_subjects": [99]},
+        "not json",
+        {"name": "学生3", "email": "exists@example.com", "course": "C", "uid": "uid-3"},
+        {"name": "学生4", "course": "A", "uid": "uid-4"},
+        {"name": "学生5", "email": "s1@example.com", "course": "A", "uid": "uid-5"},
+        {"name": "学生6", "email": "s6@example.com", "course": "C", "uid": "uid-6", "completed_subjects": [3]},
+    ]
+    text = "\n".join(line if isinstance(line, str) else json.dumps(line, ensure_ascii=False) for line in lines)
+
+    result = bulk_import.import_students(db, bulk_import.parse(text, "ndjson"), chunk_size=2)
+
+    assert result.total == 7
+    assert result.created == 2
+    assert [e.row for e in result.errors] == [2, 3, 4, 5, 6]
+    assert "unknown subject ids: [99]" in result.errors[0].error
+    assert "email" in result.errors[3].error
+
+    ids = dict(db.execute(select(models.Student.uid, models.Student.id)).all())
+    assert enrollments(db) == [(ids["uid-1"], 1), (ids["uid-1"], 2), (ids["uid-6"], 3)]
+
+
+def test_import_csv(db):
+    text = (
+        "name,email,course,uid,completed_subjects\n"
+        "学生1,s1@example.com,A,uid-1,1 2 3\n"
+        "学生2,s2@example.com,B,uid-2,\n"
+        "学生3,s3@example.com,B,uid-3,1;x\n"
+    )
+    result = bulk_import.import_students(db, bulk_import.parse(text, "csv"))
+    assert (result.created, result.failed) == (2, 1)
+    assert result.errors[0].row == 4
+    assert len(enrollments(db)) == 3
+
+
+def test_import_uses_constant_statements_per_chunk(db):
+    def ndjson(n):
+        return "\n".join(json.dumps({
+            "name": f"学生{i}", "email": f"s{i}@example.com", "course": "A",
+            "uid": f"uid-{i}", "completed_subjects": [1, 2, 3],
+        }) for i in range(n))
+
+    # 要件の判定器とカタログのスナップショットは初回だけ作られ、バージョンの行は初回だけ INSERT されるため、先に用意しておく
+    requirements.get_evaluator(db)
+    subject_catalog.get_snapshot(db)
+    bump_version(db, ENROLLMENTS)
+    with count_queries(engine) as small:
+        bulk_import.import_students(db, bulk_import.parse(ndjson(10), "ndjson"), chunk_size=500)
+    db.execute(models.student_subject.delete())
+    db.execute(models.Student.__table__.delete().where(models.Student.uid != "uid-exists"))
+    db.commit()
+    with count_queries(engine) as large:
+        bulk_import.import_students(db, bulk_import.parse(ndjson(400), "ndjson"), chunk_size=500)
+
+    assert len(small) == len(large)
+    assert db.scalar(select(func.count()).select_from(models.student_subject)) == 1200
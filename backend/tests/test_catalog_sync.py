@@ -0,0 +1,143 @@
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import select
+
+from app import catalog_sync, credit_summary, models
+from app.cache_versions import CATALOG, get_version
+from app.routers.admin import subjects
+
+from query_count import count_queries
+
+ADMIN = {"Authorization": "Bearer admin"}
+
+
+def catalog_entry(subject_id, credit=2, **categories):
+    return {
+        "id": subject_id, "name": f"科目{subject_id}", "credit": credit,
+        "categories": [{"course": course, "category": category} for course, category in categories.items()],
+    }
+
+
+# 科目 1〜3（1, 2 は A・B の区分、3 は A のみ）、学生 1 は科目 1・2、学生 2 は科目 3 を修得
+INITIAL = [
+    catalog_entry(1, A="COMPULSORY", B="ELECTIVE"),
+    catalog_entry(2, A="LIMITED_ELECTIVE", B="ELECTIVE"),
+    catalog_entry(3, A="ELECTIVE"),
+]
+
+
+@pytest.fixture()
+def client(db, app_factory):
+    client = TestClient(app_factory(subjects.router))
+
+    assert sync(client, INITIAL)["subjects_created"] == [1, 2, 3]
+    db.add_all([
+        models.Student(id=1, name="学生1", course="A", email="1@example.com", uid="uid-1"),
+        models.Student(id=2, name="学生2", course="A", email="2@example.com", uid="uid-2"),
+    ])
+    db.flush()
+    db.execute(models.student_subject.insert(), [
+        {"student_id": 1, "subject_id": 1}, {"student_id": 1, "subject_id": 2}, {"student_id": 2, "subject_id": 3},
+    ])
+    db.commit()
+    credit_summary.rebuild(db)
+    return client
+
+
+def sync(client, catalog, **options):
+    response = client.post("/subjects/sync", json={"subjects": catalog, **options}, headers=ADMIN)
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def category_rows(db):
+    db.expire_all()
+    sc = models.SubjectCategory
+    return {(row.subject_id, row.course): (row.id, row.category.value) for row in db.execute(select(sc)).scalars()}
+
+
+# ON CONFLICT のないデータベースでは、既存のキーを調べて INSERT と UPDATE に分ける
+@pytest.mark.parametrize("native_upsert", [True, False])
+def test_sync_applies_only_the_diff(client, db, monkeypatch, native_upsert):
+    if not native_upsert:
+        monkeypatch.setattr(catalog_sync, "_UPSERT_DIALECTS", {})
+    before = category_rows(db)
+    version = get_version(db, CATALOG)
+    report = sync(client, [
+        catalog_entry(1, credit=4, A="COMPULSORY", B="ELECTIVE"),  # 単位数の変更
+        catalog_entry(2, A="COMPULSORY", B="ELECTIVE"),  # A の区分の変更
+        catalog_entry(3),  # A の区分の削除
+        catalog_entry(4, C="ELECTIVE"),  # 追加
+    ])
+    assert report == {
+        "subjects_created": [4], "subjects_updated": [1], "subjects_deleted": [],
+        "categories_upserted": 2, "categories_deleted": 1, "unchanged": 0,
+        "students_refreshed": 2, "changed": True, "dry_run": False,
+    }
+
+    after = category_rows(db)
+    # 変わらない区分の行と、区分だけを変えた行の id は維持される
+    assert after[(1, "A")] == before[(1, "A")]
+    assert after[(2, "A")] == (before[(2, "A")][0], "COMPULSORY")
+    assert (3, "A") not in after
+    assert after[(4, "C")][1] == "ELECTIVE"
+    assert db.get(models.Subject, 1).credit == 4
+
+    assert get_version(db, CATALOG) == version + 1
+    assert db.get(models.StudentCreditSummary, 1).compulsory == 6
+    assert credit_summary.check(db) == []
+
+
+def test_unchanged_catalog_and_dry_run_write_nothing(client, db):
+    version = get_version(db, CATALOG)
+    assert sync(client, INITIAL)["changed"] is False
+
+    report = sync(client, [catalog_entry(1, credit=10, A="COMPULSORY")], delete_missing=True, dry_run=True)
+    assert (report["subjects_updated"], report["subjects_deleted"], report["categories_deleted"]) == ([1], [2, 3], 4)
+    assert db.get(models.Subject, 1).credit == 2
+    assert get_version(db, CATALOG) == version
+
+
+def test_delete_missing_removes_subjects_and_enrollments(client, db):
+    report = sync(client, INITIAL[:2], delete_missing=True)
+    assert (report["subjects_deleted"], report["categories_deleted"], report["students_refreshed"]) == ([3], 1, 1)
+    assert db.get(models.Subject, 3) is None
+    ss = models.student_subject
+    assert db.execute(select(ss).where(ss.c.subject_id == 3)).all() == []
+    assert db.get(models.StudentCreditSummary, 2).total == 0
+    assert credit_summary.check(db) == []
+
+
+def test_statement_count_does_not_depend_on_catalog_size(client, engine):
+    counts = []
+    for n in (10, 300):
+        catalog = [catalog_entry(i, A="ELECTIVE") for i in range(100, 100 + n)]
+        sync(client, catalog)
+        catalog[0]["credit"] = 3
+        with count_queries(engine) as statements:
+            report = sync(client, catalog)
+        assert report["subjects_updated"] == [100]
+        counts.append(len(statements))
+        catalog[0]["credit"] = 2
+        sync(client, catalog)
+    assert counts[0] == counts[1]
+
+
+def test_invalid_catalog_is_rejected(client):
+    response = client.post("/subjects/sync", json={"subjects": [catalog_entry(1), catalog_entry(1)]}, headers=ADMIN)
+    assert response.status_code == 400
+    response = client.post("/subjects/sync", json={"subjects": []}, headers={"Authorization": "Bearer uid-1"})
+    assert response.status_code == 403
+
+
+def test_update_subject_upserts_categories(client, db):
+    before = category_rows(db)
+    response = client.put("/subjects/1", json={
+        "name": "科目1", "credit": 2,
+        "categories": [{"course": "A", "category": "COMPULSORY"}, {"course": "C", "category": "ELECTIVE"}],
+    })
+    assert response.status_code == 200
+    assert sorted(c["course"] for c in response.json()["categories"]) == ["A", "C"]
+    after = category_rows(db)
+    assert after[(1, "A")] == before[(1, "A")]
+    assert (1, "B") not in after
@@ -0,0 +1,123 @@
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app import credit_engine
+from app.database import Base
+from app.models import Student, Subject, SubjectCategory, SubjectCategoryEnum, student_subject
+
+# テスト用のインメモリデータベース
+engine = create_engine(
+    "sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool
+)
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+@pytest.fixture()
+def db():
+    Base.metadata.create_all(bind=engine)
+    session = TestingSessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+        Base.metadata.drop_all(bind=engine)
+
+
+def seed(db):
+    subjects = [
+        Subject(id=1, name="数学", credit=10),
+        Subject(id=2, name="物理", credit=20),
+        Subject(id=3, name="英語", credit=30),
+        Subject(id=4, name="歴史", credit=40),
+    ]
+    db.add_all(subjects)
+    db.add_all([
+        SubjectCategory(course="A", subject_id=1, category=SubjectCategoryEnum.COMPULSORY),
+        SubjectCategory(course="A", subject_id=2, category=SubjectCategoryEnum.LIMITED_ELECTIVE),
+        SubjectCategory(course="A", subject_id=3, category=SubjectCategoryEnum.STANDARD_ELECTIVE),
+        SubjectCategory(course="B", subject_id=1, category=SubjectCategoryEnum.ELECTIVE),
+        SubjectCategory(course="B", subject_id=4, category=SubjectCategoryEnum.COMPULSORY),
+    ])
+    db.add_all([
+        Student(id=1, name="学生A", course="A", email="a@example.com", uid="uid-a"),
+        Student(id=2, name="学生B", course="B", email="b@example.com", uid="uid-b"),
+        Student(id=3, name="学生C", course="C", email="c@example.com", uid="uid-c"),
+    ])
+    db.flush()
+    db.execute(student_subject.insert(), [
+        {"student_id": 1, "subject_id": 1},
+        {"student_id": 1, "subject_id": 2},
+        {"student_id": 1, "subject_id": 3},
+        {"student_id": 1, "subject_id": 4},
+        {"student_id": 2, "subject_id": 1},
+        {"student_id": 2, "subject_id": 4},
+        {"student_id": 2, "subject_id": 99},  # 存在しない科目は無視する
+    ])
+    db.commit()
+
+
+def test_calculate_cohort_credits(db):
+    seed(db)
+    result = credit_engine.calculate_cohort_credits(db)
+    summaries = {s.student_id: s for s in result.summaries()}
+
+    a = summaries["1"].credits
+    assert (a.compulsory, a.limited_elective, a.standard_elective, a.elective, a.total) == (10, 20, 30, 40, 100)
+    assert summaries["1"].requirements_met.total is True
+    assert summaries["1"].requirements_met.compulsory is False
+
+    b = summaries["2"].credits
+    assert (b.compulsory, b.elective, b.total) == (40, 10, 50)
+    assert summaries["2"].requirements_met.compulsory is True
+
+    c = summaries["3"].credits
+    assert c.total == 0
+
+
+def test_calculation_details_for_single_student(db):
+    seed(db)
+    result = credit_engine.calculate_cohort_credits(db, student_ids=[1])
+    assert len(result) == 1
+    calculation = result.calculation(0)
+    assert calculation.student_id == "1"
+    assert calculation.details.compulsory_subjects == ["1"]
+    assert calculation.details.limited_elective_subjects == ["2"]
+    assert calculation.details.standard_elective_subjects == ["3"]
+    assert calculation.details.elective_subjects == ["4"]
+
+
+def test_duplicate_enrollments_are_counted_once(db):
+    # 中間テーブルは複合主キーで重複を防ぐが、エンジン自体も重複入力を 1 回だけ数える
+    seed(db)
+    catalog = credit_engine.load_catalog(db)
+    result = credit_engine.compute_cohort_credits(
+        catalog, [1], ["A"], [1, 1, 1], [4, 4, 1],
+    )
+    assert result.credits(0).elective == 40
+    assert result.credits(0).total == 50
+
+
+def test_course_filter(db):
+    seed(db)
+    result = credit_engine.calculate_cohort_credits(db, course="B")
+    assert [s.student_id for s in result.summaries()] == ["2"]
+    assert result.summary(0).credits.total == 50
+
+
+def test_empty_database(db):
+    result = credit_engine.calculate_cohort_credits(db)
+    assert result.summaries() == []
+
+
+def test_iter_cohort_credits_matches_batch(db):
+    seed(db)
+    expected = {s.student_id: s for s in credit_engine.calculate_cohort_credits(db).summaries()}
+    seen = {}
+    for students, credits in credit_engine.iter_cohort_credits(db, chunk_size=2):
+        assert len(students) <= 2
+        for i, student in enumerate(students):
+            seen[str(student.id)] = credits.summary(i)
+    assert seen == expected
+    assert credits.subject_ids(0) == []
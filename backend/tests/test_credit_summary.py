@@ -0,0 +1,138 @@
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import update
+
+from app import bulk_import, credit_engine, credit_summary, models
+from app.cache_versions import ENROLLMENTS, get_version
+from app.routers.admin import students, subjects
+
+from query_count import count_queries
+
+
+@pytest.fixture()
+def db(db):
+    for i, credit in enumerate([10, 20, 30], start=1):
+        subject = models.Subject(id=i, name=f"科目{i}", credit=credit)
+        subject.categories = [models.SubjectCategory(course="A", category=models.SubjectCategoryEnum.COMPULSORY)]
+        db.add(subject)
+    db.commit()
+    return db
+
+
+@pytest.fixture()
+def client(db, app_factory):
+    return TestClient(app_factory(subjects.router, students.router))
+
+
+def create_student(client, uid, subject_ids):
+    response = client.post("/students/", json={
+        "name": uid, "email": f"{uid}@example.com", "course": "A", "uid": uid, "completed_subjects": subject_ids,
+    })
+    assert response.status_code == 200
+    return response.json()["id"]
+
+
+def stored(db, student_id):
+    db.expire_all()
+    return db.get(models.StudentCreditSummary, student_id)
+
+
+def test_create_student_writes_summary(client, db):
+    student_id = create_student(client, "uid-1", [1, 2])
+    row = stored(db, student_id)
+    assert (row.compulsory, row.total, row.compulsory_met) == (30, 30, True)
+    assert row.details["compulsory_subjects"] == ["1", "2"]
+    assert credit_summary.check(db) == []
+
+
+def test_calculate_credits_is_a_single_lookup(client, db, engine):
+    student_id = create_student(client, "uid-1", [1, 3])
+    expected = credit_engine.calculate_cohort_credits(db, student_ids=[student_id]).calculation(0)
+
+    with count_queries(engine) as statements:
+        response = client.get("/students/calculate-credits", headers={"Authorization": "Bearer uid-1"})
+    assert response.status_code == 200
+    assert len(statements) == 1
+    assert response.json() == expected.model_dump()
+
+
+def test_calculate_credits_without_summary_falls_back(client, db):
+    db.add(models.Student(id=7, name="未集計", course="A", email="old@example.com", uid="uid-old"))
+    db.execute(models.student_subject.insert(), [{"student_id": 7, "subject_id": 2}])
+    db.commit()
+
+    response = client.get("/students/calculate-credits", headers={"Authorization": "Bearer uid-old"})
+    assert response.status_code == 200
+    assert response.json()["credits"]["total"] == 20
+    assert client.get("/students/calculate-credits", headers={"Authorization": "Bearer nobody"}).status_code == 404
+
+
+def test_subject_changes_refresh_affected_students(client, db):
+    with_subject = create_student(client, "uid-1", [1, 2])
+    without_subject = create_student(client, "uid-2", [3])
+
+    client.put("/subjects/2", json={"name": "科目2", "credit": 25, "categories": [{"course": "A", "category": "ELECTIVE"}]})
+    row = stored(db, with_subject)
+    assert (row.compulsory, row.elective, row.total) == (10, 25, 35)
+    assert row.details["elective_subjects"] == ["2"]
+
+    client.delete("/subjects/1")
+    assert stored(db, with_subject).total == 25
+    assert stored(db, without_subject).total == 30
+    assert credit_summary.check(db) == []
+
+
+def test_delete_student_removes_summary(client, db):
+    student_id = create_student(client, "uid-1", [1])
+    client.delete(f"/students/{student_id}")
+    assert stored(db, student_id) is None
+    assert credit_summary.check(db) == []
+
+
+def test_bulk_import_writes_summaries(db):
+    rows = bulk_import.parse_ndjson(
+        '{"name": "一括", "email": "bulk@example.com", "course": "A", "uid": "uid-bulk", "completed_subjects": [2, 3]}\n'
+    )
+    assert bulk_import.import_students(db, rows).created == 1
+    summary = credit_summary.summary_for_uid(db, "uid-bulk")
+    assert summary.total == 50
+    assert credit_summary.check(db) == []
+
+
+def test_enrollments_version_is_bumped_once_per_commit(client, db, engine):
+    first = create_student(client, "uid-1", [1])
+    second = create_student(client, "uid-2", [2])
+    version = get_version(db, ENROLLMENTS)
+
+    # 同じトランザクション内の再計算はまとめて 1 回だけバージョンを進める
+    with count_queries(engine) as statements:
+        credit_summary.refresh_student_summaries(db, [first])
+        credit_summary.refresh_student_summaries(db, [second])
+        credit_summary.delete_student_summary(db, second)
+    assert not [sql for sql in statements if sql.startswith(("UPDATE cache_versions", "INSERT INTO cache_versions"))]
+    db.commit()
+    assert get_version(db, ENROLLMENTS) == version + 1
+
+    # ロールバックしたトランザクションでは進めない
+    credit_summary.refresh_student_summaries(db, [first])
+    db.rollback()
+    db.commit()
+    assert get_version(db, ENROLLMENTS) == version + 1
+
+
+def test_check_and_rebuild(client, db):
+    first = create_student(client, "uid-1", [1])
+    second = create_student(client, "uid-2", [2])
+    db.add(models.Student(id=9, name="未集計", course="B", email="new@example.com", uid="uid-new"))
+    db.execute(update(models.StudentCreditSummary).where(models.StudentCreditSummary.student_id == first).values(total=999))
+    db.execute(models.StudentCreditSummary.__table__.insert().values(
+        student_id=42, course="A", compulsory=0, limited_elective=0, standard_elective=0, elective=0, total=0,
+        compulsory_met=False, limited_elective_met=False, limited_standard_elective_met=False, total_met=False,
+        details={},
+    ))
+    db.commit()
+
+    assert credit_summary.check(db, chunk_size=1) == [(first, "mismatch: total"), (9, "missing"), (42, "orphan")]
+    assert credit_summary.rebuild(db, chunk_size=1) == 3
+    assert credit_summary.check(db) == []
+    assert stored(db, second).total == 20
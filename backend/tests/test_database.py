@@ -0,0 +1,72 @@
+import threading
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+from app.config import Settings
+from app.database import _engine_options, create_db_engine
+
+
+@pytest.fixture()
+def url(tmp_path):
+    return f"sqlite:///{tmp_path / 'engine.db'}"
+
+
+def test_sqlite_pragmas_are_applied(url):
+    engine = create_db_engine(url, Settings(sqlite_busy_timeout=1234, sqlite_cache_size=-2000))
+    with engine.connect() as conn:
+        assert conn.execute(text("PRAGMA journal_mode")).scalar() == "wal"
+        assert conn.execute(text("PRAGMA synchronous")).scalar() == 1  # NORMAL
+        assert conn.execute(text("PRAGMA busy_timeout")).scalar() == 1234
+        assert conn.execute(text("PRAGMA cache_size")).scalar() == -2000
+        assert conn.execute(text("PRAGMA query_only")).scalar() == 0
+
+
+def test_read_only_engine_rejects_writes(url):
+    engine = create_db_engine(url)
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE t (id INTEGER PRIMARY KEY)"))
+        conn.execute(text("INSERT INTO t (id) VALUES (1)"))
+
+    read_engine = create_db_engine(url, read_only=True)
+    with read_engine.connect() as conn:
+        assert conn.execute(text("SELECT count(*) FROM t")).scalar() == 1
+        with pytest.raises(OperationalError):
+            conn.execute(text("INSERT INTO t (id) VALUES (2)"))
+
+
+def test_concurrent_writers_wait_instead_of_failing(url):
+    engine = create_db_engine(url)
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE t (id INTEGER PRIMARY KEY AUTOINCREMENT, v INTEGER)"))
+
+    errors = []
+
+    def write(n):
+        try:
+            for i in range(50):
+                with engine.begin() as conn:
+                    conn.execute(text("INSERT INTO t (v) VALUES (:v)"), {"v": n * 100 + i})
+        except Exception as e:  # pragma: no cover - 失敗時の診断用
+            errors.append(e)
+
+    threads = [threading.Thread(target=write, args=(n,)) for n in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert errors == []
+    with engine.connect() as conn:
+        assert conn.execute(text("SELECT count(*) FROM t")).scalar() == 200
+
+
+def test_server_database_pool_options():
+    settings = Settings(db_pool_size=7, db_read_pool_size=15, db_max_overflow=3)
+    options = _engine_options("postgresql://user:pass@db/app", settings, read_only=False)
+    assert options["pool_size"] == 7
+    assert options["max_overflow"] == 3
+    assert options["pool_pre_ping"] is True
+    assert _engine_options("postgresql://user:pass@db/app", settings, read_only=True)["pool_size"] == 15
+    assert "pool_size" not in _engine_options("sqlite:///./app.db", settings, read_only=False)
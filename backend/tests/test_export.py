@@ -0,0 +1,77 @@
+import csv
+import io
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app import credit_engine, models
+from app.routers.admin import export
+
+ADMIN = {"Authorization": "Bearer admin"}
+
+
+@pytest.fixture()
+def db(db):
+    for i, credit in enumerate([10, 20, 30], start=1):
+        subject = models.Subject(id=i, name=f"科目{i}", credit=credit)
+        subject.categories = [models.SubjectCategory(course="A", category=models.SubjectCategoryEnum.COMPULSORY)]
+        db.add(subject)
+    for i in range(1, 4):
+        db.add(models.Student(id=i, name=f"学生{i}", course="A", email=f"{i}@example.com", uid=f"uid-{i}"))
+    db.flush()
+    # 学生 i は科目 1..i を修得済み
+    db.execute(
+        models.student_subject.insert(),
+        [{"student_id": i, "subject_id": j} for i in range(1, 4) for j in range(1, i + 1)],
+    )
+    db.commit()
+    return db
+
+
+@pytest.fixture()
+def client(db, app_factory):
+    return TestClient(app_factory(export.router))
+
+
+def test_export_ndjson(client):
+    response = client.get("/api/admin/export/students", params={"chunk_size": 2}, headers=ADMIN)
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    assert response.headers["content-disposition"] == 'attachment; filename="students.ndjson"'
+
+    records = [json.loads(line) for line in response.text.splitlines()]
+    assert [r["id"] for r in records] == [1, 2, 3]
+    assert [r["completed_subject_ids"] for r in records] == [[1], [1, 2], [1, 2, 3]]
+    assert [(r["credits"]["compulsory"], r["credits"]["total"]) for r in records] == [(10, 10), (30, 30), (60, 60)]
+    assert set(records[0]["requirements_met"]) == set(credit_engine.REQUIREMENT_FIELDS)
+
+
+def test_export_csv(client):
+    response = client.get("/api/admin/export/students", params={"format": "csv", "chunk_size": 2}, headers=ADMIN)
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "text/csv; charset=utf-8"
+    assert response.headers["content-disposition"] == 'attachment; filename="students.csv"'
+
+    rows = list(csv.reader(io.StringIO(response.text)))
+    assert rows[0] == [
+        "id", "name", "course", "email", "completed_subject_ids",
+        "compulsory", "limited_elective", "standard_elective", "elective", "total",
+        "compulsory_met", "limited_elective_met", "limited_standard_elective_met", "total_met",
+    ]
+    records = [dict(zip(rows[0], row)) for row in rows[1:]]
+    assert [r["id"] for r in records] == ["1", "2", "3"]
+    assert [r["completed_subject_ids"] for r in records] == ["1", "1 2", "1 2 3"]
+    assert [(r["compulsory"], r["total"]) for r in records] == [("10", "10"), ("30", "30"), ("60", "60")]
+
+    # CSV の要件の充足は NDJSON と同じ値
+    ndjson = client.get("/api/admin/export/students", headers=ADMIN).text.splitlines()
+    for record, line in zip(records, ndjson):
+        met = json.loads(line)["requirements_met"]
+        assert {field: record[f"{field}_met"] for field in met} == {
+            field: str(value).lower() for field, value in met.items()
+        }
+
+
+def test_export_requires_admin(client):
+    assert client.get("/api/admin/export/students", headers={"Authorization": "Bearer uid-1"}).status_code == 403
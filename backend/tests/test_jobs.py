@@ -0,0 +1,195 @@
+import json
+import os
+import time
+from contextlib import asynccontextmanager
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import sessionmaker
+
+from app import bulk_import, credit_summary, jobs, models
+from app.database import Base, create_db_engine
+from app.routers.admin import jobs as jobs_router
+
+ADMIN = {"Authorization": "Bearer admin"}
+
+
+# ワーカープロセスから同じデータベースを開けるよう、ファイルの SQLite を使う
+@pytest.fixture()
+def database(tmp_path):
+    url = f"sqlite:///{tmp_path / 'app.db'}"
+    engine = create_db_engine(url)
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    db = Session()
+    for i in range(1, 4):
+        subject = models.Subject(id=i, name=f"科目{i}", credit=2)
+        subject.categories = [models.SubjectCategory(course="A", category=models.SubjectCategoryEnum.COMPULSORY)]
+        db.add(subject)
+    for i in range(1, 6):
+        db.add(models.Student(id=i, name=f"学生{i}", course="A", email=f"{i}@example.com", uid=f"uid-{i}"))
+    db.flush()
+    db.execute(models.student_subject.insert(), [{"student_id": i, "subject_id": 1} for i in range(1, 6)])
+    db.commit()
+    db.close()
+    yield url, Session
+    engine.dispose()
+
+
+def make_app(app_factory, database, job_dir, workers):
+    url, Session = database
+
+    @asynccontextmanager
+    async def lifespan(app):
+        await jobs.start_runner(Session, url, workers, str(job_dir), poll_interval=0.1)
+        yield
+        await jobs.stop_runner()
+
+    return app_factory(jobs_router.router, sessions=Session, lifespan=lifespan)
+
+
+def wait_for(client, job_id, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = client.get(f"/api/admin/jobs/{job_id}", headers=ADMIN).json()
+        if job["status"] in jobs.FINISHED:
+            return job
+        time.sleep(0.1)
+    raise AssertionError(f"job {job_id} did not finish")
+
+
+def test_jobs_run_in_worker_processes(app_factory, database, tmp_path):
+    url, Session = database
+    with TestClient(make_app(app_factory, database, tmp_path / "jobs", workers=1)) as client:
+        response = client.post(
+            "/api/admin/jobs/import-students",
+            files={"file": ("students.csv", "name,email,course,uid,completed_subjects\n新入生,new@example.com,A,uid-new,1 2\n不正,x@example.com,Z,uid-x,\n")},
+            headers=ADMIN,
+        )
+        assert response.status_code == 202
+        imported = wait_for(client, response.json()["id"])
+        assert imported["status"] == "succeeded", imported["error"]
+        assert imported["summary"] == {"total": 2, "created": 1, "failed": 1}
+        result = client.get(f"/api/admin/jobs/{imported['id']}/result", headers=ADMIN).json()
+        assert result["errors"][0]["row"] == 3
+        # 取り込みファイルは実行後に削除される
+        assert sorted(os.listdir(tmp_path / "jobs")) == [f"{imported['id']}.json"]
+
+        job = client.post("/api/admin/jobs/export-students", json={"format": "ndjson"}, headers=ADMIN).json()
+        exported = wait_for(client, job["id"])
+        assert (exported["status"], exported["progress"], exported["total"]) == ("succeeded", 6, 6)
+        response = client.get(f"/api/admin/jobs/{job['id']}/result", headers=ADMIN)
+        assert response.headers["content-type"] == "application/x-ndjson"
+        records = [json.loads(line) for line in response.text.splitlines()]
+        assert [r["id"] for r in records][-1] == 6 and records[-1]["credits"]["compulsory"] == 4
+
+        rebuilt = wait_for(client, client.post("/api/admin/jobs/rebuild-credit-summary", headers=ADMIN).json()["id"])
+        assert rebuilt["summary"] == {"refreshed": 6}
+
+        listed = client.get("/api/admin/jobs/", params={"status": "succeeded"}, headers=ADMIN).json()
+        assert [j["kind"] for j in listed] == ["rebuild_credit_summary", "export_students", "import_students"]
+
+    db = Session()
+    assert credit_summary.check(db) == []
+    db.close()
+
+
+def test_queued_job_can_be_cancelled_and_has_no_result(app_factory, database, tmp_path):
+    # ワーカーを起動しないため、ジョブは待機中のまま残る
+    with TestClient(make_app(app_factory, database, tmp_path, workers=0)) as client:
+        job = client.post("/api/admin/jobs/rebuild-credit-summary", json={"chunk_size": 2}, headers=ADMIN).json()
+        assert (job["status"], job["params"]) == ("queued", {"chunk_size": 2})
+        assert client.get(f"/api/admin/jobs/{job['id']}/result", headers=ADMIN).status_code == 409
+
+        cancelled = client.post(f"/api/admin/jobs/{job['id']}/cancel", headers=ADMIN).json()
+        assert cancelled["status"] == "cancelled"
+        assert client.post(f"/api/admin/jobs/{job['id']}/cancel", headers=ADMIN).status_code == 409
+        assert client.get("/api/admin/jobs/12345", headers=ADMIN).status_code == 404
+        assert client.post("/api/admin/jobs/rebuild-credit-summary", headers={"Authorization": "Bearer uid-1"}).status_code == 403
+
+
+def test_running_job_stops_at_the_next_progress_report(database, tmp_path):
+    url, Session = database
+    db = Session()
+    job = jobs.submit(db, "export_students", {"format": "csv", "chunk_size": 1})
+    assert jobs.claim(db, 5, "test:1") == [job.id]
+    assert jobs.claim(db, 5, "test:1") == []
+    jobs.request_cancel(db, job)
+    assert (job.status, job.cancel_requested) == ("running", True)
+
+    # ワーカープロセスの処理をこのプロセスで実行する
+    jobs.init_worker(url, str(tmp_path))
+    assert jobs.execute(job.id) == "cancelled"
+    db.refresh(job)
+    assert (job.status, job.result_file) == ("cancelled", None)
+    assert not [name for name in os.listdir(tmp_path) if name.endswith(".part")]
+    db.close()
+
+
+# 取り込みの途中で取り消すと、コミット済みのチャンクの件数を summary に残し、入力ファイルも残す
+def test_cancelled_import_records_partial_counts_and_keeps_the_input(database, tmp_path, monkeypatch):
+    url, Session = database
+    lines = [json.dumps({"name": f"新入生{i}", "email": f"new{i}@example.com", "course": "A", "uid": f"uid-new{i}"}) for i in range(5)]
+    (tmp_path / "input.ndjson").write_text("\n".join([*lines, "{"]), encoding="utf-8")
+    db = Session()
+    job = jobs.submit(db, "import_students", {"input": "input.ndjson", "format": "ndjson", "chunk_size": 2})
+    jobs.claim(db, 1, "test:1")
+
+    # 最初のチャンクのコミット後の進捗の報告で取り消す
+    progress = jobs.JobContext.progress
+
+    def cancel_after_first_chunk(ctx, done, total=None):
+        if done == 2:
+            jobs._cancel_running(db, ctx.job_id)
+        return progress(ctx, done, total)
+
+    monkeypatch.setattr(jobs, "PROGRESS_INTERVAL", 0)
+    monkeypatch.setattr(jobs.JobContext, "progress", cancel_after_first_chunk)
+    jobs.init_worker(url, str(tmp_path))
+    assert jobs.execute(job.id) == "cancelled"
+    db.refresh(job)
+    assert (job.status, job.result_file) == ("cancelled", None)
+    assert job.summary == {"total": 6, "created": 2, "failed": 1}
+    assert db.query(models.Student).filter(models.Student.uid.like("uid-new%")).count() == 2
+    assert (tmp_path / "input.ndjson").exists()
+
+    # 同じ入力で登録し直すと、作成済みの行は失敗として報告され、残りの行が取り込まれる
+    monkeypatch.setattr(jobs.JobContext, "progress", progress)
+    retry = jobs.submit(db, "import_students", {"input": "input.ndjson", "format": "ndjson", "chunk_size": 2})
+    jobs.claim(db, 1, "test:1")
+    assert jobs.execute(retry.id) == "succeeded"
+    db.refresh(retry)
+    assert retry.summary == {"total": 6, "created": 3, "failed": 3}
+    assert not (tmp_path / "input.ndjson").exists()
+    db.close()
+
+
+# 失敗した取り込みも入力ファイルを残す
+def test_failed_import_keeps_the_input(database, tmp_path, monkeypatch):
+    url, Session = database
+    (tmp_path / "input.csv").write_text("name,email,course,uid,completed_subjects\n新入生,new@example.com,A,uid-new,1\n", encoding="utf-8")
+    db = Session()
+    job = jobs.submit(db, "import_students", {"input": "input.csv", "format": "csv"})
+    jobs.claim(db, 1, "test:1")
+
+    def broken(rows, format):
+        raise RuntimeError("broken input")
+
+    monkeypatch.setattr(bulk_import, "parse", broken)
+    jobs.init_worker(url, str(tmp_path))
+    assert jobs.execute(job.id) == "failed"
+    db.refresh(job)
+    assert job.error == "RuntimeError: broken input"
+    assert (tmp_path / "input.csv").exists()
+    db.close()
+
+
+def test_jobs_left_running_by_an_exited_process_are_marked_failed(database):
+    url, Session = database
+    db = Session()
+    job = jobs.submit(db, "rebuild_credit_summary", {})
+    jobs.claim(db, 1, jobs.runner_id())
+    assert jobs.recover(db) == [job.id]
+    db.refresh(job)
+    assert job.status == "failed" and job.error.startswith("interrupted")
+    db.close()
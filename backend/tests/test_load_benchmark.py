@@ -0,0 +1,68 @@
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+from fastapi import HTTPException
+
+from app import firebase_auth
+from app.auth_cache import SigningKeyCache, TTLCache
+from benchmarks import load
+from benchmarks.local_auth import LocalTokenSigner
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture()
+def signer(monkeypatch):
+    # プロセス全体の鍵・トークンキャッシュを汚さないよう差し替える
+    def fetch():
+        raise AssertionError("signing keys must not be fetched over the network")
+
+    monkeypatch.setattr(firebase_auth, "signing_keys", SigningKeyCache(fetch))
+    monkeypatch.setattr(firebase_auth, "token_cache", TTLCache())
+    monkeypatch.setenv("GOOGLE_CLOUD_PROJECT", "placeholder")
+    signer = LocalTokenSigner()
+    signer.install()
+    return signer
+
+
+def test_local_tokens_pass_firebase_verification(signer):
+    user = firebase_auth.verify_token(signer.token("uid-1"))
+    assert (user["uid"], user["admin"]) == ("uid-1", False)
+    assert firebase_auth.verify_token(signer.token("uid-2", admin=True))["admin"] is True
+
+    with pytest.raises(HTTPException):
+        firebase_auth.verify_token(LocalTokenSigner().token("uid-1"))  # 別の鍵で署名
+    with pytest.raises(HTTPException):
+        firebase_auth.verify_token(signer.token("uid-1", ttl=-3600))
+
+
+# app の import 前に DATABASE_URL を設定する必要があるため別プロセスで実行する
+def test_load_benchmark_writes_comparable_results(tmp_path):
+    output = tmp_path / "result.json"
+    subprocess.run(
+        [
+            sys.executable, "-m", "benchmarks.load", "run", "--students", "60", "--subjects", "30",
+            "--requests", "6", "--concurrency", "3", "--warmup", "1",
+            "--database", str(tmp_path / "bench.db"), "--output", str(output),
+        ],
+        cwd=BACKEND_DIR, capture_output=True, text=True, check=True,
+    )
+    result = json.loads(output.read_text())
+    assert result["dataset"] == {"students": 60, "subjects": 30, "seed": 0}
+    assert {(r["scenario"], r["concurrency"]) for r in result["results"]} == {
+        (s.name, c) for s in load.SCENARIOS for c in (1, 3)
+    }
+    for r in result["results"]:
+        assert r["errors"] == 0, r
+        assert r["latency_ms"]["p50"] <= r["latency_ms"]["p95"] <= r["latency_ms"]["p99"]
+
+    lines, regressions = load.compare(result, result)
+    assert len(lines) == len(result["results"]) + 1
+    assert regressions == []
+
+    slower = json.loads(json.dumps(result))
+    slower["results"][0]["latency_ms"]["p95"] *= 2
+    assert load.compare(result, slower)[1] == [f"{slower['results'][0]['scenario']} (c=1)"]
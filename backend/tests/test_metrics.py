@@ -0,0 +1,134 @@
+import asyncio
+import logging
+
+import pytest
+from fastapi import FastAPI, HTTPException
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app import firebase_auth, metrics, models
+from app.database import Base, get_db, get_read_db
+from app.routers.admin import students
+
+from query_count import count_queries
+
+# テスト用のインメモリデータベース（イベントを登録するためこのモジュール専用）
+engine = create_engine(
+    "sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool
+)
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+metrics.instrument_engine(engine, slow_query_ms=1e-6)
+
+
+def override_get_db():
+    try:
+        db = TestingSessionLocal()
+        yield db
+    finally:
+        db.close()
+
+
+@pytest.fixture()
+def client():
+    Base.metadata.create_all(bind=engine)
+    db = TestingSessionLocal()
+    db.add(models.Student(id=1, name="学生", course="A", email="s@example.com", uid="uid-1"))
+    db.commit()
+    db.close()
+    metrics.reset()
+
+    app = FastAPI()
+    app.add_middleware(metrics.MetricsMiddleware)
+    app.include_router(students.router)
+    app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_read_db] = override_get_db
+    yield TestClient(app)
+    metrics.reset()
+    Base.metadata.drop_all(bind=engine)
+
+
+def test_histogram_renders_cumulative_buckets():
+    histogram = metrics.Histogram("test_seconds", "help", ("route",), buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 0.5, 3.0):
+        histogram.observe(value, route='/a/"b"')
+    assert histogram.render().splitlines() == [
+        "# HELP test_seconds help",
+        "# TYPE test_seconds histogram",
+        'test_seconds_bucket{route="/a/\\"b\\"",le="0.1"} 1',
+        'test_seconds_bucket{route="/a/\\"b\\"",le="1"} 3',
+        'test_seconds_bucket{route="/a/\\"b\\"",le="+Inf"} 4',
+        'test_seconds_sum{route="/a/\\"b\\""} 4.05',
+        'test_seconds_count{route="/a/\\"b\\""} 4',
+    ]
+
+
+def test_requests_are_labelled_by_route_template(client):
+    client.get("/students/1")
+    client.get("/students/2")
+    client.get("/no-such-path")
+
+    route = "/students/{student_id}"
+    assert metrics.request_latency.count(method="GET", route=route, status="200") == 1
+    assert metrics.request_latency.count(method="GET", route=route, status="404") == 1
+    assert metrics.request_latency.count(method="GET", route=metrics.UNMATCHED_ROUTE, status="404") == 1
+    assert metrics.request_db_statements.count(route=route) == 2
+
+    text = metrics.render()
+    assert 'http_request_duration_seconds_count{method="GET",route="/students/{student_id}",status="200"} 1' in text
+    assert "/students/1" not in text
+
+
+def test_sql_statements_are_attributed_to_the_request(client, caplog):
+    with count_queries(engine) as statements, caplog.at_level(logging.WARNING, logger="app.metrics"):
+        assert client.get("/students/1").status_code == 200
+
+    route = "/students/{student_id}"
+    assert metrics.db_statements.value(route=route) == len(statements) > 0
+    assert metrics.request_db_statements.sum(route=route) == len(statements)
+    assert metrics.request_db_seconds.sum(route=route) > 0
+    # 閾値を極小にしているのですべての文が低速クエリとして記録される（パラメータは出力しない）
+    assert metrics.slow_queries.value(route=route) == len(statements)
+    assert any(f"route={route}: SELECT" in record.getMessage() for record in caplog.records)
+
+
+def test_statements_outside_requests_use_no_route(client):
+    db = TestingSessionLocal()
+    db.query(models.Student).all()
+    db.close()
+    assert metrics.db_statements.value(route=metrics.NO_ROUTE) == 1
+
+
+def test_token_verification_is_timed(monkeypatch):
+    metrics.reset()
+
+    def verify_token(token):
+        if token == "bad":
+            raise HTTPException(status_code=401, detail="Invalid authentication credentials")
+        return {"uid": token, "admin": False}
+
+    cached = {"cached": {"uid": "cached", "admin": False}}
+    monkeypatch.setattr(firebase_auth, "_cached_token", lambda token, fetch_claims=True: cached.get(token))
+    monkeypatch.setattr(firebase_auth, "verify_token", verify_token)
+
+    asyncio.run(firebase_auth.verify_token_async("cached"))
+    asyncio.run(firebase_auth.verify_token_async("uid-1"))
+    with pytest.raises(HTTPException):
+        asyncio.run(firebase_auth.verify_token_async("bad"))
+
+    for source, result in (("cache", "ok"), ("verify", "ok"), ("verify", "error")):
+        assert metrics.token_verification.count(source=source, result=result) == 1
+    metrics.reset()
+
+
+def test_main_app_exposes_metrics():
+    from app.main import app
+
+    with TestClient(app) as main_client:
+        main_client.get("/protected")
+        response = main_client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    assert 'route="/protected"' in response.text
+    assert "# TYPE firebase_token_verify_seconds histogram" in response.text
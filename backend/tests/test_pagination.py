@@ -0,0 +1,103 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app import models
+from app.database import Base, get_db, get_read_db
+from app.routers.admin import subjects
+
+# テスト用のインメモリデータベース
+engine = create_engine(
+    "sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool
+)
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+def override_get_db():
+    try:
+        db = TestingSessionLocal()
+        yield db
+    finally:
+        db.close()
+
+
+@pytest.fixture(scope="module")
+def client():
+    Base.metadata.create_all(bind=engine)
+    db = TestingSessionLocal()
+    # 同名の科目を含めて name 順のページングを確認する
+    names = ["物理", "数学", "英語", "数学", "化学", "歴史", "英語"]
+    db.add_all([models.Subject(id=i, name=name, credit=2) for i, name in enumerate(names, start=1)])
+    db.commit()
+    db.close()
+
+    app = FastAPI()
+    app.include_router(subjects.router)
+    app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_read_db] = override_get_db
+    yield TestClient(app)
+    Base.metadata.drop_all(bind=engine)
+
+
+def walk(client, **params):
+    pages, cursor = [], None
+    while True:
+        query = dict(params, limit=3)
+        if cursor:
+            query["cursor"] = cursor
+        response = client.get("/subjects/", params=query)
+        assert response.status_code == 200
+        pages.append([s["id"] for s in response.json()])
+        cursor = response.headers.get("X-Next-Cursor")
+        if cursor is None:
+            return pages
+
+
+def test_cursor_pagination_by_id(client):
+    assert walk(client) == [[1, 2, 3], [4, 5, 6], [7]]
+
+
+def test_cursor_pagination_by_name(client):
+    ids = sum(walk(client, order_by="name"), [])
+    response = client.get("/subjects/", params={"order_by": "name"})
+    assert ids == [s["id"] for s in response.json()]
+    assert sorted(ids) == list(range(1, 8))
+
+
+def test_offset_parameters_still_work(client):
+    response = client.get("/subjects/", params={"skip": 2, "limit": 2})
+    assert [s["id"] for s in response.json()] == [3, 4]
+    assert "X-Total-Count" not in response.headers
+
+
+def test_total_count_is_optional(client):
+    response = client.get("/subjects/", params={"limit": 2, "include_total": True})
+    assert response.headers["X-Total-Count"] == "7"
+
+
+def test_invalid_cursor(client):
+    assert client.get("/subjects/", params={"cursor": "not-a-cursor"}).status_code == 400
+    cursor = client.get("/subjects/", params={"limit": 1}).headers["X-Next-Cursor"]
+    assert client.get("/subjects/", params={"cursor": cursor, "order_by": "name"}).status_code == 400
+
+
+def test_cursor_pagination_by_name_with_null_names(client):
+    # name が NULL の科目は name 順の最後に id 順で並ぶ（NULL をまたぐページと NULL の途中からのページ）
+    db = TestingSessionLocal()
+    db.add_all([models.Subject(id=i, name=None, credit=2) for i in (8, 9, 10, 11)])
+    db.commit()
+    try:
+        names = ["物理", "数学", "英語", "数学", "化学", "歴史", "英語"]
+        named = sorted(range(1, 8), key=lambda i: (names[i - 1], i))
+        pages = walk(client, order_by="name")
+        assert sum(pages, []) == named + [8, 9, 10, 11]
+        assert pages[2] == [named[-1], 8, 9]
+        response = client.get("/subjects/", params={"order_by": "name"})
+        assert [s["id"] for s in response.json()] == sum(pages, [])
+    finally:
+        db.query(models.Subject).filter(models.Subject.id > 7).delete()
+        db.commit()
+        db.close()
@@ -0,0 +1,159 @@
+import itertools
+import random
+import time
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+from app import credit_engine, models, planner
+from app.routers.admin import students
+from app.schemas.credit_calculation import CreditRequirement
+
+
+def make_catalog(credits, categories):
+    # 区分コードはコース A の行に入れる（他のコースはすべて自由選択）
+    n = len(credits)
+    table = np.full((len(credit_engine.COURSES) + 1, n), credit_engine.ELECTIVE, dtype=np.int8)
+    table[0] = categories
+    return credit_engine.CreditCatalog(
+        subject_ids=np.arange(1, n + 1, dtype=np.int64),
+        credits=np.asarray(credits, dtype=np.int64),
+        category_table=table,
+    )
+
+
+def satisfies(catalog, subject_ids, requirements):
+    result = credit_engine.compute_cohort_credits(
+        catalog, [0], ["A"], [0] * len(subject_ids), subject_ids, requirements=requirements
+    )
+    return bool(result.requirements_met[0].all())
+
+
+# 全組み合わせを試して最適値を求める（小さなカタログでの検証用）
+def brute_force(catalog, requirements, objective):
+    ids = catalog.subject_ids.tolist()
+    credit_of = dict(zip(ids, catalog.credits.tolist()))
+    best = None
+    for r in range(len(ids) + 1):
+        for combo in itertools.combinations(ids, r):
+            if satisfies(catalog, list(combo), requirements):
+                cost = len(combo) if objective == "count" else sum(credit_of[i] for i in combo)
+                best = cost if best is None else min(best, cost)
+    return best
+
+
+@pytest.mark.parametrize("seed", range(12))
+@pytest.mark.parametrize("objective", planner.OBJECTIVES)
+def test_plan_is_optimal(seed, objective):
+    rng = random.Random(seed)
+    n = rng.randint(4, 9)
+    catalog = make_catalog([rng.randint(1, 6) for _ in range(n)], [rng.randrange(4) for _ in range(n)])
+    requirements = CreditRequirement(
+        required_compulsory=rng.randint(0, 6),
+        required_limited_elective=rng.randint(0, 5),
+        required_limited_standard_elective=rng.randint(0, 9),
+        required_total=rng.randint(0, 18),
+    )
+    plan = planner.plan_remaining(catalog, "A", [], requirements, objective)
+    expected = brute_force(catalog, requirements, objective)
+
+    assert plan.feasible == (expected is not None)
+    if plan.feasible:
+        assert satisfies(catalog, plan.subject_ids, requirements)
+        credit_of = dict(zip(catalog.subject_ids.tolist(), catalog.credits.tolist()))
+        cost = len(plan.subject_ids) if objective == "count" else sum(credit_of[i] for i in plan.subject_ids)
+        assert cost == expected
+
+
+def test_completed_and_excluded_subjects():
+    # 1: 必修 4 単位, 2: 必修 2 単位, 3: 必修 2 単位, 4: 自由選択 6 単位
+    catalog = make_catalog([4, 2, 2, 6], [credit_engine.COMPULSORY] * 3 + [credit_engine.ELECTIVE])
+    requirements = CreditRequirement(
+        required_compulsory=4, required_limited_elective=0, required_limited_standard_elective=0, required_total=8,
+    )
+    assert planner.plan_remaining(catalog, "A", [], requirements).subject_ids == [1, 4]
+    assert planner.plan_remaining(catalog, "A", [], requirements, "credits").subject_ids == [1, 2, 3]
+    assert planner.plan_remaining(catalog, "A", [1], requirements).subject_ids == [4]
+    assert planner.plan_remaining(catalog, "A", [1, 4], requirements).subject_ids == []
+    assert planner.plan_remaining(catalog, "A", [], requirements, excluded_subject_ids=[1]).subject_ids == [2, 3, 4]
+    assert not planner.plan_remaining(catalog, "A", [], requirements, excluded_subject_ids=[1, 2]).feasible
+
+
+def test_large_catalog_is_fast():
+    rng = random.Random(0)
+    n = 600
+    catalog = make_catalog([rng.choice([1, 2, 2, 2, 4]) for _ in range(n)], [rng.randrange(4) for _ in range(n)])
+    requirements = CreditRequirement()
+    planner.plan_remaining(catalog, "A", [], requirements)
+
+    start = time.perf_counter()
+    for objective in planner.OBJECTIVES:
+        plan = planner.plan_remaining(catalog, "A", range(1, 40), requirements, objective)
+        assert plan.feasible
+        assert satisfies(catalog, [*range(1, 40), *plan.subject_ids], requirements)
+    # 対話的に使える速さ（遅い CI でも余裕のある上限）
+    assert (time.perf_counter() - start) / 2 < 0.1
+
+
+# エンドポイント
+@pytest.fixture()
+def db(db):
+    categories = [
+        models.SubjectCategoryEnum.COMPULSORY,
+        models.SubjectCategoryEnum.LIMITED_ELECTIVE,
+        models.SubjectCategoryEnum.STANDARD_ELECTIVE,
+    ]
+    for i in range(1, 61):
+        subject = models.Subject(id=i, name=f"科目{i}", credit=4)
+        subject.categories = [models.SubjectCategory(course="A", category=categories[i % 3])]
+        db.add(subject)
+    db.add(models.Student(id=1, name="学生", course="A", email="s@example.com", uid="uid-1"))
+    db.flush()
+    db.execute(models.student_subject.insert(), [{"student_id": 1, "subject_id": i} for i in range(1, 31)])
+    db.commit()
+    return db
+
+
+@pytest.fixture()
+def client(db, app_factory):
+    return TestClient(app_factory(students.router))
+
+
+def test_plan_endpoint_for_logged_in_student(client):
+    response = client.post("/students/plan", json={}, headers={"Authorization": "Bearer uid-1"})
+    assert response.status_code == 200
+    plan = response.json()
+    assert plan["feasible"] is True
+    assert plan["course"] == "A"
+    assert not set(plan["subject_ids"]) & set(range(1, 31))
+    assert plan["added_credits"] == 4 * len(plan["subject_ids"])
+    assert plan["credits"]["total"] == 120 + plan["added_credits"]
+    assert all(plan["requirements_met"].values())
+
+
+def test_plan_endpoint_what_if(client):
+    everything = {"course": "A", "completed_subjects": list(range(1, 61))}
+    response = client.post("/students/plan", json=everything, headers={"Authorization": "Bearer uid-1"})
+    assert response.json()["subject_ids"] == []
+
+    response = client.post(
+        "/students/plan", json={"completed_subjects": [], "objective": "credits"},
+        headers={"Authorization": "Bearer uid-unknown"},
+    )
+    assert response.status_code == 404
+
+
+# コースと修得科目を指定した仮定の計画は、学生として登録されていなくても計画できる
+def test_plan_endpoint_what_if_without_a_student_row(client):
+    response = client.post(
+        "/students/plan", json={"course": "A", "completed_subjects": []},
+        headers={"Authorization": "Bearer uid-unknown"},
+    )
+    assert response.status_code == 200
+    assert response.json()["feasible"] is True
+
+
+def test_plan_endpoint_rejects_unknown_course(client):
+    response = client.post("/students/plan", json={"course": "Z", "completed_subjects": []}, headers={"Authorization": "Bearer uid-1"})
+    assert response.status_code == 422
@@ -0,0 +1,111 @@
+import cProfile
+import pstats
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app import models, profiling
+from app.routers.admin import profiling as profiling_router
+from app.routers.admin import students
+
+ADMIN = {"Authorization": "Bearer admin"}
+
+
+@pytest.fixture()
+def db(db):
+    db.add(models.Student(id=1, name="学生", course="A", email="s@example.com", uid="uid-1"))
+    db.commit()
+    return db
+
+
+@pytest.fixture()
+def client(db, app_factory):
+    app = app_factory(students.router, profiling_router.router)
+    app.add_middleware(profiling.ProfilingMiddleware)
+    yield TestClient(app)
+    profiling.profiler.configure("off")
+    profiling.profiler.clear()
+
+
+def configure(client, **config):
+    response = client.put("/api/admin/profiling/", json=config, headers=ADMIN)
+    assert response.status_code == 200
+    return response.json()
+
+
+def profiles(client):
+    return client.get("/api/admin/profiling/", headers=ADMIN).json()["profiles"]
+
+
+def test_requires_admin(client):
+    assert client.put("/api/admin/profiling/", json={"mode": "sample"}, headers={"Authorization": "Bearer uid-1"}).status_code == 403
+    assert client.get("/api/admin/profiling/").status_code in (401, 403)
+
+
+def test_nothing_is_recorded_when_off(client):
+    client.get("/students/1")
+    assert profiles(client) == []
+
+
+def test_header_mode_profiles_only_requests_with_the_token(client, tmp_path):
+    status = configure(client, mode="header", path_prefix="/students/")
+    token = status["header_token"]
+    header = status["header"]
+
+    client.get("/students/1")
+    client.get("/students/1", headers={header: "wrong"})
+    client.get("/students/1", headers={header: token})
+    recorded = profiles(client)
+    assert len(recorded) == 1
+    assert (recorded[0]["route"], recorded[0]["status"]) == ("/students/{student_id}", 200)
+    assert recorded[0]["profiled_ms"] <= recorded[0]["duration_ms"]
+
+    # pstats として読み込め、run_db で実行したハンドラ本体が含まれる
+    response = client.get(f"/api/admin/profiling/profiles/{recorded[0]['id']}/pstats", headers=ADMIN)
+    path = tmp_path / "profile.pstats"
+    path.write_bytes(response.content)
+    functions = {name for _, _, name in pstats.Stats(str(path)).stats}
+    assert "run" in functions
+
+    collapsed = client.get(f"/api/admin/profiling/profiles/{recorded[0]['id']}/collapsed", headers=ADMIN).text
+    assert any(line.startswith("run (students.py:") and line.rsplit(" ", 1)[1].isdigit() for line in collapsed.splitlines())
+
+    # 再設定するとトークンは無効になる
+    configure(client, mode="header")
+    client.get("/students/1", headers={header: token})
+    assert len(profiles(client)) == 1
+
+
+def test_sample_mode_stops_after_max_requests_and_buffer_is_bounded(client):
+    configure(client, mode="sample", sample_rate=1.0, path_prefix="/students/", max_requests=3, buffer_size=2)
+    for _ in range(4):
+        client.get("/students/1")
+    status = client.get("/api/admin/profiling/", headers=ADMIN).json()
+    assert status["mode"] == "off"
+    # 3 件計測し、古い 1 件は破棄される
+    ids = [p["id"] for p in status["profiles"]]
+    assert len(ids) == 2 and ids[1] == ids[0] + 1
+
+    assert client.delete("/api/admin/profiling/profiles", headers=ADMIN).status_code == 200
+    assert profiles(client) == []
+    assert client.get("/api/admin/profiling/profiles/1/pstats", headers=ADMIN).status_code == 404
+
+
+def inner(n):
+    return sum(i * i for i in range(n))
+
+
+def outer():
+    return inner(20000) + inner(20000)
+
+
+def test_collapsed_stacks_follow_the_call_graph():
+    profile = cProfile.Profile()
+    profile.runcall(outer)
+    stats = pstats.Stats(profile)
+    lines = profiling.collapsed_stacks(stats).splitlines()
+    stacks = {line.rsplit(" ", 1)[0]: int(line.rsplit(" ", 1)[1]) for line in lines}
+    assert any(stack.startswith("outer (") and ";inner (" in stack for stack in stacks)
+    # 配分した時間の合計は計測した合計時間とほぼ一致する
+    total = sum(tt for _, _, tt, _, _ in stats.stats.values()) * 1_000_000
+    assert sum(stacks.values()) == pytest.approx(total, rel=0.05)
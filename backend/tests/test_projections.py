@@ -0,0 +1,138 @@
+import random
+
+import pytest
+from fastapi import FastAPI, Response
+from fastapi.testclient import TestClient
+from pydantic import TypeAdapter
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from typing import List
+
+from app import models
+from app.database import Base, get_db, get_read_db
+from app.routers import projections
+from app.routers.admin import students, subjects
+from app.routers.pagination import paginate
+from app.routers.queries import query_for
+from app.schemas.student import Student
+from app.schemas.subject import Subject
+
+# テスト用のインメモリデータベース
+engine = create_engine(
+    "sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool
+)
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+# エスケープが必要な文字・非 ASCII・絵文字を含む名前
+NAMES = ["数学", 'quote " and \\ slash /', "改行\nタブ\t", "制御\x01\x1f文字", "😀 絵文字", "同名", "同名"]
+
+
+def override_get_db():
+    try:
+        db = TestingSessionLocal()
+        yield db
+    finally:
+        db.close()
+
+
+@pytest.fixture(scope="module")
+def db():
+    Base.metadata.create_all(bind=engine)
+    session = TestingSessionLocal()
+    rng = random.Random(0)
+    # 挿入順を主キー順と変えて、関連する行の順序が一致することも確認する
+    subject_ids = list(range(1, 41))
+    rng.shuffle(subject_ids)
+    session.add_all([models.Subject(id=i, name=NAMES[i % len(NAMES)], credit=i % 4 + 1) for i in subject_ids])
+    session.flush()
+    categories = [(i, course) for i in subject_ids[:30] for course in rng.sample("ABC", rng.randint(1, 3))]
+    rng.shuffle(categories)
+    session.add_all([
+        models.SubjectCategory(subject_id=i, course=course, category=rng.choice(list(models.SubjectCategoryEnum)))
+        for i, course in categories
+    ])
+    session.add_all([
+        models.Student(
+            id=i, name=NAMES[i % len(NAMES)], course="ABC"[i % 3], email=f"{i}@example.com", uid=f"uid-{i}",
+            entrance_year=None if i % 4 == 0 else 2020 + i % 5,
+        )
+        for i in range(1, 26)
+    ])
+    session.flush()
+    enrollments = [(i, j) for i in range(1, 26) if i % 5 for j in rng.sample(subject_ids, rng.randint(1, 12))]
+    rng.shuffle(enrollments)
+    session.execute(models.student_subject.insert(), [{"student_id": i, "subject_id": j} for i, j in enrollments])
+    session.commit()
+    try:
+        yield session
+    finally:
+        session.close()
+        Base.metadata.drop_all(bind=engine)
+
+
+@pytest.fixture(scope="module")
+def client(db):
+    app = FastAPI()
+    app.include_router(students.router)
+    app.include_router(subjects.router)
+    app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_read_db] = override_get_db
+    return TestClient(app)
+
+
+# 従来の経路（ORM のオブジェクト → Pydantic の検証 → dump_json）のレスポンス本文とヘッダ
+def orm_page(db, model, schema, **params):
+    response = Response()
+    items = paginate(query_for(db, model, schema), model, response, **params)
+    body = TypeAdapter(List[schema]).dump_json([schema.model_validate(item) for item in items])
+    return body, dict(response.headers)
+
+
+PARAMS = [
+    {},
+    {"skip": 7, "limit": 5},
+    {"limit": 4, "order_by": "name", "include_total": True},
+    {"limit": 0},
+    {"skip": 100},
+]
+
+
+@pytest.mark.parametrize("params", PARAMS)
+@pytest.mark.parametrize("path, model, schema, page", [
+    ("/students/", models.Student, Student, projections.student_page),
+    ("/subjects/", models.Subject, Subject, projections.subject_page),
+])
+def test_projection_is_byte_identical(client, db, path, model, schema, page, params):
+    expected, headers = orm_page(db, model, schema, **params)
+
+    response = Response()
+    assert projections.dumps(page(db, response, **params)) == expected
+    assert dict(response.headers) == headers
+
+    http = client.get(path, params=params)
+    assert http.status_code == 200
+    assert http.content == expected
+    assert http.headers["content-type"] == "application/json"
+    for name in ("x-next-cursor", "x-total-count"):
+        assert http.headers.get(name) == headers.get(name)
+
+
+def test_cursor_pages_match(client, db):
+    cursor = None
+    while True:
+        params = {"limit": 6, "order_by": "name", **({"cursor": cursor} if cursor else {})}
+        expected, headers = orm_page(db, models.Student, Student, **params)
+        response = client.get("/students/", params=params)
+        assert response.content == expected
+        cursor = response.headers.get("x-next-cursor")
+        assert cursor == headers.get("x-next-cursor")
+        if cursor is None:
+            break
+
+
+def test_json_fallback_matches_orjson(monkeypatch):
+    content = [{"name": name, "id": i, "entrance_year": None, "items": []} for i, name in enumerate(NAMES)]
+    fast = projections.dumps(content)
+    monkeypatch.setattr(projections, "orjson", None)
+    assert projections.dumps(content) == fast
@@ -0,0 +1,80 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app import models
+from app.database import Base, get_db, get_read_db
+from app.routers.admin import subjects
+from app.routers.queries import query_for
+from app.schemas.student import Student
+
+from query_count import assert_constant_query_count
+
+# テスト用のインメモリデータベース
+engine = create_engine(
+    "sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool
+)
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+def override_get_db():
+    try:
+        db = TestingSessionLocal()
+        yield db
+    finally:
+        db.close()
+
+
+@pytest.fixture(scope="module")
+def seeded():
+    Base.metadata.create_all(bind=engine)
+    db = TestingSessionLocal()
+    for i in range(1, 61):
+        subject = models.Subject(id=i, name=f"科目{i}", credit=2)
+        subject.categories = [
+            models.SubjectCategory(course="A", category=models.SubjectCategoryEnum.COMPULSORY),
+            models.SubjectCategory(course="B", category=models.SubjectCategoryEnum.ELECTIVE),
+        ]
+        db.add(subject)
+    db.flush()
+    for i in range(1, 61):
+        student = models.Student(id=i, name=f"学生{i}", course="A", email=f"s{i}@example.com", uid=f"uid-{i}")
+        student.completed_subjects = db.query(models.Subject).filter(models.Subject.id <= 3).all()
+        db.add(student)
+    db.commit()
+    db.close()
+    yield
+    Base.metadata.drop_all(bind=engine)
+
+
+def test_student_list_query_count_is_constant(seeded):
+    def list_students(limit):
+        db = TestingSessionLocal()
+        try:
+            rows = query_for(db, models.Student, Student).offset(0).limit(limit).all()
+            result = [Student.model_validate(row) for row in rows]
+            assert len(result) == limit
+            assert len(result[0].completed_subjects) == 3
+        finally:
+            db.close()
+
+    assert_constant_query_count(engine, list_students)
+
+
+def test_subject_list_query_count_is_constant(seeded):
+    app = FastAPI()
+    app.include_router(subjects.router)
+    app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_read_db] = override_get_db
+    client = TestClient(app)
+
+    def list_subjects(limit):
+        response = client.get("/subjects/", params={"limit": limit})
+        assert response.status_code == 200
+        assert len(response.json()) == limit
+        assert len(response.json()[0]["categories"]) == 2
+
+    assert_constant_query_count(engine, list_subjects)
@@ -0,0 +1,181 @@
+import os
+
+import pytest
+from alembic import command
+from alembic.config import Config
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.orm import sessionmaker
+
+from app import credit_engine, credit_summary, models
+from app.database import get_db, get_read_db
+from app.routers.admin import subjects
+from app.routers.queries import query_for
+from app.schemas.student import Student
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+# マイグレーションを head まで適用したデータベースで主要なクエリの実行計画を確認する
+# （create_all ではなく Alembic のスキーマで索引が効いていることを保証する）
+@pytest.fixture(scope="module")
+def engine(tmp_path_factory):
+    url = f"sqlite:///{tmp_path_factory.mktemp('plans') / 'plans.db'}"
+    config = Config()
+    config.set_main_option("script_location", os.path.join(BACKEND_DIR, "alembic"))
+    config.set_main_option("sqlalchemy.url", url)
+    command.upgrade(config, "head")
+
+    engine = create_engine(url, connect_args={"check_same_thread": False})
+    with engine.begin() as conn:
+        conn.execute(models.Subject.__table__.insert(), [
+            {"id": i, "name": f"科目{i % 7}", "credit": 2} for i in range(1, 51)
+        ])
+        conn.execute(models.SubjectCategory.__table__.insert(), [
+            {"course": course, "subject_id": i, "category": "ELECTIVE"}
+            for i in range(1, 51) for course in ("A", "B")
+        ])
+        conn.execute(models.Student.__table__.insert(), [
+            {"id": i, "name": f"学生{i % 5}", "course": "AB"[i % 2], "email": f"{i}@example.com", "uid": f"uid-{i}"}
+            for i in range(1, 21)
+        ])
+        conn.execute(models.student_subject.insert(), [
+            {"student_id": i, "subject_id": j} for i in range(1, 21) for j in range(1, 51, 3)
+        ])
+        # 統計情報を取って実行計画を実データに近づける
+        conn.execute(text("ANALYZE"))
+    yield engine
+    engine.dispose()
+
+
+# ブロック内で発行された SELECT 文とパラメータを記録する
+class StatementRecorder:
+    def __init__(self, engine):
+        self.engine = engine
+        self.statements = []
+
+    def __enter__(self):
+        event.listen(self.engine, "before_cursor_execute", self._record)
+        return self.statements
+
+    def __exit__(self, *exc):
+        event.remove(self.engine, "before_cursor_execute", self._record)
+
+    def _record(self, conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT") and not executemany:
+            self.statements.append((statement, parameters))
+
+
+def query_plan(engine, statement, parameters):
+    with engine.connect() as conn:
+        rows = conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters).all()
+    return [row[-1] for row in rows]
+
+
+# WHERE 句のあるクエリが全件走査や一時 B-tree でのソートをしていないことを確認する
+# （WHERE 句のない全件取得、たとえば科目カタログの読み込みは対象外）
+def assert_indexed(engine, statements):
+    assert statements
+    for statement, parameters in statements:
+        plan = query_plan(engine, statement, parameters)
+        if " WHERE " in statement.upper().replace("\n", " "):
+            scans = [line for line in plan if line.startswith("SCAN") or "TEMP B-TREE" in line]
+            assert not scans, f"{statement}\n=> {plan}"
+
+
+@pytest.fixture(scope="module")
+def client(engine):
+    SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+    def override_get_db():
+        db = SessionLocal()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app = FastAPI()
+    app.include_router(subjects.router)
+    app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_read_db] = override_get_db
+    return TestClient(app)
+
+
+@pytest.fixture()
+def db(engine):
+    session = sessionmaker(bind=engine)()
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+@pytest.mark.parametrize("order_by", ["id", "name"])
+def test_subject_list_pages_use_indexes(engine, client, order_by):
+    cursor = client.get("/subjects/", params={"limit": 5, "order_by": order_by}).headers["X-Next-Cursor"]
+    with StatementRecorder(engine) as statements:
+        response = client.get("/subjects/", params={"limit": 5, "order_by": order_by, "cursor": cursor})
+    assert response.status_code == 200
+    assert_indexed(engine, statements)
+
+
+def test_subject_detail_uses_indexes(engine, client):
+    with StatementRecorder(engine) as statements:
+        assert client.get("/subjects/7").status_code == 200
+    assert_indexed(engine, statements)
+
+
+def test_student_lookup_uses_indexes(engine, db):
+    with StatementRecorder(engine) as statements:
+        student = query_for(db, models.Student, Student).filter(models.Student.uid == "uid-3").first()
+        Student.model_validate(student)
+    assert_indexed(engine, statements)
+
+
+def test_single_student_credits_use_indexes(engine, db):
+    with StatementRecorder(engine) as statements:
+        credit_engine.calculate_cohort_credits(db, student_ids=[3]).calculation(0)
+    assert_indexed(engine, statements)
+
+
+def test_credit_summary_lookup_uses_indexes(engine, db):
+    with StatementRecorder(engine) as statements:
+        credit_summary.summary_for_uid(db, "uid-3")
+    assert_indexed(engine, statements)
+
+
+def test_course_credits_use_indexes(engine, db):
+    with StatementRecorder(engine) as statements:
+        credit_engine.calculate_cohort_credits(db, course="A")
+    assert_indexed(engine, statements)
+
+
+def test_streamed_credits_use_indexes(engine, db):
+    with StatementRecorder(engine) as statements:
+        for _ in credit_engine.iter_cohort_credits(db, chunk_size=7):
+            pass
+    assert_indexed(engine, statements)
+
+
+def test_migration_removes_duplicate_enrollments(tmp_path):
+    url = f"sqlite:///{tmp_path / 'legacy.db'}"
+    config = Config()
+    config.set_main_option("script_location", os.path.join(BACKEND_DIR, "alembic"))
+    config.set_main_option("sqlalchemy.url", url)
+    command.upgrade(config, "0001_initial")
+
+    engine = create_engine(url)
+    with engine.begin() as conn:
+        conn.execute(text("INSERT INTO subjects (id, name, credit) VALUES (1, '数学', 2)"))
+        conn.execute(text("INSERT INTO student_subject (student_id, subject_id) VALUES (1, 1), (1, 1), (NULL, 1)"))
+        conn.execute(text(
+            "INSERT INTO subject_category (course, subject_id, category) "
+            "VALUES ('A', 1, 'ELECTIVE'), ('A', 1, 'COMPULSORY')"
+        ))
+    command.upgrade(config, "head")
+
+    with engine.connect() as conn:
+        assert conn.execute(text("SELECT student_id, subject_id FROM student_subject")).all() == [(1, 1)]
+        assert conn.execute(text("SELECT category FROM subject_category")).scalars().all() == ["COMPULSORY"]
+    engine.dispose()
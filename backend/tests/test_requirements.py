@@ -0,0 +1,134 @@
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+from app import credit_engine, credit_summary, models, requirements
+from app.routers.admin import requirements as requirements_router
+from app.schemas.credit_calculation import CreditRequirement
+
+from query_count import count_queries
+
+def rule(total, compulsory=0):
+    return CreditRequirement(
+        required_compulsory=compulsory, required_limited_elective=0,
+        required_limited_standard_elective=0, required_total=total,
+    )
+
+
+RULES = [
+    ((None, None), rule(100)),
+    ((None, 2023), rule(110)),
+    (("A", None), rule(80)),
+    (("A", 2024), rule(90)),
+]
+
+
+@pytest.mark.parametrize("course, year, total", [
+    ("A", None, 80),    # A の年度によらないルール
+    ("A", 2022, 80),
+    ("A", 2024, 90),    # 2024 年度以降の A のルール
+    ("A", 2030, 90),
+    ("B", None, 100),   # 全コース共通の既定値
+    ("B", 2022, 100),
+    ("B", 2023, 110),   # 2023 年度以降の共通ルール
+    ("X", 2025, 110),   # 未知のコースも共通ルール
+])
+def test_rule_resolution(course, year, total):
+    evaluator = credit_engine.RequirementEvaluator.compile(RULES)
+    assert evaluator.requirement_for(course, year).required_total == total
+
+
+def test_no_rules_uses_defaults():
+    evaluator = credit_engine.RequirementEvaluator.compile([])
+    assert evaluator.requirement_for("A", 2024) == CreditRequirement()
+
+
+def test_vectorized_thresholds_match_single_lookups():
+    evaluator = credit_engine.RequirementEvaluator.compile(RULES)
+    courses = ["A", "B", "A", "C", "A", "B"]
+    years = [2024, None, None, 2023, 2024, 2021]
+    thresholds = evaluator.thresholds_for(
+        [credit_engine.course_index(c) for c in courses], [-1 if y is None else y for y in years]
+    )
+    assert thresholds[:, 3].tolist() == [
+        evaluator.requirement_for(c, y).required_total for c, y in zip(courses, years)
+    ]
+
+
+def test_engine_applies_rules_per_student():
+    catalog = credit_engine.CreditCatalog(
+        subject_ids=np.array([1]), credits=np.array([95]),
+        category_table=np.full((len(credit_engine.COURSES) + 1, 1), credit_engine.ELECTIVE, dtype=np.int8),
+    )
+    evaluator = credit_engine.RequirementEvaluator.compile(RULES)
+    result = credit_engine.compute_cohort_credits(
+        catalog, [1, 2, 3], ["A", "A", "B"], [1, 2, 3], [1, 1, 1],
+        requirements=evaluator, entrance_years=[2020, 2024, 2024],
+    )
+    # 95 単位: A の既定 80 は満たし、A 2024 の 90 も満たし、共通 2023 以降の 110 は満たさない
+    assert result.requirements_met[:, 3].tolist() == [True, True, False]
+
+
+def test_evaluator_is_cached_until_rules_change(db, engine):
+    first = requirements.get_evaluator(db)
+    with count_queries(engine) as statements:
+        assert requirements.get_evaluator(db) is first
+    # バージョンの確認のみ
+    assert len(statements) == 1
+
+    db.add(models.RequirementRule(course="A", entrance_year=None, **rule(10).model_dump()))
+    requirements.rules_changed(db, "A")
+    db.commit()
+    second = requirements.get_evaluator(db)
+    assert second is not first
+    assert second.requirement_for("A", None).required_total == 10
+
+
+@pytest.fixture()
+def client(db, app_factory):
+    subject = models.Subject(id=1, name="数学", credit=95)
+    subject.categories = [models.SubjectCategory(course="A", category=models.SubjectCategoryEnum.COMPULSORY)]
+    db.add(subject)
+    db.add_all([
+        models.Student(id=1, name="学生A", course="A", email="a@example.com", uid="uid-a", entrance_year=2024),
+        models.Student(id=2, name="学生B", course="B", email="b@example.com", uid="uid-b", entrance_year=2024),
+    ])
+    db.flush()
+    db.execute(models.student_subject.insert(), [{"student_id": 1, "subject_id": 1}, {"student_id": 2, "subject_id": 1}])
+    db.commit()
+    credit_summary.rebuild(db)
+    return TestClient(app_factory(requirements_router.router), headers={"Authorization": "Bearer admin"})
+
+
+def total_met(db, student_id):
+    db.expire_all()
+    return db.get(models.StudentCreditSummary, student_id).total_met
+
+
+def test_rule_changes_reevaluate_summaries(client, db):
+    assert total_met(db, 1) is True  # 既定値 95 単位
+
+    response = client.put("/api/admin/requirements/", json={"course": "A", "entrance_year": 2024, **rule(120).model_dump()})
+    assert response.status_code == 200
+    rule_id = response.json()["id"]
+    assert total_met(db, 1) is False
+    assert total_met(db, 2) is True
+
+    # 同じコース・年度への PUT は更新になる
+    response = client.put("/api/admin/requirements/", json={"course": "A", "entrance_year": 2024, **rule(90).model_dump()})
+    assert response.json()["id"] == rule_id
+    assert len(client.get("/api/admin/requirements/").json()) == 1
+    assert total_met(db, 1) is True
+
+    client.put("/api/admin/requirements/", json={"course": None, "entrance_year": None, **rule(200).model_dump()})
+    assert total_met(db, 2) is False
+    assert credit_summary.check(db) == []
+
+    assert client.delete(f"/api/admin/requirements/{rule_id}").status_code == 200
+    assert total_met(db, 1) is False
+    assert client.delete(f"/api/admin/requirements/{rule_id}").status_code == 404
+
+
+def test_invalid_course_is_rejected(client):
+    response = client.put("/api/admin/requirements/", json={"course": "D", **rule(10).model_dump()})
+    assert response.status_code == 422
@@ -0,0 +1,170 @@
+import os
+
+import pytest
+from alembic import command
+from alembic.config import Config
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, insert, text, update
+from sqlalchemy.orm import Session
+
+from app import models, search
+from app.catalog_sync import sync_catalog
+from app.routers.admin import search as search_router
+from app.schemas.subject import CatalogSubject
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+ADMIN = {"Authorization": "Bearer admin"}
+
+
+@pytest.fixture()
+def db(db):
+    db.add_all([
+        models.Student(id=1, name="田中 太郎", course="A", email="taro@example.com", uid="uid-1"),
+        models.Student(id=2, name="佐々木 花子", course="A", email="hanako@example.com", uid="uid-2"),
+        models.Student(id=3, name="田中 一郎", course="B", email="ichiro.tanaka@example.com", uid="uid-3"),
+        models.Subject(id=1, name="線形代数学", credit=2),
+        models.Subject(id=2, name="田中研究室演習", credit=1),
+    ])
+    db.commit()
+    return db
+
+
+@pytest.fixture()
+def client(db, app_factory):
+    return TestClient(app_factory(search_router.router))
+
+
+def found(db, q, **options):
+    return [(r.kind, r.id) for r in search.search(db, q, **options)]
+
+
+def test_search_endpoint_ranks_and_paginates(client):
+    response = client.get("/api/admin/search/", params={"q": "tanaka", "include_total": True}, headers=ADMIN)
+    assert response.status_code == 200
+    assert response.headers["X-Total-Count"] == "1"
+    assert [(r["kind"], r["id"]) for r in response.json()] == [("student", 3)]
+    assert response.json()[0]["score"] > 0
+
+    # 2 文字の語は bigram の索引で検索し、順位付けせずに名前の短い順に並べる
+    params = {"q": "田中", "limit": 2}
+    first = client.get("/api/admin/search/", params=params, headers=ADMIN).json()
+    second = client.get("/api/admin/search/", params={**params, "skip": 2}, headers=ADMIN).json()
+    assert [(r["kind"], r["id"]) for r in first + second] == [("student", 1), ("student", 3), ("subject", 2)]
+
+    response = client.get("/api/admin/search/", params={"q": "田中", "kind": "subject"}, headers=ADMIN)
+    assert [r["id"] for r in response.json()] == [2]
+    assert client.get("/api/admin/search/", params={"q": "田中"}, headers={"Authorization": "Bearer uid-1"}).status_code == 403
+
+
+@pytest.mark.parametrize("q, expected", [
+    ("代数", [("subject", 1)]),
+    ("郎", [("student", 1), ("student", 3)]),
+    ("Ta", [("student", 1), ("student", 3)]),
+    ("o.", [("student", 3)]),
+    ("中 研究", [("subject", 2)]),
+    ("田中 tanaka", [("student", 3)]),
+    ("線形代数", [("subject", 1)]),
+    ("example 田中", [("student", 1), ("student", 3)]),
+    ("田中 一郎", [("student", 3)]),
+    ("EXAMPLE.COM 佐々木", [("student", 2)]),
+    ('"; DROP', []),
+    ("100%", []),
+    ("  ", []),
+])
+def test_terms_are_matched_as_substrings(db, q, expected):
+    assert sorted(found(db, q)) == expected
+
+
+def test_index_follows_every_write_path(db):
+    # ORM の更新・削除
+    db.get(models.Student, 1).name = "鈴木 太郎"
+    db.delete(db.get(models.Student, 2))
+    # 一括 INSERT・UPDATE
+    db.execute(insert(models.Student), [{"id": 10, "name": "高橋 結衣", "course": "A", "email": "yui@example.com", "uid": "uid-10"}])
+    db.execute(update(models.Subject).where(models.Subject.id == 1).values(name="解析学"))
+    db.commit()
+    # 科目カタログの upsert
+    sync_catalog(db, [CatalogSubject(id=2, name="統計学演習", credit=1, categories=[])])
+    db.commit()
+
+    assert found(db, "鈴木 太郎") == [("student", 1)]
+    assert found(db, "田中 太郎") == []
+    assert found(db, "hanako") == []
+    assert found(db, "高橋 結衣") == [("student", 10)]
+    assert found(db, "解析学") == [("subject", 1)]
+    assert found(db, "代数学") == []
+    assert found(db, "統計学") == [("subject", 2)]
+    assert found(db, "研究室") == []
+    # 1〜2 文字の語（bigram の索引）
+    assert found(db, "鈴木") == [("student", 1)]
+    assert found(db, "佐々") == []
+    assert found(db, "結衣") == [("student", 10)]
+    assert found(db, "統計") == [("subject", 2)]
+    assert found(db, "研") == []
+    # 索引と元の表が一致しなければエラーになる
+    for name in models.SEARCH_INDEXES:
+        db.execute(text(f"INSERT INTO {name}({name}) VALUES ('integrity-check')"))
+
+
+def query_plan(db, q):
+    conn = db.connection()
+    results, _, params = search._results(db, q, limited=True)
+    statement = results.element.params(ranked_limit=20, **params).compile(conn, compile_kwargs={"literal_binds": True})
+    return [row[-1] for row in conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}")]
+
+
+def test_indexed_terms_use_the_fts_index(db):
+    assert "VIRTUAL TABLE INDEX" in " ".join(query_plan(db, "代数学 線"))
+
+
+@pytest.mark.parametrize("q", ["田中 郎", "example 田中"])
+def test_short_terms_use_the_bigram_index(db, q):
+    plan = query_plan(db, q)
+    assert not [line for line in plan if line.startswith(("SCAN students", "SCAN subjects"))], plan
+    # trigram の索引を bigram の一致ごとに rowid で検索し直さない
+    assert not [line for line in plan if "VIRTUAL TABLE INDEX 0:=" in line], plan
+
+
+# 順位の上位だけを選んでからページングしても、全件を並べた場合と同じ順になる（同じ順位の行を含む）
+def test_ranked_pages_match_the_full_ranking(db):
+    db.execute(insert(models.Student), [
+        {"id": i, "name": f"学生{i}", "course": "A", "email": f"u{i}@example.com", "uid": f"uid-{i}"}
+        for i in range(10, 30)
+    ])
+    db.commit()
+    ranking = found(db, "example", limit=100)
+    assert len(ranking) == 23
+    assert [item for skip in range(0, 23, 4) for item in found(db, "example", skip=skip, limit=4)] == ranking
+    assert search.count(db, "example") == 23
+
+
+# 既存のデータベースにマイグレーションを適用すると、既にある行から索引が作られる
+def test_migration_indexes_existing_rows(tmp_path):
+    url = f"sqlite:///{tmp_path / 'search.db'}"
+    config = Config()
+    config.set_main_option("script_location", os.path.join(BACKEND_DIR, "alembic"))
+    config.set_main_option("sqlalchemy.url", url)
+    command.upgrade(config, "0005_requirement_rules")
+
+    migrated = create_engine(url)
+    with migrated.begin() as conn:
+        conn.execute(text("INSERT INTO subjects (id, name, credit) VALUES (1, '情報理論', 2)"))
+        conn.execute(text(
+            "INSERT INTO students (id, name, course, email, uid) VALUES (1, '山田 花子', 'A', 'yamada@example.com', 'u1')"
+        ))
+    command.upgrade(config, "head")
+
+    with Session(migrated) as session:
+        assert found(session, "情報理論") == [("subject", 1)]
+        assert found(session, "yamada") == [("student", 1)]
+        assert found(session, "山田") == [("student", 1)]
+        assert found(session, "理") == [("subject", 1)]
+        session.execute(text("UPDATE students SET email = 'hanako@example.com', name = '山本 花子' WHERE id = 1"))
+        assert found(session, "yamada") == []
+        assert found(session, "山田") == []
+        assert found(session, "山本") == [("student", 1)]
+    command.downgrade(config, "0005_requirement_rules")
+    with migrated.connect() as conn:
+        assert conn.execute(text("SELECT name FROM sqlite_master WHERE name LIKE '%search%'")).all() == []
+    migrated.dispose()
@@ -0,0 +1,28 @@
+import sqlite3
+
+from benchmarks import startup
+
+
+# app.main の import ではネットワーク・DDL を伴う処理を行わない
+def test_import_has_no_side_effects(tmp_path):
+    db_path = tmp_path / "app.db"
+    result = startup.measure_once({
+        "DATABASE_URL": f"sqlite:///{db_path}",
+        "DB_CREATE_ALL": "false",
+        # 初期化されれば存在しない認証情報ファイルの読み込みで失敗する
+        "FIREBASE_CREDENTIALS": str(tmp_path / "missing.json"),
+    })
+    assert result["heavy_modules_at_import"] == []
+    tables = sqlite3.connect(db_path).execute("SELECT name FROM sqlite_master WHERE type = 'table'").fetchall()
+    assert tables == []
+
+
+# create_all は lifespan で実行され、最初のリクエストが処理できる
+def test_lifespan_creates_tables_and_serves_first_request(tmp_path):
+    db_path = tmp_path / "app.db"
+    result = startup.measure_once({"DATABASE_URL": f"sqlite:///{db_path}"})
+    assert result["status"] == 200
+    tables = {row[0] for row in sqlite3.connect(db_path).execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    assert {"students", "subjects", "subject_category", "student_subject"} <= tables
+    # コールドスタートの目安（遅い CI でも超えない程度の上限）
+    assert result["startup_ms"] + result["first_request_ms"] < 5000
@@ -0,0 +1,104 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app import credit_summary, models
+from app.database import Base, get_db, get_read_db
+from app.routers.admin import students
+
+from query_count import count_queries
+
+# テスト用のインメモリデータベース
+engine = create_engine(
+    "sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool
+)
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+def override_get_db():
+    try:
+        db = TestingSessionLocal()
+        yield db
+    finally:
+        db.close()
+
+
+@pytest.fixture()
+def db():
+    Base.metadata.create_all(bind=engine)
+    session = TestingSessionLocal()
+    for i in range(1, 201):
+        subject = models.Subject(id=i, name=f"科目{i}", credit=2)
+        subject.categories = [models.SubjectCategory(course="A", category=models.SubjectCategoryEnum.COMPULSORY)]
+        session.add(subject)
+    session.commit()
+    try:
+        yield session
+    finally:
+        session.close()
+        Base.metadata.drop_all(bind=engine)
+
+
+@pytest.fixture()
+def client(db):
+    app = FastAPI()
+    app.include_router(students.router)
+    app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_read_db] = override_get_db
+    return TestClient(app)
+
+
+def create_student(client, uid, subject_ids):
+    response = client.post("/students/", json={
+        "name": uid, "email": f"{uid}@example.com", "course": "A", "uid": uid, "completed_subjects": subject_ids,
+    })
+    assert response.status_code == 200
+    return response.json()["id"]
+
+
+def subject_ids(student):
+    return sorted(s["id"] for s in student["completed_subjects"])
+
+
+def test_add_and_remove_subjects(client, db):
+    student_id = create_student(client, "uid-1", [1, 2, 3])
+
+    response = client.patch(f"/students/{student_id}/subjects", json={"add": [3, 4, 5], "remove": [1, 99]})
+    assert response.status_code == 200
+    assert subject_ids(response.json()) == [2, 3, 4, 5]
+    assert db.get(models.StudentCreditSummary, student_id).total == 8
+    assert credit_summary.check(db) == []
+
+
+def test_invalid_changes_are_rejected(client):
+    student_id = create_student(client, "uid-1", [1])
+    assert client.patch(f"/students/{student_id}/subjects", json={"add": [999]}).status_code == 400
+    assert client.patch(f"/students/{student_id}/subjects", json={"add": [2], "remove": [2]}).status_code == 400
+    assert client.patch("/students/12345/subjects", json={"add": [2]}).status_code == 404
+    assert subject_ids(client.get(f"/students/{student_id}").json()) == [1]
+
+
+def test_statement_count_does_not_depend_on_completed_subjects(client):
+    counts = []
+    for n in (1, 120):
+        student_id = create_student(client, f"uid-{n}", list(range(1, n + 1)))
+        with count_queries(engine) as statements:
+            response = client.patch(f"/students/{student_id}/subjects", json={"add": [150]})
+        assert response.status_code == 200
+        assert len(response.json()["completed_subjects"]) == n + 1
+        counts.append(len(statements))
+    assert counts[0] == counts[1]
+
+
+def test_put_replaces_subjects_with_a_diff(client, db):
+    student_id = create_student(client, "uid-1", [1, 2, 3])
+    response = client.put(f"/students/{student_id}", json={
+        "name": "更新", "email": "uid-1@example.com", "course": "A", "uid": "uid-1", "completed_subjects": [3, 4],
+    })
+    assert response.status_code == 200
+    assert response.json()["name"] == "更新"
+    assert subject_ids(response.json()) == [3, 4]
+    assert db.get(models.StudentCreditSummary, student_id).total == 4
@@ -2,15 +2,15 @@ import pytest
 from fastapi.testclient import TestClient
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
 
 from app.main import app
-from app.database import Base
-from app.models import Student
+from app.database import Base, get_db, get_read_db
+from app.models import Student, Subject
 from app.schemas.student import StudentCreate
 
-# テスト用のデータベース設定
-SQLALCHEMY_DATABASE_URL = "sqlite:///./test.db"
-engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False})
+# テスト用のデータベース設定（インメモリ）
+engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
 TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 # テスト用のデータベースセッションを取得する関数
@@ -25,20 +25,30 @@ def override_get_db():
 @pytest.fixture(scope="module")
 def client():
     Base.metadata.create_all(bind=engine)
+    db = TestingSessionLocal()
+    db.add_all([Subject(id=i, name=f"科目{i}", credit=2) for i in range(1, 9)])
+    db.commit()
+    db.close()
     app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_read_db] = override_get_db
     with TestClient(app) as c:
         yield c
+    app.dependency_overrides.clear()
     Base.metadata.drop_all(bind=engine)
 
+
+def subject_ids(student):
+    return [s["id"] for s in student["completed_subjects"]]
+
 # テストケース
 def test_create_student(client):
-    student_data = {"name": "Test Student", "course": "A", "completed_subjects": [1, 2, 3]}
+    student_data = {"name": "Test Student", "course": "A", "email": "test@example.com", "uid": "uid-test", "completed_subjects": [1, 2, 3]}
     response = client.post("/students/", json=student_data)
     assert response.status_code == 200
     data = response.json()
     assert data["name"] == student_data["name"]
     assert data["course"] == student_data["course"]
-    assert data["completed_subjects"] == student_data["completed_subjects"]
+    assert subject_ids(data) == student_data["completed_subjects"]
     assert "id" in data
 
 def test_read_students(client):
@@ -50,22 +60,22 @@ def test_read_students(client):
 
 def test_update_student(client):
     # まず学生を作成
-    student_data = {"name": "Update Test", "course": "B", "completed_subjects": [4, 5]}
+    student_data = {"name": "Update Test", "course": "B", "email": "update@example.com", "uid": "uid-update", "completed_subjects": [4, 5]}
     create_response = client.post("/students/", json=student_data)
     created_student = create_response.json()
 
     # 学生情報を更新
-    update_data = {"name": "Updated Name", "course": "C", "completed_subjects": [6, 7, 8]}
+    update_data = {"name": "Updated Name", "course": "C", "email": "update@example.com", "uid": "uid-update", "completed_subjects": [6, 7, 8]}
     response = client.put(f"/students/{created_student['id']}", json=update_data)
     assert response.status_code == 200
     updated_student = response.json()
     assert updated_student["name"] == update_data["name"]
     assert updated_student["course"] == update_data["course"]
-    assert updated_student["completed_subjects"] == update_data["completed_subjects"]
+    assert subject_ids(updated_student) == update_data["completed_subjects"]
 
 def test_delete_student(client):
     # まず学生を作成
-    student_data = {"name": "Delete Test", "course": "A", "completed_subjects": [1]}
+    student_data = {"name": "Delete Test", "course": "A", "email": "delete@example.com", "uid": "uid-delete", "completed_subjects": [1]}
     create_response = client.post("/students/", json=student_data)
     created_student = create_response.json()
 
@@ -79,12 +89,12 @@ def test_delete_student(client):
     assert get_response.status_code == 404
 
 def test_create_invalid_student(client):
-    invalid_student_data = {"name": "Invalid Student", "course": "D", "completed_subjects": [1]}
+    invalid_student_data = {"name": "Invalid Student", "course": "D", "email": "invalid@example.com", "uid": "uid-invalid", "completed_subjects": [1]}
     response = client.post("/students/", json=invalid_student_data)
     assert response.status_code == 422  # Unprocessable Entity
 
 def test_update_nonexistent_student(client):
-    update_data = {"name": "Nonexistent", "course": "A", "completed_subjects": [1]}
+    update_data = {"name": "Nonexistent", "course": "A", "email": "none@example.com", "uid": "uid-none", "completed_subjects": [1]}
     response = client.put("/students/9999", json=update_data)
     assert response.status_code == 404
     assert response.json() == {"detail": "Student not found"}
\ No newline at end of file
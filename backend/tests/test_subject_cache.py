@@ -0,0 +1,132 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app import models
+from app.cache_versions import CATALOG, bump_version, get_version
+from app.database import Base, get_db, get_read_db
+from app.routers.admin import subjects
+from app.routers.response_cache import etag_matches
+from query_count import count_queries
+
+# テスト用のインメモリデータベース
+engine = create_engine(
+    "sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool
+)
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+def override_get_db():
+    try:
+        db = TestingSessionLocal()
+        yield db
+    finally:
+        db.close()
+
+
+@pytest.fixture()
+def client():
+    Base.metadata.create_all(bind=engine)
+    db = TestingSessionLocal()
+    subject = models.Subject(id=1, name="数学", credit=2)
+    subject.categories = [models.SubjectCategory(course="A", category=models.SubjectCategoryEnum.COMPULSORY)]
+    db.add(subject)
+    db.commit()
+    db.close()
+
+    app = FastAPI()
+    app.include_router(subjects.router)
+    app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_read_db] = override_get_db
+    yield TestClient(app)
+    Base.metadata.drop_all(bind=engine)
+
+
+SUBJECT = {"name": "物理", "credit": 4, "categories": [{"course": "B", "category": "ELECTIVE"}]}
+
+
+@pytest.mark.parametrize("path", ["/subjects/", "/subjects/1"])
+def test_conditional_get(client, path):
+    first = client.get(path)
+    assert first.status_code == 200
+    etag = first.headers["ETag"]
+    assert etag.startswith('"') and not etag.startswith("W/")
+
+    not_modified = client.get(path, headers={"If-None-Match": etag})
+    assert not_modified.status_code == 304
+    assert not_modified.content == b""
+    assert not_modified.headers["ETag"] == etag
+
+    assert client.get(path, headers={"If-None-Match": '"other"'}).status_code == 200
+
+
+def test_cache_hit_only_reads_version(client):
+    first = client.get("/subjects/", params={"limit": 1, "include_total": True})
+    with count_queries(engine) as statements:
+        second = client.get("/subjects/", params={"limit": 1, "include_total": True})
+    assert len(statements) == 1
+    assert second.content == first.content
+    # ページング用のヘッダもキャッシュから返す
+    assert second.headers["X-Total-Count"] == "1"
+    assert second.headers["X-Next-Cursor"] == first.headers["X-Next-Cursor"]
+
+
+def test_writes_invalidate_cache(client):
+    etag = client.get("/subjects/").headers["ETag"]
+
+    created = client.post("/subjects/", json=SUBJECT).json()
+    listed = client.get("/subjects/", headers={"If-None-Match": etag})
+    assert listed.status_code == 200
+    assert [s["id"] for s in listed.json()] == [1, created["id"]]
+
+    detail_etag = client.get(f"/subjects/{created['id']}").headers["ETag"]
+    client.put(f"/subjects/{created['id']}", json=dict(SUBJECT, credit=6))
+    updated = client.get(f"/subjects/{created['id']}", headers={"If-None-Match": detail_etag})
+    assert updated.status_code == 200
+    assert updated.json()["credit"] == 6
+
+    client.delete(f"/subjects/{created['id']}")
+    assert client.get(f"/subjects/{created['id']}").status_code == 404
+    assert [s["id"] for s in client.get("/subjects/").json()] == [1]
+
+
+# 同じコースの区分を 2 つ指定すると一意索引の違反になるため、書き込む前に 400 で断る
+def test_duplicate_courses_are_rejected(client):
+    duplicate = dict(SUBJECT, categories=[{"course": "A", "category": "ELECTIVE"}, {"course": "A", "category": "COMPULSORY"}])
+    response = client.post("/subjects/", json=duplicate)
+    assert response.status_code == 400
+    assert "duplicate course" in response.json()["detail"]
+    assert client.put("/subjects/1", json=duplicate).status_code == 400
+    assert [s["id"] for s in client.get("/subjects/").json()] == [1]
+    assert client.get("/subjects/1").json()["categories"][0]["category"] == "COMPULSORY"
+
+
+def test_version_bump_from_another_worker(client):
+    assert client.get("/subjects/1").json()["credit"] == 2
+
+    # 別ワーカーの書き込みを想定し、このプロセスのキャッシュを消さずにデータとバージョンを更新する
+    db = TestingSessionLocal()
+    db.query(models.Subject).filter(models.Subject.id == 1).update({"credit": 8})
+    before = get_version(db, CATALOG)
+    bump_version(db, CATALOG)
+    db.commit()
+    assert get_version(db, CATALOG) == before + 1
+    db.close()
+
+    assert client.get("/subjects/1").json()["credit"] == 8
+
+
+def test_not_found_is_not_cached(client):
+    assert client.get("/subjects/2").status_code == 404
+    assert len(subjects.subject_cache) == 0
+
+
+def test_etag_matches():
+    assert etag_matches('"a", "b"', '"b"')
+    assert etag_matches('W/"b"', '"b"')
+    assert etag_matches("*", '"b"')
+    assert not etag_matches(None, '"b"')
+    assert not etag_matches('"a"', '"b"')
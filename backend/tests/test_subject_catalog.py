@@ -0,0 +1,127 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, update
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app import credit_engine, models, subject_catalog
+from app.cache_versions import CATALOG, bump_version
+from app.database import Base, get_db, get_read_db
+from app.routers.admin import subjects
+from app.schemas.subject import Subject
+
+from query_count import count_queries
+
+# テスト用のインメモリデータベース
+engine = create_engine(
+    "sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool
+)
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+C = models.SubjectCategoryEnum
+
+
+def override_get_db():
+    try:
+        db = TestingSessionLocal()
+        yield db
+    finally:
+        db.close()
+
+
+@pytest.fixture()
+def db():
+    Base.metadata.create_all(bind=engine)
+    session = TestingSessionLocal()
+    for i, (credit, categories) in enumerate([(2, {"C": C.ELECTIVE, "A": C.COMPULSORY}), (4, {"B": C.LIMITED_ELECTIVE}), (1, {})], start=1):
+        subject = models.Subject(id=i, name=f"科目{i}", credit=credit)
+        subject.categories = [models.SubjectCategory(course=course, category=category) for course, category in categories.items()]
+        session.add(subject)
+    session.commit()
+    try:
+        yield session
+    finally:
+        session.close()
+        Base.metadata.drop_all(bind=engine)
+
+
+@pytest.fixture()
+def client(db):
+    app = FastAPI()
+    app.include_router(subjects.router)
+    app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_read_db] = override_get_db
+    return TestClient(app)
+
+
+def subject_queries(statements):
+    return [s for s in statements if "FROM subjects" in s or "FROM subject_category" in s]
+
+
+def test_snapshot_matches_the_orm_and_is_immutable(db):
+    snapshot = subject_catalog.get_snapshot(db)
+    for subject_id in (1, 2, 3):
+        expected = Subject.model_validate(db.get(models.Subject, subject_id))
+        actual = snapshot.subject(subject_id)
+        assert actual.model_dump(exclude={"categories"}) == expected.model_dump(exclude={"categories"})
+        assert sorted(c.model_dump_json() for c in actual.categories) == sorted(c.model_dump_json() for c in expected.categories)
+    assert [c.course for c in snapshot.subject(1).categories] == ["A", "C"]
+    assert snapshot.subject(99) is None and 99 not in snapshot and len(snapshot) == 3
+
+    # 単位計算の配列は DB から読み込んだカタログと同じ
+    loaded = credit_engine.load_catalog(db)
+    for field in ("subject_ids", "credits", "category_table"):
+        assert (getattr(snapshot.catalog, field) == getattr(loaded, field)).all()
+    with pytest.raises(ValueError):
+        snapshot.catalog.credits[0] = 10
+
+
+def test_read_subject_and_credit_calculation_do_not_query_the_catalog(client, db):
+    assert client.get("/subjects/1").status_code == 200
+    with count_queries(engine) as statements:
+        assert client.get("/subjects/2").json()["credit"] == 4
+        assert client.get("/subjects/99").status_code == 404
+        credit_engine.calculate_cohort_credits(db, student_ids=[], catalog=subject_catalog.get_catalog(db))
+    assert statements and subject_queries(statements) == []
+
+
+def test_writes_swap_the_snapshot(client, db):
+    before = subject_catalog.get_snapshot(db)
+    response = client.put("/subjects/2", json={"name": "科目2", "credit": 6, "categories": [{"course": "A", "category": "ELECTIVE"}]})
+    assert response.status_code == 200
+    assert response.json()["credit"] == 6
+
+    # コミット後に作り直したスナップショットが共有され、DB を読まずに新しい内容を返す
+    with count_queries(engine) as statements:
+        after = subject_catalog.get_snapshot(db)
+    assert subject_queries(statements) == []
+    assert after.version == before.version + 1
+    assert after.subject(2).categories[0].course == "A" and before.subject(2).categories[0].course == "B"
+
+    created = client.post("/subjects/", json={"name": "新科目", "credit": 3, "categories": []}).json()
+    assert client.get(f"/subjects/{created['id']}").json() == created
+    assert client.delete(f"/subjects/{created['id']}").status_code == 200
+    assert client.get(f"/subjects/{created['id']}").status_code == 404
+
+
+def test_changes_from_other_processes_are_picked_up_by_version(db):
+    subject_catalog.get_snapshot(db)
+    # 他のワーカーの書き込み（このプロセスのセッションを通らない）
+    with engine.begin() as connection:
+        connection.execute(update(models.Subject.__table__).where(models.Subject.id == 1).values(credit=5))
+    db.rollback()
+    assert subject_catalog.get_snapshot(db).subject(1).credit == 2
+    bump_version(db, CATALOG)
+    db.commit()
+    assert subject_catalog.get_snapshot(db).subject(1).credit == 5
+
+
+def test_uncommitted_changes_are_seen_only_by_the_writing_session(db):
+    shared = subject_catalog.get_snapshot(db)
+    db.execute(update(models.Subject).where(models.Subject.id == 1).values(credit=8))
+    assert subject_catalog.get_snapshot(db).subject(1).credit == 8
+
+    # ロールバックしたら共有のスナップショットをそのまま使う
+    db.rollback()
+    assert subject_catalog.get_snapshot(db) is shared